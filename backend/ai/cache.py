@@ -0,0 +1,132 @@
+"""
+AI决策缓存（LRU + TTL）
+行情状态基本不变时直接复用上一次的决策，不再调用 DeepSeek（耗时数秒、消耗 token）。
+
+缓存键是量化后的市场快照：
+- 交易对
+- 价格桶：按对数等宽划分，每桶约 price_bucket_pct%
+- 持仓：按 position_step 取整
+- 余额桶：按 balance_step 取整
+- 指标区间（与提示词中的技术指标对应）：RSI 按 rsi_band 分档、波动率（ATR%）按 volatility_ratio 倍对数分档、
+  价格相对布林带的位置（下轨外 / 带内 / 上轨外）；指标未预热时该项为 None
+同一桶内的市场状态视为同一"行情区间"，TTL 保证区间内的决策也会定期刷新。
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class DecisionCache:
+    """决策缓存（线程安全）"""
+    
+    def __init__(self, max_size: int = 256, ttl: float = 300.0, price_bucket_pct: float = 0.5,
+                 position_step: float = 0.0001, balance_step: float = 10.0, rsi_band: float = 10.0,
+                 volatility_ratio: float = 1.5):
+        """
+        初始化决策缓存
+        
+        Args:
+            max_size: 最多缓存的决策数（超过后淘汰最久未使用的）
+            ttl: 决策有效期（秒），0表示禁用缓存
+            price_bucket_pct: 价格桶宽度（%）
+            position_step: 持仓量化步长
+            balance_step: 余额量化步长（USDT）
+            rsi_band: RSI 分档宽度
+            volatility_ratio: 波动率相邻分档的倍数
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.position_step = position_step
+        self.balance_step = balance_step
+        self.rsi_band = rsi_band
+        self._log_step = math.log1p(price_bucket_pct / 100)
+        self._volatility_log_step = math.log(volatility_ratio)
+        
+        self._entries: OrderedDict = OrderedDict()  # key -> (过期时间, 决策)
+        self._lock = threading.Lock()
+        
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+    
+    def key(self, market_data: Dict[str, Any]) -> Tuple[Hashable, ...]:
+        """由市场数据生成量化后的缓存键"""
+        price = market_data['price']
+        return (
+            market_data['symbol'],
+            math.floor(math.log(price) / self._log_step) if price > 0 else 0,
+            round(market_data['position'] / self.position_step),
+            math.floor(market_data['balance'] / self.balance_step)
+        ) + self._indicator_buckets(price, market_data.get('indicators'))
+    
+    def _indicator_buckets(self, price: float, indicators: Optional[Dict[str, Any]]) -> Tuple[Hashable, ...]:
+        """技术指标区间：(RSI档, 波动率档, 布林带位置)，指标变化到另一区间时不再复用旧决策"""
+        indicators = indicators or {}
+        rsi = indicators.get('rsi')
+        atr_pct = indicators.get('atr_pct')
+        upper, lower = indicators.get('bb_upper'), indicators.get('bb_lower')
+        
+        if upper is None or lower is None:
+            band = None
+        else:
+            band = 1 if price > upper else -1 if price < lower else 0
+        return (
+            None if rsi is None else math.floor(rsi / self.rsi_band),
+            None if not atr_pct or atr_pct <= 0 else math.floor(math.log(atr_pct) / self._volatility_log_step),
+            band
+        )
+    
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """命中时返回决策副本"""
+        if self.ttl <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+    
+    def put(self, key: Hashable, decision: Dict[str, Any]):
+        """缓存决策"""
+        if self.ttl <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(decision))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率等统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -1,79 +1,177 @@
 """
 DeepSeek AI客户端
 """
-import requests
 import json
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Hashable, Optional
+from ai.cache import DecisionCache
+from ai.ratelimit import TokenBucket
 
 
 class DeepSeekClient:
-    """DeepSeek API客户端"""
+    """DeepSeek API客户端（复用 keep-alive 连接，可选决策缓存）"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[DecisionCache] = None, rate_limiter: Optional[TokenBucket] = None,
+                 pool_size: int = 4, connect_timeout: float = 5.0, read_timeout: float = 30.0):
         """
         初始化DeepSeek客户端
         
         Args:
             api_key: DeepSeek API密钥
+            cache: 决策缓存，为空时每次都调用API
+            rate_limiter: 请求限流（缓存命中不消耗令牌）
+            pool_size: 连接池大小（并发决策数）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 等待响应超时（秒）
         """
         self.api_key = api_key
         self.base_url = 'https://api.deepseek.com/v1'
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.timeout = (connect_timeout, read_timeout)
+        
+        self.pool_size = pool_size
+        self._session = None
+        
+        # 统计
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.tokens_used = 0
+    
+    @property
+    def session(self):
+        """
+        长连接会话：省去每次决策的 TCP + TLS 握手
+        
+        首次决策时才创建（requests 导入约70ms，不计入服务启动耗时）。
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    
+                    session = requests.Session()
+                    session.headers.update({
+                        'Authorization': f'Bearer {self.api_key}',
+                        'Content-Type': 'application/json'
+                    })
+                    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+                    self._session = session
+        return self._session
     
-    def make_decision(self, prompt: str) -> Dict[str, Any]:
+    def make_decision(self, prompt: str, cache_key: Optional[Hashable] = None) -> Dict[str, Any]:
         """
         调用DeepSeek API进行决策
         
         Args:
             prompt: 提示词
-            
+            cache_key: 决策缓存键（见 DecisionCache.key），命中时不调用API
+        
         Returns:
             AI决策结果
             {
                 'action': 'buy' | 'sell' | 'wait',
                 'reasoning': '决策理由',
-                'confidence': 0.0-1.0
+                'confidence': 0.0-1.0,
+                'cached': 是否来自缓存
             }
         """
+        if self.cache is not None and cache_key is not None:
+            decision = self.cache.get(cache_key)
+            if decision is not None:
+                decision['cached'] = True
+                return decision
+        
+        from requests.exceptions import RequestException
+        
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=self.timeout[1]):
+            return {
+                'action': 'wait',
+                'reasoning': '请求限流，等待超时',
+                'confidence': 0.0,
+                'cached': False
+            }
+        
+        with self._lock:
+            self.requests += 1
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
                 json={
                     'model': 'deepseek-chat',
                     'messages': [{'role': 'user', 'content': prompt}],
                     'temperature': 0.7,
                     'max_tokens': 500
                 },
-                timeout=30
+                timeout=self.timeout
             )
             
             response.raise_for_status()
-            ai_response = response.json()['choices'][0]['message']['content']
+            body = response.json()
+            ai_response = body['choices'][0]['message']['content']
+            with self._lock:
+                self.tokens_used += body.get('usage', {}).get('total_tokens', 0)
             
             # 解析AI返回的JSON
             decision = json.loads(ai_response)
             
-            return {
+            result = {
                 'action': decision.get('action', 'wait'),
                 'reasoning': decision.get('reasoning', 'AI未提供理由'),
                 'confidence': decision.get('confidence', 0.5)
             }
-            
-        except requests.exceptions.RequestException as e:
+            # 只缓存成功的决策，失败时下次重新请求
+            if self.cache is not None and cache_key is not None:
+                self.cache.put(cache_key, result)
+            result['cached'] = False
+            return result
+        
+        except RequestException as e:
+            self._record_failure()
             print(f"DeepSeek API调用失败: {e}")
             # 返回默认决策（等待）
             return {
                 'action': 'wait',
                 'reasoning': f'API调用失败: {str(e)}',
-                'confidence': 0.0
+                'confidence': 0.0,
+                'cached': False
             }
         except (json.JSONDecodeError, KeyError) as e:
+            self._record_failure()
             print(f"DeepSeek响应解析失败: {e}")
             return {
                 'action': 'wait',
                 'reasoning': f'响应解析失败: {str(e)}',
-                'confidence': 0.0
+                'confidence': 0.0,
+                'cached': False
             }
+    
+    def _record_failure(self):
+        with self._lock:
+            self.failures += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """API调用与缓存统计（tokens_saved 按平均每次决策的 token 数估算）"""
+        with self._lock:
+            succeeded = self.requests - self.failures
+            avg_tokens = self.tokens_used / succeeded if succeeded else 0.0
+            stats = {
+                'requests': self.requests,
+                'failures': self.failures,
+                'tokens_used': self.tokens_used,
+                'avg_tokens': round(avg_tokens, 1)
+            }
+        if self.rate_limiter is not None:
+            stats['rate_limit'] = self.rate_limiter.get_stats()
+        if self.cache is not None:
+            cache_stats = self.cache.get_stats()
+            stats['tokens_saved'] = round(cache_stats['hits'] * avg_tokens)
+            stats['cache'] = cache_stats
+        return stats
+    
+    def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            self._session.close()
@@ -1,7 +1,7 @@
 """
 AI交易决策提示词模板
 """
-from typing import Dict, Any
+from typing import Any, Dict, Optional
 
 
 def generate_trade_prompt(market_data: Dict[str, Any]) -> str:
@@ -17,12 +17,15 @@ def generate_trade_prompt(market_data: Dict[str, Any]) -> str:
             'high_24h': 96000.0,
             'low_24h': 93000.0,
             'position': 0.001,  # 当前持仓BTC数量
-            'balance': 1000.0   # 当前USDT余额
+            'balance': 1000.0,  # 当前USDT余额
+            'indicators': {...} # 技术指标（core.indicators 快照，可选）
         }
-        
+    
     Returns:
         提示词字符串
     """
+    indicators = format_indicators(market_data.get('indicators'))
+    
     return f"""你是一个专业的加密货币交易顾问，请根据以下市场数据给出交易建议。
 
 【当前市场数据】
@@ -33,7 +36,7 @@ def generate_trade_prompt(market_data: Dict[str, Any]) -> str:
 - 24h最低价: ${market_data['low_24h']:,.2f}
 - 当前持仓: {market_data['position']} BTC
 - 可用余额: ${market_data['balance']:.2f} USDT
-
+{indicators}
 【决策要求】
 1. 分析当前市场趋势（上涨/下跌/震荡）
 2. 评估入场时机（买入/卖出/等待）
@@ -54,13 +57,48 @@ def generate_trade_prompt(market_data: Dict[str, Any]) -> str:
 """
 
 
+def format_indicators(indicators: Optional[Dict[str, Any]]) -> str:
+    """
+    技术指标段落（预热不足、尚未算出的指标不输出）
+    
+    Args:
+        indicators: IndicatorEngine.get() 返回的快照
+    
+    Returns:
+        以空行开头的提示词段落，没有可用指标时为空字符串
+    """
+    if not indicators:
+        return ""
+    
+    get = indicators.get
+    lines = []
+    if get('sma') is not None:
+        lines.append(f"- SMA: ${get('sma'):,.2f}")
+    if get('ema') is not None:
+        lines.append(f"- EMA: ${get('ema'):,.2f}")
+    if get('bb_upper') is not None:
+        lines.append(f"- 布林带: ${get('bb_lower'):,.2f} ~ ${get('bb_upper'):,.2f}（中轨 ${get('bb_middle'):,.2f}）")
+    if get('rsi') is not None:
+        lines.append(f"- RSI: {get('rsi'):.1f}")
+    if get('atr') is not None:
+        lines.append(f"- ATR: ${get('atr'):,.2f}（{get('atr_pct'):.3f}%）")
+    if get('volatility_pct') is not None:
+        lines.append(f"- 单根K线波动率: {get('volatility_pct'):.3f}%")
+    if get('vwap') is not None:
+        lines.append(f"- VWAP: ${get('vwap'):,.2f}")
+    if not lines:
+        return ""
+    
+    return "\n【技术指标】\n" + '\n'.join(lines) + '\n'
+
+
 def generate_coin_selection_prompt(coins_data: list) -> str:
     """
     生成币种选择提示词（Phase 4+功能）
     
     Args:
         coins_data: 币种数据列表
-        
+    
     Returns:
         提示词字符串
     """
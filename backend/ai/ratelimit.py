@@ -0,0 +1,75 @@
+"""
+令牌桶限流
+并发调用 DeepSeek 时限制请求速率，突发请求最多 burst 个，之后按 rate 个/秒放行。
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """令牌桶（线程安全，acquire 阻塞等待）"""
+    
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 每秒补充的令牌数（<=0 表示不限流）
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+        # 统计
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        获取一个令牌，不足时等待
+        
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+        
+        Returns:
+            是否获取成功（超时返回 False）
+        """
+        if self.rate <= 0:
+            return True
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    if waited:
+                        self.throttled += 1
+                        self.wait_seconds += waited
+                    return True
+                delay = (1 - self._tokens) / self.rate
+            
+            if deadline is not None and now + delay > deadline:
+                return False
+            time.sleep(delay)
+            waited += delay
+    
+    def get_stats(self) -> Dict:
+        """限流统计"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'acquired': self.acquired,
+                'throttled': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 3)
+            }
@@ -2,21 +2,47 @@
 AI决策API路由
 """
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-import sqlite3
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
+from ai.cache import DecisionCache
 from ai.client import DeepSeekClient
 from ai.prompts import generate_trade_prompt
-from core.exchange import GateIOExchange
+from ai.ratelimit import TokenBucket
+from core import database
+from core.container import container
 from config import settings
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
+# 决策缓存：行情区间不变时复用决策
+decision_cache = DecisionCache(
+    max_size=settings.ai_cache_size,
+    ttl=settings.ai_cache_ttl,
+    price_bucket_pct=settings.ai_cache_price_bucket_pct,
+    position_step=settings.ai_cache_position_step,
+    balance_step=settings.ai_cache_balance_step,
+    rsi_band=settings.ai_cache_rsi_band,
+    volatility_ratio=settings.ai_cache_volatility_ratio
+)
+
+# 请求限流：批量决策并发调用时不超过 DeepSeek 的速率限制
+rate_limiter = TokenBucket(settings.ai_rate_limit, settings.ai_rate_burst)
+
+# AI请求线程池（requests 为同步调用，与连接池大小一致）
+ai_executor = ThreadPoolExecutor(max_workers=settings.ai_max_concurrency, thread_name_prefix='ai-decision')
+
 # 创建DeepSeek客户端
 deepseek_client = None
 if settings.deepseek_api_key:
-    deepseek_client = DeepSeekClient(settings.deepseek_api_key)
+    deepseek_client = DeepSeekClient(
+        settings.deepseek_api_key,
+        cache=decision_cache,
+        rate_limiter=rate_limiter,
+        pool_size=settings.ai_max_concurrency
+    )
 
 
 class AIDecisionRequest(BaseModel):
@@ -25,6 +51,58 @@ class AIDecisionRequest(BaseModel):
     trader_id: Optional[str] = None
 
 
+class AIBatchDecisionRequest(BaseModel):
+    """批量AI决策请求（交易对和交易员可混合）"""
+    symbols: List[str] = Field(default_factory=list)
+    trader_ids: List[str] = Field(default_factory=list)
+
+
+def _change_24h(ticker: Dict) -> float:
+    """24h涨跌幅（交易所未提供时按最低价估算）"""
+    if ticker.get('percentage'):
+        return ticker['percentage']
+    if ticker.get('high') and ticker.get('low') and ticker.get('last'):
+        return ((ticker['last'] - ticker['low']) / ticker['low']) * 100
+    return 0.0
+
+
+def _market_data(symbol: str, ticker: Dict, position: float, balance: float,
+                 indicators: Optional[Dict] = None) -> Dict:
+    """构造提示词所需的市场数据"""
+    return {
+        'symbol': symbol,
+        'price': ticker['last'],
+        'change_24h': _change_24h(ticker),
+        'high_24h': ticker.get('high', ticker['last']),
+        'low_24h': ticker.get('low', ticker['last']),
+        'position': position,
+        'balance': balance,
+        'indicators': indicators
+    }
+
+
+async def _indicators(symbols: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    交易对的共享技术指标（与交易员读取的是同一份）
+    
+    没有交易员在跑的交易对，先从本地K线存储补入新收盘的K线；已在跟踪的交易对直接读取。
+    """
+    from core.indicators import indicator_engine  # 延迟导入：numpy 不计入启动耗时
+    
+    exchange = container.registry.get_sync()
+    await asyncio.gather(*(asyncio.to_thread(indicator_engine.catch_up, symbol, exchange) for symbol in symbols))
+    return {symbol: indicator_engine.get(symbol) for symbol in symbols}
+
+
+async def _decide(market_data: Dict) -> Dict:
+    """调用AI决策（命中缓存时不请求API；未命中时在线程池中等待，不阻塞事件循环）"""
+    prompt = generate_trade_prompt(market_data)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        ai_executor, deepseek_client.make_decision, prompt, decision_cache.key(market_data)
+    )
+
+
 @router.post("/decide")
 async def make_decision(req: AIDecisionRequest):
     """
@@ -33,7 +111,7 @@ async def make_decision(req: AIDecisionRequest):
     Args:
         symbol: 交易对
         trader_id: 交易员ID（可选）
-        
+    
     Returns:
         AI决策结果
     """
@@ -41,41 +119,18 @@ async def make_decision(req: AIDecisionRequest):
         raise HTTPException(status_code=500, detail="DeepSeek API未配置")
     
     try:
-        # 创建交易所实例
-        exchange = GateIOExchange(
-            api_key=settings.gate_api_key,
-            api_secret=settings.gate_api_secret,
-            testnet=settings.gate_testnet
+        # 获取市场数据（复用交易API的异步交易所实例，请求并发）
+        exchange = container.exchange
+        ticker, usdt_balance, btc_balance, indicators = await asyncio.gather(
+            exchange.get_ticker(req.symbol),
+            exchange.get_balance("USDT"),
+            exchange.get_balance("BTC"),
+            _indicators([req.symbol])
         )
+        market_data = _market_data(req.symbol, ticker, btc_balance['free'], usdt_balance['free'],
+                                   indicators[req.symbol])
         
-        # 获取市场数据
-        ticker = exchange.get_ticker(req.symbol)
-        usdt_balance = exchange.get_balance("USDT")
-        btc_balance = exchange.get_balance("BTC")
-        
-        # 计算24h涨跌幅
-        change_24h = 0.0
-        if ticker.get('percentage'):
-            change_24h = ticker['percentage']
-        elif ticker.get('high') and ticker.get('low') and ticker.get('last'):
-            change_24h = ((ticker['last'] - ticker['low']) / ticker['low']) * 100
-        
-        # 构造市场数据
-        market_data = {
-            'symbol': req.symbol,
-            'price': ticker['last'],
-            'change_24h': change_24h,
-            'high_24h': ticker.get('high', ticker['last']),
-            'low_24h': ticker.get('low', ticker['last']),
-            'position': btc_balance['free'],
-            'balance': usdt_balance['free']
-        }
-        
-        # 生成提示词
-        prompt = generate_trade_prompt(market_data)
-        
-        # 调用AI决策
-        decision = deepseek_client.make_decision(prompt)
+        decision = await _decide(market_data)
         
         # 保存决策记录到数据库
         save_decision(
@@ -94,14 +149,128 @@ async def make_decision(req: AIDecisionRequest):
                 "action": decision['action'],
                 "reasoning": decision['reasoning'],
                 "confidence": decision['confidence'],
+                "cached": decision['cached'],
                 "market_data": market_data
             }
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/decide/batch")
+async def make_decisions(req: AIBatchDecisionRequest):
+    """
+    批量AI决策
+    
+    行情和技术指标按交易对去重后并发获取，余额只取一次；量化后相同的市场快照只请求一次AI，
+    其余在限流下并发发出，总耗时约等于一次AI往返。决策记录在同一个事务中写入。
+    
+    Args:
+        symbols: 交易对列表（持仓取账户中基础币种的可用余额，记录为 manual）
+        trader_ids: 交易员列表（使用交易员的交易对，持仓取该交易员的账本持仓）
+    
+    Returns:
+        每项的决策结果（失败项带 error），顺序与请求一致：先 symbols 后 trader_ids
+    """
+    if not deepseek_client:
+        raise HTTPException(status_code=500, detail="DeepSeek API未配置")
+    
+    targets = [{'trader_id': 'manual', 'symbol': symbol} for symbol in req.symbols]
+    for trader_id in req.trader_ids:
+        trader = database.get_trader(trader_id)
+        targets.append({'trader_id': trader_id, 'symbol': trader['symbol'] if trader else None})
+    if not targets:
+        raise HTTPException(status_code=400, detail="symbols 和 trader_ids 不能同时为空")
+    if len(targets) > settings.ai_batch_max_items:
+        raise HTTPException(status_code=400, detail=f"单次最多 {settings.ai_batch_max_items} 项")
+    
+    started = time.perf_counter()
+    exchange = container.exchange
+    symbols = sorted({target['symbol'] for target in targets if target['symbol']})
+    balance, indicators, *tickers = await asyncio.gather(
+        exchange.get_balance(),
+        _indicators(symbols),
+        *(exchange.get_ticker(symbol) for symbol in symbols),
+        return_exceptions=True
+    )
+    if isinstance(balance, Exception):
+        raise HTTPException(status_code=500, detail=f"获取余额失败: {balance}")
+    if isinstance(indicators, Exception):
+        indicators = {}
+    ticker_by_symbol = dict(zip(symbols, tickers))
+    
+    def free(currency: str) -> float:
+        return float(balance.get(currency, {}).get('free', 0))
+    
+    # 构造每项的市场数据，行情获取失败的项直接记为错误
+    results: List[Dict] = []
+    pending = []
+    for target in targets:
+        symbol, trader_id = target['symbol'], target['trader_id']
+        result = {'trader_id': trader_id, 'symbol': symbol}
+        results.append(result)
+        if symbol is None:
+            result['error'] = '交易员不存在'
+            continue
+        ticker = ticker_by_symbol[symbol]
+        if isinstance(ticker, Exception):
+            result['error'] = f"获取行情失败: {ticker}"
+            continue
+        
+        base, quote = symbol.split('/')
+        if trader_id == 'manual':
+            position = free(base)
+        else:
+            position = database.get_ledger(trader_id, symbol)['position']
+        result['market_data'] = _market_data(symbol, ticker, position, free(quote), indicators.get(symbol))
+        pending.append(result)
+    
+    # 量化后相同的市场快照只请求一次
+    unique: Dict = {}
+    for result in pending:
+        unique.setdefault(decision_cache.key(result['market_data']), result['market_data'])
+    outcomes = await asyncio.gather(*(_decide(market_data) for market_data in unique.values()), return_exceptions=True)
+    decided = dict(zip(unique, outcomes))
+    
+    # 单项决策失败只记在该项的 error 中，不影响整批
+    succeeded, decisions = [], []
+    for result in pending:
+        outcome = decided[decision_cache.key(result['market_data'])]
+        if isinstance(outcome, Exception):
+            result['error'] = f"AI决策失败: {outcome}"
+            continue
+        succeeded.append(result)
+        decisions.append(dict(outcome))
+    
+    timestamp = int(time.time() * 1000)
+    records = []
+    for result, decision in zip(succeeded, decisions):
+        result.update(decision)
+        records.append({
+            'trader_id': result['trader_id'],
+            'symbol': result['symbol'],
+            'action': decision['action'],
+            'reasoning': decision['reasoning'],
+            'confidence': decision['confidence'],
+            'price': result['market_data']['price'],
+            'timestamp': timestamp
+        })
+    database.insert_ai_decisions(records)
+    
+    return {
+        "code": 0,
+        "message": "AI决策成功",
+        "data": {
+            "results": results,
+            "decided": len(records),
+            "cached": sum(1 for decision in decisions if decision['cached']),
+            "failed": len(results) - len(records),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    }
+
+
 def save_decision(trader_id: str, symbol: str, action: str, reasoning: str, confidence: float, market_data: dict):
     """
     保存AI决策记录
@@ -114,38 +283,25 @@ def save_decision(trader_id: str, symbol: str, action: str, reasoning: str, conf
         confidence: 置信度
         market_data: 市场数据
     """
-    conn = sqlite3.connect('data/database.db')
-    cursor = conn.cursor()
-    
-    # 创建ai_decisions表（如果不存在）
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ai_decisions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            trader_id TEXT NOT NULL,
-            symbol TEXT NOT NULL,
-            action TEXT NOT NULL,
-            reasoning TEXT,
-            confidence REAL,
-            price REAL,
-            timestamp INTEGER NOT NULL
-        )
-    ''')
-    
-    cursor.execute('''
-        INSERT INTO ai_decisions (trader_id, symbol, action, reasoning, confidence, price, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        trader_id,
-        symbol,
-        action,
-        reasoning,
-        confidence,
-        market_data['price'],
-        int(time.time() * 1000)
-    ))
-    
-    conn.commit()
-    conn.close()
+    database.insert_ai_decision(
+        trader_id=trader_id,
+        symbol=symbol,
+        action=action,
+        reasoning=reasoning,
+        confidence=confidence,
+        price=market_data['price'],
+        timestamp=int(time.time() * 1000)
+    )
+
+
+@router.get("/stats")
+async def get_stats():
+    """AI调用统计：请求数、token 消耗、决策缓存命中率"""
+    return {
+        "code": 0,
+        "message": "success",
+        "data": deepseek_client.get_stats() if deepseek_client else {'cache': decision_cache.get_stats()}
+    }
 
 
 @router.get("/decisions/{trader_id}")
@@ -156,35 +312,11 @@ async def get_decisions(trader_id: str, limit: int = 10):
     Args:
         trader_id: 交易员ID
         limit: 返回数量限制
-        
+    
     Returns:
         决策历史列表
     """
-    conn = sqlite3.connect('data/database.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, symbol, action, reasoning, confidence, price, timestamp
-        FROM ai_decisions
-        WHERE trader_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    ''', (trader_id, limit))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    decisions = []
-    for row in rows:
-        decisions.append({
-            'id': row[0],
-            'symbol': row[1],
-            'action': row[2],
-            'reasoning': row[3],
-            'confidence': row[4],
-            'price': row[5],
-            'timestamp': row[6]
-        })
+    decisions = database.list_ai_decisions(trader_id, limit)
     
     return {
         "code": 0,
@@ -0,0 +1,72 @@
+"""事件日志API"""
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from core.events import event_journal, format_report
+
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+@router.get("")
+async def list_events(
+    trader_id: Optional[str] = None,
+    type: Optional[str] = Query(None, description="事件类型，多个用逗号分隔，如 buy,sell"),
+    since: Optional[float] = Query(None, description="起始时间（Unix秒）"),
+    until: Optional[float] = Query(None, description="结束时间（Unix秒）"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    查询事件（按时间倒序）
+    
+    事件类型: buy / sell / trade_failed / trade_skipped / tick_skipped / stop_triggered /
+    error / trader_started / trader_stopped / alert
+    """
+    types = [item.strip() for item in type.split(',') if item.strip()] if type else None
+    try:
+        events = event_journal.query(trader_id, types, since, until, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": events
+    }
+
+
+@router.get("/report")
+async def get_report(
+    hours: float = Query(12, gt=0, le=24 * 30, description="统计最近多少小时"),
+    trader_id: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|text)$")
+):
+    """
+    时间段报告（夜间报告）：各交易员事件计数 + 成交和异常明细
+    
+    format=text 返回可直接保存的文本报告
+    """
+    try:
+        report = event_journal.report(time.time() - hours * 3600, trader_id=trader_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if format == 'text':
+        return PlainTextResponse(format_report(report))
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": report
+    }
+
+
+@router.get("/stats")
+async def get_stats():
+    """事件日志状态（缓冲、待落库、丢弃数）"""
+    return {
+        "code": 0,
+        "message": "success",
+        "data": event_journal.get_stats()
+    }
@@ -0,0 +1,21 @@
+"""指标API（Prometheus 文本格式）"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from core.metrics import metrics
+
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    导出全部指标（Prometheus 抓取格式）
+    
+    - ai_spot_tick_duration_seconds: 每个交易员的 tick 耗时
+    - ai_spot_exchange_call_seconds / ai_spot_exchange_errors_total: 交易所调用耗时与失败次数（按接口）
+    - ai_spot_db_query_seconds / ai_spot_db_commit_seconds: SQLite 语句与提交耗时
+    - ai_spot_threads / ai_spot_asyncio_tasks: 线程数与协程任务数
+    - ai_spot_heartbeat_lag_seconds: 交易员距上次心跳的秒数
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,56 @@
+"""推送流API（Server-Sent Events）"""
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from core.stream import stream_hub
+
+
+router = APIRouter(prefix="/api/stream", tags=["stream"])
+
+# 无消息时发送心跳注释的间隔（秒），防止代理断开空闲连接
+KEEPALIVE_INTERVAL = 15
+
+
+def sse_message(event: str, data: str) -> str:
+    """SSE 消息格式"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("")
+async def stream(request: Request, trader_id: Optional[str] = None):
+    """
+    推送流（text/event-stream）
+    
+    参数:
+    - trader_id: 只接收该交易员的消息（交易员详情页使用）
+    
+    消息类型:
+    - hello: 连接建立
+    - trader_status: 交易员状态变化 {trader_id, status}（status 为 deleted 表示已删除）
+    - trade: 新成交（与 /api/trades 记录格式一致）
+    - update: 合并推送 {ticks: {trader_id: 运行状态}, prices: {symbol: 价格}, pnl: {trader_id: 盈亏}}，只含有变化的交易员
+    - resync: 客户端消费过慢、积压被丢弃，需要重新拉取一次全量数据
+    """
+    client = stream_hub.connect(asyncio.get_running_loop(), trader_id)
+    
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            yield sse_message('hello', json.dumps({'flush_interval': stream_hub.flush_interval}))
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(client.queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_message(event, data)
+        finally:
+            stream_hub.disconnect(client)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,21 +1,34 @@
 """
 交易API路由
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-import sqlite3
+import asyncio
+import csv
+import io
+import json
 import time
-from core.exchange import GateIOExchange
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Iterator, List, Optional
+from core import database
+from core.container import container
+from core.resilience import exchange_resilience
+from core.trade_writer import trade_writer
 from config import settings
 
 router = APIRouter(prefix="/api", tags=["trade"])
 
-# 创建交易所实例（使用配置中的API密钥）
-exchange = GateIOExchange(
-    api_key=settings.gate_api_key,
-    api_secret=settings.gate_api_secret,
-    testnet=settings.gate_testnet
+# 导出时每批读取的行数
+EXPORT_BATCH_SIZE = 1000
+
+# K线接口单次增量同步最多请求交易所的次数（长时间的缺口用回测命令行的 --sync 补齐）
+CANDLE_SYNC_MAX_REQUESTS = 10
+
+# 导出列（与 trades 表一致）
+TRADE_EXPORT_COLUMNS = (
+    'id', 'trader_id', 'strategy', 'symbol', 'action', 'price', 'amount', 'cost',
+    'fee_amount', 'profit', 'timestamp', 'position_before', 'position_after', 'is_real', 'created_at',
+    'order_id', 'client_order_id', 'reconciled'
 )
 
 class TradeRequest(BaseModel):
@@ -24,43 +37,10 @@ class TradeRequest(BaseModel):
     amount: float
     action: str  # buy 或 sell
 
-def init_database():
-    """初始化数据库"""
-    conn = sqlite3.connect('data/database.db')
-    cursor = conn.cursor()
-    
-    # 读取并执行SQL脚本
-    with open('data/init.sql', 'r') as f:
-        cursor.executescript(f.read())
-    
-    conn.commit()
-    conn.close()
-
-def save_trade(trade_data: dict, trader_id: str = "manual"):
-    """保存交易记录到数据库"""
-    conn = sqlite3.connect('data/database.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO trades (trader_id, strategy, symbol, action, price, amount, cost, fee_amount, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        trader_id,
-        'manual',
-        trade_data['symbol'],
-        trade_data['action'],
-        trade_data['price'],
-        trade_data['amount'],
-        trade_data['cost'],
-        trade_data.get('fee', 0),
-        trade_data['timestamp']
-    ))
-    
-    conn.commit()
-    trade_id = cursor.lastrowid
-    conn.close()
-    
-    return trade_id
+async def save_trade(trade_data: dict, trader_id: str = "manual"):
+    """保存交易记录到数据库（与策略交易一起批量写入，提交落盘后才返回）"""
+    ticket = trade_writer.submit(trade_data, trader_id, 'manual')
+    return await asyncio.to_thread(ticket.wait)
 
 @router.get("/config")
 async def get_config():
@@ -71,7 +51,8 @@ async def get_config():
         "data": {
             "testnet": settings.gate_testnet,
             "has_api_key": bool(settings.gate_api_key),
-            "demo_mode": not bool(settings.gate_api_key)
+            "demo_mode": container.exchange.demo_mode,
+            "simulator": settings.gate_simulator
         }
     }
 
@@ -89,19 +70,12 @@ async def update_config(
         api_secret: Gate.io API Secret
         testnet: 是否使用测试网
     """
-    global exchange
-    
     # 更新配置
     settings.gate_api_key = api_key
     settings.gate_api_secret = api_secret
     settings.gate_testnet = testnet
     
-    # 重新创建交易所实例
-    exchange = GateIOExchange(
-        api_key=api_key,
-        api_secret=api_secret,
-        testnet=testnet
-    )
+    # 之后 container.exchange 返回新凭证对应的交易所实例（注册表中已有时直接复用，元数据无需重新加载）
     
     # 保存到.env文件
     env_content = f"""# Gate.io API配置
@@ -112,7 +86,7 @@ GATE_TESTNET={str(testnet).lower()}
 # 应用配置
 APP_ENV=development
 """
-    
+
     with open('.env', 'w') as f:
         f.write(env_content)
     
@@ -121,7 +95,7 @@ APP_ENV=development
         "message": "API配置已更新",
         "data": {
             "testnet": testnet,
-            "demo_mode": not bool(api_key)
+            "demo_mode": container.exchange.demo_mode
         }
     }
 
@@ -132,15 +106,15 @@ async def get_balance(currency: str = "USDT"):
     
     Args:
         currency: 币种，默认USDT
-        
+    
     Returns:
         余额信息
     """
     try:
-        balance = exchange.get_balance(currency)
+        balance = await container.exchange.get_balance(currency)
         
         # 同时获取BTC余额
-        btc_balance = exchange.get_balance("BTC")
+        btc_balance = await container.exchange.get_balance("BTC")
         
         return {
             "code": 0,
@@ -157,7 +131,7 @@ async def get_balance(currency: str = "USDT"):
 async def get_ticker(symbol: str = "BTC/USDT"):
     """获取行情"""
     try:
-        ticker = exchange.get_ticker(symbol)
+        ticker = await container.exchange.get_ticker(symbol)
         return {
             "code": 0,
             "message": "success",
@@ -166,6 +140,121 @@ async def get_ticker(symbol: str = "BTC/USDT"):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/market")
+async def get_market(symbol: str = "BTC/USDT"):
+    """交易对元数据：价格/数量精度、下单限制、手续费率"""
+    market = container.registry.get_market(symbol)
+    if not market:
+        raise HTTPException(status_code=404, detail=f"交易对元数据未加载或不存在: {symbol}")
+    return {
+        "code": 0,
+        "message": "success",
+        "data": market
+    }
+
+@router.get("/candles")
+async def get_candles(
+    symbol: str = "BTC/USDT",
+    timeframe: str = Query("1m", pattern=r"^\d+[smhdw]$"),
+    since: Optional[int] = Query(None, description="起始开盘时间（毫秒时间戳）"),
+    until: Optional[int] = Query(None, description="结束开盘时间（毫秒时间戳）"),
+    limit: int = Query(500, ge=1, le=5000),
+    sync: bool = Query(True, description="读取前先从交易所增量同步")
+):
+    """
+    K线（读本地存储，默认先从最后一根已存K线增量同步）
+    
+    Args:
+        symbol: 交易对
+        timeframe: 周期，如 1m / 1h / 1d
+        since / until: 开盘时间区间；未指定 since 时返回最近 limit 根
+        limit: 最多返回的根数
+        sync: 是否先增量同步（同步失败时仍返回本地已有数据，并在 sync_error 中说明）
+    
+    Returns:
+        [[ts, open, high, low, close, volume], ...]，按时间正序
+    """
+    # 延迟导入：numpy 不计入启动耗时
+    from core.candles import CANDLE_FIELDS, candle_store
+    
+    synced, sync_error = 0, None
+    if sync:
+        try:
+            synced = await asyncio.to_thread(
+                candle_store.sync, container.registry.get_sync(), symbol, timeframe, since,
+                CANDLE_SYNC_MAX_REQUESTS
+            )
+        except Exception as e:
+            sync_error = str(e)
+    
+    candles = candle_store.read(symbol, timeframe, since, until, limit)
+    bars = zip(candles['timestamp'].tolist(), *(candles[field].tolist() for field in CANDLE_FIELDS))
+    return {
+        "code": 0,
+        "message": "success",
+        "data": [list(bar) for bar in bars],
+        "synced": synced,
+        "sync_error": sync_error
+    }
+
+@router.get("/candles/series")
+async def get_candle_series():
+    """本地K线存储：已存储的序列（根数、时间范围）和同步统计"""
+    from core.candles import candle_store
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": candle_store.get_stats()
+    }
+
+@router.get("/indicators")
+async def get_indicators(symbol: str = "BTC/USDT"):
+    """交易对的技术指标（与交易员和AI决策共享同一份，没有交易员在跑时先从K线存储补齐）"""
+    from core.indicators import indicator_engine
+    
+    await asyncio.to_thread(indicator_engine.catch_up, symbol, container.registry.get_sync())
+    return {
+        "code": 0,
+        "message": "success",
+        "data": indicator_engine.get(symbol)
+    }
+
+@router.get("/exchange/status")
+async def get_exchange_status():
+    """交易所连接状态：各接口熔断器和行情缓存"""
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "breakers": exchange_resilience.get_states(),
+            "ticker_cache": container.exchange.ticker_cache.get_stats(),
+            "registry": container.registry.get_stats()
+        }
+    }
+
+@router.get("/reconcile")
+async def get_reconcile_stats():
+    """订单对账统计（确认/修正/删除的交易数、交易所请求数）"""
+    return {
+        "code": 0,
+        "message": "success",
+        "data": container.engine.reconciler.get_stats()
+    }
+
+@router.post("/reconcile")
+async def run_reconcile():
+    """立即执行一次订单对账"""
+    try:
+        summary = await asyncio.to_thread(container.engine.reconciler.run_once)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "code": 0,
+        "message": "对账完成",
+        "data": summary
+    }
+
 @router.post("/trade/buy")
 async def buy(symbol: str = "BTC/USDT", amount: float = 0.001):
     """
@@ -177,10 +266,10 @@ async def buy(symbol: str = "BTC/USDT", amount: float = 0.001):
     """
     try:
         # 执行买入
-        order = exchange.market_buy(symbol, amount)
+        order = await container.exchange.market_buy(symbol, amount)
         
         # 保存到数据库
-        trade_id = save_trade(order)
+        trade_id = await save_trade(order)
         order['trade_id'] = trade_id
         
         return {
@@ -202,10 +291,10 @@ async def sell(symbol: str = "BTC/USDT", amount: float = 0.001):
     """
     try:
         # 执行卖出
-        order = exchange.market_sell(symbol, amount)
+        order = await container.exchange.market_sell(symbol, amount)
         
         # 保存到数据库
-        trade_id = save_trade(order)
+        trade_id = await save_trade(order)
         order['trade_id'] = trade_id
         
         return {
@@ -217,47 +306,78 @@ async def sell(symbol: str = "BTC/USDT", amount: float = 0.001):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/trades")
-async def get_trades(limit: int = 20, trader_id: Optional[str] = None):
+async def get_trades(
+    limit: int = Query(20, ge=1, le=1000),
+    trader_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+    action: Optional[str] = Query(None, pattern="^(buy|sell)$"),
+    since: Optional[int] = Query(None, description="起始时间（毫秒时间戳）"),
+    until: Optional[int] = Query(None, description="结束时间（毫秒时间戳）"),
+    cursor: Optional[int] = Query(None, description="上一页返回的 next_cursor")
+):
     """
-    获取交易历史
+    获取交易历史（最新在前，键集分页）
     
     Args:
-        limit: 返回数量限制
+        limit: 每页数量
         trader_id: 交易员ID，可选（用于筛选特定交易员的记录）
+        symbol / action / since / until: 筛选条件
+        cursor: 翻页游标；返回的 next_cursor 为空表示没有更多
     """
     try:
-        conn = sqlite3.connect('data/database.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # ✅ 根据是否有trader_id参数构建不同的SQL
-        if trader_id:
-            cursor.execute('''
-                SELECT * FROM trades 
-                WHERE trader_id = ?
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (trader_id, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM trades 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-        
-        trades = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        trades = database.list_trades(limit, trader_id, symbol, action, since, until, before_id=cursor)
         
         return {
             "code": 0,
             "message": "success",
-            "data": trades
+            "data": trades,
+            "next_cursor": trades[-1]['id'] if len(trades) == limit else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# 初始化数据库
-try:
-    init_database()
-except Exception as e:
-    print(f"数据库初始化警告: {e}")
+@router.get("/trades/export")
+def export_trades(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    trader_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+    action: Optional[str] = Query(None, pattern="^(buy|sell)$"),
+    since: Optional[int] = Query(None, description="起始时间（毫秒时间戳）"),
+    until: Optional[int] = Query(None, description="结束时间（毫秒时间戳）")
+):
+    """
+    导出交易历史（按时间正序，流式输出）
+    
+    逐批从数据库读取并立即写出，百万行导出的内存占用也是常数。
+    
+    Args:
+        format: csv 或 ndjson（每行一个JSON）
+        其余参数同 /api/trades
+    """
+    batches = database.iter_trades(trader_id, symbol, action, since, until, batch_size=EXPORT_BATCH_SIZE)
+    filename = f"trades_{trader_id or 'all'}_{time.strftime('%Y%m%d%H%M%S')}.{format}"
+    
+    if format == 'ndjson':
+        body = (''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows) for rows in batches)
+        media_type = 'application/x-ndjson'
+    else:
+        body = _csv_chunks(batches)
+        media_type = 'text/csv'
+    
+    return StreamingResponse(body, media_type=media_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+def _csv_chunks(batches: Iterator[List[Dict]]) -> Iterator[str]:
+    """把分批的交易记录渲染为CSV文本块（首块带表头）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TRADE_EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows([row.get(column) for column in TRADE_EXPORT_COLUMNS] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # 没有任何记录时也输出表头
+    if buffer.tell():
+        yield buffer.getvalue()
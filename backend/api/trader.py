@@ -1,8 +1,9 @@
 """交易员管理API"""
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
-from core.trader import trader_engine
+from core.container import container
 import time
 
 
@@ -28,18 +29,21 @@ async def create_trader(request: TraderCreate):
     
     参数:
     - name: 交易员名称
-    - strategy: 策略类型（grid）
+    - strategy: 策略类型（grid 轮询价格吃单 / ladder 在盘口两侧挂多档限价单）
     - symbol: 交易对（BTC/USDT）
     - config: 策略配置
         - amount: 每次交易数量（默认0.0005 BTC）
         - grid_gap: 网格间隔百分比（默认2%）
+        - grid_mode: fixed（默认）/ atr / volatility，自适应模式按ATR或波动率调整间隔
+        - gap_multiplier / gap_min / gap_max: 自适应间隔 = 指标 × 倍数，限制在上下限之间（默认 3 / 0.5% / 5%）
         - check_interval: 检查间隔秒数（默认60秒）
+        - levels: 挂单网格每侧档数（默认5，仅 ladder）
     """
     # 生成交易员ID
     trader_id = f"trader_{int(time.time())}"
     
     try:
-        trader = trader_engine.create_trader(
+        trader = container.engine.create_trader(
             trader_id=trader_id,
             name=request.name,
             strategy=request.strategy,
@@ -52,6 +56,8 @@ async def create_trader(request: TraderCreate):
             "message": "交易员创建成功",
             "data": trader
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -60,7 +66,7 @@ async def create_trader(request: TraderCreate):
 async def list_traders():
     """获取所有交易员"""
     try:
-        traders = trader_engine.list_traders()
+        traders = container.engine.list_traders()
         return {
             "code": 0,
             "message": "success",
@@ -73,14 +79,14 @@ async def list_traders():
 @router.get("/{trader_id}")
 async def get_trader(trader_id: str):
     """获取交易员详情"""
-    trader = trader_engine.get_trader(trader_id)
+    trader = container.engine.get_trader(trader_id)
     
     if not trader:
         raise HTTPException(status_code=404, detail="交易员不存在")
     
     # 添加实时运行状态
-    if trader_id in trader_engine.strategies:
-        trader['runtime_status'] = trader_engine.strategies[trader_id].get_status()
+    if trader_id in container.engine.strategies:
+        trader['runtime_status'] = container.engine.strategies[trader_id].get_status()
     
     return {
         "code": 0,
@@ -92,7 +98,7 @@ async def get_trader(trader_id: str):
 @router.post("/{trader_id}/start")
 async def start_trader(trader_id: str):
     """启动交易员"""
-    success = trader_engine.start_trader(trader_id)
+    success = container.engine.start_trader(trader_id)
     
     if not success:
         raise HTTPException(status_code=400, detail="启动失败，交易员可能已在运行或不存在")
@@ -107,7 +113,8 @@ async def start_trader(trader_id: str):
 @router.post("/{trader_id}/stop")
 async def stop_trader(trader_id: str):
     """停止交易员"""
-    success = trader_engine.stop_trader(trader_id)
+    # 停止会等待正在执行的tick和交易写入（各最多5秒），放到线程中执行，不阻塞事件循环
+    success = await asyncio.to_thread(container.engine.stop_trader, trader_id)
     
     if not success:
         raise HTTPException(status_code=400, detail="停止失败，交易员可能未运行")
@@ -122,7 +129,8 @@ async def stop_trader(trader_id: str):
 @router.delete("/{trader_id}")
 async def delete_trader(trader_id: str):
     """删除交易员"""
-    success = trader_engine.delete_trader(trader_id)
+    # 运行中的交易员会先停止，同样放到线程中执行
+    success = await asyncio.to_thread(container.engine.delete_trader, trader_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="交易员不存在")
@@ -147,27 +155,19 @@ async def get_trader_pnl(trader_id: str):
     - total_cost: 总成本
     - current_value: 当前价值
     """
-    from core.exchange import GateIOExchange
-    from config import settings
-    import sqlite3
+    from core import database
+    from core.ledger import compute_pnl
     
     # 检查交易员是否存在
-    trader = trader_engine.get_trader(trader_id)
+    trader = container.engine.get_trader(trader_id)
     if not trader:
         raise HTTPException(status_code=404, detail="交易员不存在")
     
     try:
-        # 1. 从数据库获取所有交易记录
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT action, price, amount FROM trades WHERE trader_id = ? ORDER BY id",
-            (trader_id,)
-        )
-        trades = cursor.fetchall()
-        conn.close()
+        # 1. 从持仓账本读取累计数据（O(1)，不再扫描交易历史）
+        ledger = database.get_trader_ledger(trader_id)
         
-        if not trades:
+        if not ledger['trade_count']:
             return {
                 "code": 0,
                 "data": {
@@ -182,66 +182,25 @@ async def get_trader_pnl(trader_id: str):
                 }
             }
         
-        # 2. 计算持仓和成本
-        total_bought = 0.0  # 总买入数量
-        total_buy_cost = 0.0  # 总买入成本
-        total_sold = 0.0  # 总卖出数量
-        total_sell_revenue = 0.0  # 总卖出收入
-        
-        for trade in trades:
-            if trade[0] == 'buy':
-                total_bought += trade[2]
-                total_buy_cost += trade[1] * trade[2]
-            elif trade[0] == 'sell':
-                total_sold += trade[2]
-                total_sell_revenue += trade[1] * trade[2]
-        
-        # 3. 当前持仓
-        current_position = total_bought - total_sold
-        
-        # 4. 已实现盈亏（已卖出部分）
-        if total_sold > 0:
-            avg_buy_price = total_buy_cost / total_bought if total_bought > 0 else 0
-            realized_pnl = total_sell_revenue - (avg_buy_price * total_sold)
-        else:
-            realized_pnl = 0.0
-        
-        # 5. 未实现盈亏（当前持仓）
-        unrealized_pnl = 0.0
+        # 2. 有持仓时获取当前市场价格
         current_price = 0.0
-        current_value = 0.0
-        
-        if current_position > 0:
-            # 获取当前市场价格
-            exchange = GateIOExchange(settings.gate_api_key, settings.gate_api_secret, testnet=settings.gate_testnet)
-            ticker = exchange.get_ticker(trader['symbol'])
+        if ledger['position'] > 0:
+            ticker = await container.exchange.get_ticker(trader['symbol'])
             current_price = ticker['last']
-            
-            # 当前持仓的平均成本
-            remaining_cost = total_buy_cost - (total_buy_cost / total_bought * total_sold) if total_bought > 0 else 0
-            
-            # 当前持仓的市场价值
-            current_value = current_position * current_price
-            
-            # 未实现盈亏 = 当前价值 - 剩余成本
-            unrealized_pnl = current_value - remaining_cost
-        
-        # 6. 总盈亏
-        total_pnl = realized_pnl + unrealized_pnl
         
-        # 7. 盈亏率
-        pnl_pct = (total_pnl / total_buy_cost * 100) if total_buy_cost > 0 else 0.0
+        # 3. 计算已实现/未实现盈亏
+        pnl = compute_pnl(ledger, current_price)
         
         return {
             "code": 0,
             "data": {
-                "realized_pnl": round(realized_pnl, 2),
-                "unrealized_pnl": round(unrealized_pnl, 2),
-                "total_pnl": round(total_pnl, 2),
-                "pnl_pct": round(pnl_pct, 2),
-                "total_cost": round(total_buy_cost, 2),
-                "current_value": round(current_value, 2),
-                "current_position": current_position,
+                "realized_pnl": round(pnl['realized_pnl'], 2),
+                "unrealized_pnl": round(pnl['unrealized_pnl'], 2),
+                "total_pnl": round(pnl['total_pnl'], 2),
+                "pnl_pct": round(pnl['pnl_pct'], 2),
+                "total_cost": round(pnl['total_cost'], 2),
+                "current_value": round(pnl['current_value'], 2),
+                "current_position": pnl['current_position'],
                 "current_price": round(current_price, 2) if current_price > 0 else 0.0
             }
         }
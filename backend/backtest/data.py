@@ -0,0 +1,89 @@
+"""
+回测数据加载
+支持本地CSV文件：
+- OHLCV K线: timestamp,open,high,low,close,volume
+- 逐笔/tick: timestamp,price[,amount]
+以及本地K线存储（core.candles，可先从交易所增量同步）
+"""
+import csv
+from typing import Dict, List, Optional
+
+
+# 价格列优先级：K线用close，tick用price/last
+PRICE_FIELDS = ('close', 'price', 'last')
+
+
+def load_prices(path: str, price_field: Optional[str] = None) -> Dict[str, List[float]]:
+    """
+    从CSV加载价格序列
+    
+    Args:
+        path: CSV文件路径（第一行为表头）
+        price_field: 价格列名，默认按 close/price/last 自动识别
+    
+    Returns:
+        {'timestamp': [...], 'price': [...]}，另外包含文件中存在的 high/low/volume 列
+    """
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        
+        if price_field is None:
+            price_field = next((name for name in PRICE_FIELDS if name in header), None)
+            if price_field is None:
+                raise ValueError(f"{path} 缺少价格列（{'/'.join(PRICE_FIELDS)}）")
+        
+        price_idx = header.index(price_field)
+        ts_idx = header.index('timestamp') if 'timestamp' in header else None
+        extra = {name: header.index(name) for name in ('high', 'low', 'volume') if name in header}
+        
+        timestamps: List[float] = []
+        prices: List[float] = []
+        columns: Dict[str, List[float]] = {name: [] for name in extra}
+        
+        for row in reader:
+            if not row:
+                continue
+            prices.append(float(row[price_idx]))
+            timestamps.append(float(row[ts_idx]) if ts_idx is not None else len(timestamps))
+            for name, idx in extra.items():
+                columns[name].append(float(row[idx]))
+    
+    data = {'timestamp': timestamps, 'price': prices}
+    data.update(columns)
+    return data
+
+
+def load_candles(symbol: str, timeframe: str = '1m', since: Optional[int] = None, until: Optional[int] = None,
+                 sync: bool = False) -> Dict[str, List[float]]:
+    """
+    从本地K线存储加载价格序列（收盘价）
+    
+    Args:
+        symbol: 交易对
+        timeframe: K线周期
+        since / until: 开盘时间区间（毫秒时间戳）
+        sync: 读取前先从交易所增量同步（主网公开行情，无需API密钥）
+    
+    Returns:
+        与 load_prices 相同的列：{'timestamp', 'price', 'high', 'low', 'volume'}
+    """
+    from core.candles import candle_store
+    from core.container import container
+    
+    container.init_database()
+    if sync:
+        exchange = container.registry.get_sync(api_key='', api_secret='', testnet=False)
+        written = candle_store.sync(exchange, symbol, timeframe, since)
+        print(f"✅ 已同步 {written} 根 {symbol} {timeframe} K线")
+    
+    candles = candle_store.read(symbol, timeframe, since, until)
+    if not len(candles['close']):
+        raise ValueError(f"本地没有 {symbol} {timeframe} K线（使用 --sync 从交易所同步）")
+    return {
+        'timestamp': candles['timestamp'].tolist(),
+        'price': candles['close'].tolist(),
+        'high': candles['high'].tolist(),
+        'low': candles['low'].tolist(),
+        'volume': candles['volume'].tolist()
+    }
@@ -0,0 +1,252 @@
+"""
+网格策略回测引擎
+按顺序回放历史价格，用与实盘 GridStrategy 相同的信号/止损止盈/区间判断在模拟交易所成交，
+输出交易明细、盈亏、最大回撤和成交额等统计。
+
+用法:
+    python -m backtest.engine data/btc_1m.csv --config '{"grid_gap": 1.5, "amount": 0.001}'
+    python -m backtest.engine --symbol BTC/USDT --timeframe 1h --sync --config '{"grid_gap": 1.5}'
+    python -m backtest.engine data/btc_1m.csv --config '{"grid_mode": "atr", "gap_multiplier": 3, "gap_min": 0.5}'
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from backtest.data import load_candles, load_prices
+from backtest.exchange import SimulatedExchange
+from core.exchange import FEE_RATE
+from core.indicators import SymbolIndicators
+from core.ledger import apply_trade, compute_pnl, new_entry
+from strategy.grid import ADAPTIVE_INDICATORS, adaptive_gap, grid_params, grid_signal, in_grid_range, stop_trigger
+
+
+def indicator_series(prices: Sequence[float], grid_mode: str, highs: Optional[Sequence[float]] = None,
+                     lows: Optional[Sequence[float]] = None) -> List[Optional[float]]:
+    """
+    自适应网格在每根K线上可用的指标值（百分比，未预热为 None）
+    
+    用与实盘相同的 SymbolIndicators 逐根递推。与实盘一样只使用已收盘的K线：
+    第 i 个值由第 0..i-1 根计算，不包含当前价格本身。
+    
+    Args:
+        prices: 收盘价序列
+        grid_mode: atr / volatility
+        highs / lows: 最高/最低价（没有时按收盘价计算，ATR 退化为相邻收盘价之差）
+    """
+    name = ADAPTIVE_INDICATORS[grid_mode]
+    state = SymbolIndicators('backtest', 1)
+    values: List[Optional[float]] = [None] * len(prices)
+    for i in range(len(prices) - 1):
+        close = prices[i]
+        high = highs[i] if highs is not None else close
+        low = lows[i] if lows is not None else close
+        state.add_bar(i, close, high, low, close, 0.0)
+        values[i + 1] = getattr(state, name)
+    return values
+
+
+def run_backtest(prices: Sequence[float], config: Dict[str, Any], timestamps: Optional[Sequence[float]] = None,
+                 symbol: str = 'BTC/USDT', initial_quote: float = 1000.0, fee_rate: float = FEE_RATE,
+                 slippage_pct: float = 0.05, record_trades: bool = True, highs: Optional[Sequence[float]] = None,
+                 lows: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """
+    回放价格序列执行网格策略
+    
+    Args:
+        prices: 价格序列（K线收盘价或逐笔成交价）
+        config: 策略配置（与创建交易员时的 config 相同）
+        timestamps: 与价格对应的时间戳，默认使用序号
+        symbol: 交易对
+        initial_quote: 初始资金（USDT）
+        fee_rate: 手续费率
+        slippage_pct: 滑点百分比
+        record_trades: 是否返回逐笔交易明细（参数扫描时关闭以节省内存）
+        highs / lows: 最高/最低价（自适应网格计算ATR用，可选）
+    
+    Returns:
+        回测报告
+    """
+    params = grid_params(config)
+    amount = params['amount']
+    grid_gap = params['grid_gap']
+    stop_loss_pct = params['stop_loss_pct']
+    take_profit_pct = params['take_profit_pct']
+    grid_min = params['grid_min']
+    grid_max = params['grid_max']
+    max_position = params['max_position']
+    check_stops = stop_loss_pct is not None or take_profit_pct is not None
+    check_range = grid_min is not None or grid_max is not None
+    
+    # 自适应网格：逐根的网格间隔只取决于价格序列，预先算好
+    gaps = None
+    if params['grid_mode'] != 'fixed':
+        gaps = [
+            adaptive_gap(value, params['grid_mode'], grid_gap, params['gap_multiplier'], params['gap_min'],
+                         params['gap_max'])
+            for value in indicator_series(prices, params['grid_mode'], highs, lows)
+        ]
+    
+    exchange = SimulatedExchange(symbol, initial_quote=initial_quote, fee_rate=fee_rate, slippage_pct=slippage_pct)
+    ledger = new_entry()
+    trades: List[Dict[str, Any]] = []
+    
+    last_price = None
+    last_action = None
+    position = 0.0
+    buys = 0
+    sells = 0
+    stop_reason = None
+    peak_equity = initial_quote
+    max_drawdown = 0.0
+    
+    started = time.perf_counter()
+    bars = 0
+    
+    for i, price in enumerate(prices):
+        bars += 1
+        timestamp = timestamps[i] if timestamps is not None else i
+        exchange.price = price
+        exchange.timestamp = timestamp
+        
+        # 权益与回撤（每根K线）
+        equity = exchange.quote_balance + exchange.base_balance * price
+        if equity > peak_equity:
+            peak_equity = equity
+        elif peak_equity > 0:
+            drawdown = (peak_equity - equity) / peak_equity
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+        
+        # 第一次运行，记录初始价格
+        if last_price is None:
+            last_price = price
+            continue
+        
+        # 止损止盈（与 GridStrategy._check_stop_conditions 相同的账本口径）
+        if check_stops and position > 0 and ledger['buy_cost'] > 0:
+            pnl_pct = compute_pnl(ledger, price)['pnl_pct']
+            trigger = stop_trigger(pnl_pct, stop_loss_pct, take_profit_pct)
+            if trigger:
+                try:
+                    result = exchange.fill('sell', position)
+                    apply_trade(ledger, 'sell', result['price'], result['amount'], result['fee'])
+                    position = 0.0
+                    sells += 1
+                    if record_trades:
+                        trades.append(result)
+                except ValueError:
+                    pass
+                stop_reason = trigger
+                break
+        
+        # 网格区间保护
+        if check_range and not in_grid_range(price, grid_min, grid_max):
+            continue
+        
+        price_change_pct = (price - last_price) / last_price * 100
+        signal = grid_signal(price_change_pct, gaps[i] if gaps is not None else grid_gap, last_action)
+        if signal is None:
+            continue
+        
+        if signal == 'buy':
+            if max_position and position >= max_position:
+                continue
+            if exchange.quote_balance < amount * price:
+                continue
+        elif position < amount:
+            # 现货不能卖空
+            continue
+        
+        try:
+            result = exchange.fill(signal, amount)
+        except ValueError:
+            # 计入手续费和滑点后余额不足
+            continue
+        
+        apply_trade(ledger, signal, result['price'], amount, result['fee'])
+        position = ledger['position']
+        last_price = price
+        last_action = signal
+        if signal == 'buy':
+            buys += 1
+        else:
+            sells += 1
+        if record_trades:
+            trades.append(result)
+    
+    elapsed = time.perf_counter() - started
+    report = build_report(config, exchange, ledger, bars, buys, sells, max_drawdown, stop_reason, initial_quote)
+    report['elapsed'] = elapsed
+    report['bars_per_sec'] = bars / elapsed if elapsed > 0 else 0.0
+    if record_trades:
+        report['trade_list'] = trades
+    return report
+
+
+def build_report(config: Dict[str, Any], exchange: SimulatedExchange, ledger: Dict[str, float], bars: int,
+                 buys: int, sells: int, max_drawdown: float, stop_reason: Optional[str],
+                 initial_quote: float) -> Dict[str, Any]:
+    """根据回放结束时的模拟交易所和账本生成回测报告（逐根回放与向量化回放共用）"""
+    final_price = exchange.price
+    pnl = compute_pnl(ledger, final_price)
+    final_equity = exchange.equity()
+    round_trips = min(buys, sells)
+    
+    return {
+        'symbol': exchange.symbol,
+        'config': config,
+        'bars': bars,
+        'trades': int(ledger['trade_count']),
+        'buys': buys,
+        'sells': sells,
+        'final_price': final_price,
+        'position': ledger['position'],
+        'realized_pnl': pnl['realized_pnl'],
+        'unrealized_pnl': pnl['unrealized_pnl'],
+        'total_pnl': pnl['total_pnl'],
+        'pnl_pct': pnl['pnl_pct'],
+        'fees': exchange.total_fees,
+        'turnover': exchange.turnover,
+        'round_trips': round_trips,
+        'pnl_per_round_trip': pnl['realized_pnl'] / round_trips if round_trips else 0.0,
+        'initial_equity': initial_quote,
+        'final_equity': final_equity,
+        'return_pct': (final_equity - initial_quote) / initial_quote * 100 if initial_quote else 0.0,
+        'max_drawdown_pct': max_drawdown * 100,
+        'stop_reason': stop_reason
+    }
+
+
+def main():
+    """命令行入口：回放CSV并打印报告"""
+    parser = argparse.ArgumentParser(description='网格策略历史回测')
+    parser.add_argument('csv', nargs='?', help='OHLCV或逐笔CSV文件（省略时读取本地K线存储）')
+    parser.add_argument('--config', default='{}', help='策略配置JSON')
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--capital', type=float, default=1000.0, help='初始资金(USDT)')
+    parser.add_argument('--fee', type=float, default=FEE_RATE, help='手续费率')
+    parser.add_argument('--slippage', type=float, default=0.05, help='滑点百分比')
+    parser.add_argument('--price-field', default=None, help='价格列名')
+    parser.add_argument('--timeframe', default='1m', help='K线周期（读取本地K线存储时）')
+    parser.add_argument('--since', type=int, default=None, help='起始时间（毫秒时间戳，读取本地K线存储时）')
+    parser.add_argument('--until', type=int, default=None, help='结束时间（毫秒时间戳，读取本地K线存储时）')
+    parser.add_argument('--sync', action='store_true', help='读取前从交易所增量同步K线')
+    parser.add_argument('--trades', action='store_true', help='输出逐笔交易')
+    args = parser.parse_args()
+    
+    if args.csv:
+        data = load_prices(args.csv, args.price_field)
+    else:
+        data = load_candles(args.symbol, args.timeframe, args.since, args.until, sync=args.sync)
+    report = run_backtest(
+        data['price'], json.loads(args.config), timestamps=data['timestamp'], symbol=args.symbol,
+        initial_quote=args.capital, fee_rate=args.fee, slippage_pct=args.slippage, record_trades=args.trades,
+        highs=data.get('high'), lows=data.get('low')
+    )
+    
+    print(f"📊 回测完成: {report['bars']:,} 根K线, 耗时 {report['elapsed']:.2f}秒 ({report['bars_per_sec']:,.0f} 根/秒)")
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
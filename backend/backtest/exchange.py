@@ -0,0 +1,126 @@
+"""
+回测用模拟交易所
+按当前回放价格即时成交，计入手续费和滑点；接口与 GateIOExchange 保持一致
+"""
+from typing import Dict, Optional
+from core.exchange import FEE_RATE
+
+
+class SimulatedExchange:
+    """模拟交易所（单交易对、即时成交）"""
+    
+    def __init__(self, symbol: str = 'BTC/USDT', initial_quote: float = 1000.0, initial_base: float = 0.0,
+                 fee_rate: float = FEE_RATE, slippage_pct: float = 0.05):
+        """
+        初始化模拟交易所
+        
+        Args:
+            symbol: 交易对
+            initial_quote: 初始计价币余额（USDT）
+            initial_base: 初始基础币余额（BTC）
+            fee_rate: 手续费率（0.0015表示0.15%）
+            slippage_pct: 滑点百分比（0.05表示0.05%），买入价上浮、卖出价下浮
+        """
+        self.symbol = symbol
+        self.base, self.quote = symbol.split('/')
+        self.fee_rate = fee_rate
+        self.slippage = slippage_pct / 100
+        
+        self.quote_balance = initial_quote
+        self.base_balance = initial_base
+        self.price = 0.0
+        self.timestamp = 0
+        
+        # 统计
+        self.turnover = 0.0  # 累计成交额
+        self.total_fees = 0.0
+        self.order_count = 0
+    
+    def set_price(self, price: float, timestamp: int = 0):
+        """推进回放价格"""
+        self.price = price
+        self.timestamp = timestamp
+    
+    def fill(self, action: str, amount: float) -> Dict:
+        """
+        按当前价格即时成交
+        
+        Args:
+            action: buy 或 sell
+            amount: 成交数量
+        
+        Returns:
+            与 GateIOExchange.market_buy/market_sell 相同格式的订单信息
+        
+        Raises:
+            ValueError: 余额或持仓不足
+        """
+        if action == 'buy':
+            price = self.price * (1 + self.slippage)
+            cost = amount * price
+            fee = cost * self.fee_rate
+            if cost + fee > self.quote_balance + 1e-12:
+                raise ValueError(f"{self.quote}余额不足")
+            self.quote_balance -= cost + fee
+            self.base_balance += amount
+        else:  # sell
+            price = self.price * (1 - self.slippage)
+            cost = amount * price
+            fee = cost * self.fee_rate
+            if amount > self.base_balance + 1e-12:
+                raise ValueError(f"{self.base}持仓不足")
+            self.base_balance -= amount
+            self.quote_balance += cost - fee
+        
+        self.turnover += cost
+        self.total_fees += fee
+        self.order_count += 1
+        
+        return {
+            'order_id': f"sim_{self.order_count}",
+            'symbol': self.symbol,
+            'action': action,
+            'amount': amount,
+            'price': price,
+            'cost': cost,
+            'fee': fee,
+            'timestamp': self.timestamp,
+            'simulated': True
+        }
+    
+    def equity(self) -> float:
+        """按当前价格计算的账户总权益（计价币）"""
+        return self.quote_balance + self.base_balance * self.price
+    
+    # ===== GateIOExchange 兼容接口 =====
+    
+    def get_ticker(self, symbol: str = 'BTC/USDT') -> Dict:
+        """获取当前回放行情"""
+        return {
+            'symbol': symbol,
+            'last': self.price,
+            'bid': self.price,
+            'ask': self.price,
+            'high': self.price,
+            'low': self.price,
+            'volume': 0
+        }
+    
+    def get_balance(self, currency: Optional[str] = None) -> Dict:
+        """获取模拟余额"""
+        balances = {
+            self.quote: {'free': self.quote_balance, 'used': 0.0, 'total': self.quote_balance},
+            self.base: {'free': self.base_balance, 'used': 0.0, 'total': self.base_balance}
+        }
+        if currency:
+            balance = balances.get(currency, {'free': 0.0, 'used': 0.0, 'total': 0.0})
+            return {'currency': currency, **balance}
+        return balances
+    
+    def market_buy(self, symbol: str, amount: float) -> Dict:
+        """市价买入"""
+        return self.fill('buy', amount)
+    
+    def market_sell(self, symbol: str, amount: float) -> Dict:
+        """市价卖出"""
+        return self.fill('sell', amount)
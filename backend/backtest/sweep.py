@@ -0,0 +1,270 @@
+"""
+网格参数扫描
+对同一段价格序列批量回测多组参数（向量化回放 + 多进程），按指标排序输出结果表。
+结果按 数据哈希 + 参数 缓存到 data/backtest_cache/，重复扫描只计算新增的参数组合。
+
+用法:
+    python -m backtest.sweep data/btc_1m.csv --grid '{"grid_gap": [0.5, 1, 2], "stop_loss_pct": [null, -5]}'
+    python -m backtest.sweep data/btc_1m.csv --grid '{"grid_mode": ["fixed", "atr"], "gap_multiplier": [2, 3, 5]}'
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from backtest.data import load_candles, load_prices
+from backtest.vectorized import adaptive_indicators, run_backtest_vectorized
+from core.exchange import FEE_RATE
+from strategy.grid import ADAPTIVE_INDICATORS
+
+
+# 回测逻辑变化时递增，使旧缓存失效
+CACHE_VERSION = 2
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'backtest_cache')
+
+# 越小越好的排序指标
+ASCENDING_METRICS = ('max_drawdown_pct', 'fees', 'turnover')
+
+# 结果表中保留的指标
+RESULT_FIELDS = (
+    'trades', 'buys', 'sells', 'position', 'realized_pnl', 'unrealized_pnl', 'total_pnl', 'pnl_pct',
+    'fees', 'turnover', 'round_trips', 'pnl_per_round_trip', 'final_equity', 'return_pct', 'max_drawdown_pct',
+    'stop_reason'
+)
+
+# 工作进程共享的价格序列（进程启动时传入一次，避免每个任务重复序列化）
+_worker_prices: Optional[np.ndarray] = None
+_worker_highs: Optional[np.ndarray] = None
+_worker_lows: Optional[np.ndarray] = None
+
+# 工作进程内按网格模式缓存的自适应指标序列（只取决于价格，同一模式的配置共用）
+_worker_indicators: Dict[str, np.ndarray] = {}
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]], base: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    把参数网格展开为配置列表
+    
+    Args:
+        grid: 参数名 -> 候选值列表，如 {'grid_gap': [1, 2], 'stop_loss_pct': [None, -5]}
+        base: 所有配置共用的固定参数
+    """
+    names = list(grid)
+    configs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = dict(base or {})
+        config.update({name: value for name, value in zip(names, values) if value is not None})
+        configs.append(config)
+    return configs
+
+
+def data_hash(prices: np.ndarray, *extra: Optional[np.ndarray]) -> str:
+    """价格序列（及最高/最低价等附加列）的内容哈希"""
+    digest = hashlib.sha1(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+    for column in extra:
+        if column is not None:
+            digest.update(np.ascontiguousarray(column, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def params_key(config: Dict[str, Any], initial_quote: float, fee_rate: float, slippage_pct: float) -> str:
+    """参数的缓存键（配置 + 资金/费率/滑点）"""
+    return json.dumps({
+        'config': config,
+        'capital': initial_quote,
+        'fee': fee_rate,
+        'slippage': slippage_pct,
+        'version': CACHE_VERSION
+    }, sort_keys=True)
+
+
+def _load_cache(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取缓存文件（不存在或损坏时返回空）"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path: str, cache: Dict[str, Dict[str, Any]]):
+    """原子写入缓存文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(prices: np.ndarray, highs: Optional[np.ndarray] = None, lows: Optional[np.ndarray] = None):
+    """工作进程初始化：保存价格序列"""
+    global _worker_prices, _worker_highs, _worker_lows
+    _worker_prices = prices
+    _worker_highs = highs
+    _worker_lows = lows
+    _worker_indicators.clear()
+
+
+def _run_batch(batch: List[Dict[str, Any]], symbol: str, initial_quote: float, fee_rate: float,
+               slippage_pct: float) -> List[Dict[str, Any]]:
+    """在工作进程中回测一批配置"""
+    results = []
+    for config in batch:
+        grid_mode = config.get('grid_mode', 'fixed')
+        indicators = None
+        if grid_mode in ADAPTIVE_INDICATORS:
+            indicators = _worker_indicators.get(grid_mode)
+            if indicators is None:
+                indicators = _worker_indicators[grid_mode] = adaptive_indicators(
+                    _worker_prices, grid_mode, _worker_highs, _worker_lows
+                )
+        report = run_backtest_vectorized(
+            _worker_prices, config, symbol=symbol, initial_quote=initial_quote,
+            fee_rate=fee_rate, slippage_pct=slippage_pct, indicators=indicators
+        )
+        results.append({field: report[field] for field in RESULT_FIELDS})
+    return results
+
+
+def run_sweep(prices: Sequence[float], configs: List[Dict[str, Any]], symbol: str = 'BTC/USDT',
+              initial_quote: float = 1000.0, fee_rate: float = FEE_RATE, slippage_pct: float = 0.05,
+              sort_by: str = 'return_pct', workers: Optional[int] = None, use_cache: bool = True,
+              cache_dir: str = CACHE_DIR, highs: Optional[Sequence[float]] = None,
+              lows: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """
+    批量回测参数组合并排序
+    
+    Args:
+        prices: 价格序列
+        configs: 策略配置列表（可用 expand_grid 生成）
+        symbol: 交易对
+        initial_quote: 初始资金（USDT）
+        fee_rate: 手续费率
+        slippage_pct: 滑点百分比
+        sort_by: 排序指标（max_drawdown_pct/fees/turnover 升序，其余降序）
+        workers: 进程数，默认CPU核数；1表示在当前进程内执行
+        use_cache: 是否使用结果缓存
+        cache_dir: 缓存目录
+        highs / lows: 最高/最低价（自适应网格计算ATR用，可选）
+    
+    Returns:
+        {'data_hash', 'bars', 'total', 'cached', 'computed', 'elapsed', 'results': [按排序的结果行]}
+    """
+    started = time.time()
+    prices = np.asarray(prices, dtype=np.float64)
+    highs = None if highs is None else np.asarray(highs, dtype=np.float64)
+    lows = None if lows is None else np.asarray(lows, dtype=np.float64)
+    digest = data_hash(prices, highs, lows)
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    cache = _load_cache(cache_path) if use_cache else {}
+    
+    keys = [params_key(config, initial_quote, fee_rate, slippage_pct) for config in configs]
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: List[Dict[str, Any]] = []
+    pending_keys: List[str] = []
+    for key, config in zip(keys, configs):
+        if key in cache:
+            results[key] = cache[key]
+        elif key not in results:
+            results[key] = None  # 占位，同一参数只计算一次
+            pending.append(config)
+            pending_keys.append(key)
+    cached = len(configs) - len(pending)
+    
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, len(pending))
+        # 每个进程分到若干批，兼顾负载均衡和进程间通信开销
+        batch_size = max(1, len(pending) // (workers * 4))
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        
+        if workers == 1:
+            _init_worker(prices, highs, lows)
+            batch_results = [_run_batch(batch, symbol, initial_quote, fee_rate, slippage_pct) for batch in batches]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(prices, highs, lows)) as pool:
+                futures = [
+                    pool.submit(_run_batch, batch, symbol, initial_quote, fee_rate, slippage_pct)
+                    for batch in batches
+                ]
+                batch_results = [future.result() for future in futures]
+        
+        computed = [row for rows in batch_results for row in rows]
+        for key, row in zip(pending_keys, computed):
+            results[key] = row
+            cache[key] = row
+        
+        if use_cache:
+            _save_cache(cache_path, cache)
+    
+    reverse = sort_by not in ASCENDING_METRICS
+    rows = [{'config': config, **results[key]} for key, config in zip(keys, configs)]
+    rows.sort(key=lambda row: row[sort_by], reverse=reverse)
+    for rank, row in enumerate(rows, 1):
+        row['rank'] = rank
+    
+    return {
+        'data_hash': digest,
+        'bars': len(prices),
+        'total': len(configs),
+        'cached': cached,
+        'computed': len(pending),
+        'sort_by': sort_by,
+        'elapsed': time.time() - started,
+        'results': rows
+    }
+
+
+def main():
+    """命令行入口：参数扫描并打印排名"""
+    parser = argparse.ArgumentParser(description='网格策略参数扫描')
+    parser.add_argument('csv', nargs='?', help='OHLCV或逐笔CSV文件（省略时读取本地K线存储）')
+    parser.add_argument('--grid', required=True, help='参数网格JSON，如 {"grid_gap": [1, 2]}')
+    parser.add_argument('--base', default='{}', help='固定参数JSON')
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--capital', type=float, default=1000.0, help='初始资金(USDT)')
+    parser.add_argument('--fee', type=float, default=FEE_RATE, help='手续费率')
+    parser.add_argument('--slippage', type=float, default=0.05, help='滑点百分比')
+    parser.add_argument('--price-field', default=None, help='价格列名')
+    parser.add_argument('--timeframe', default='1m', help='K线周期（读取本地K线存储时）')
+    parser.add_argument('--since', type=int, default=None, help='起始时间（毫秒时间戳，读取本地K线存储时）')
+    parser.add_argument('--until', type=int, default=None, help='结束时间（毫秒时间戳，读取本地K线存储时）')
+    parser.add_argument('--sync', action='store_true', help='读取前从交易所增量同步K线')
+    parser.add_argument('--sort', default='return_pct', help='排序指标')
+    parser.add_argument('--top', type=int, default=20, help='显示前N名')
+    parser.add_argument('--workers', type=int, default=None, help='进程数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用缓存')
+    parser.add_argument('--output', default=None, help='完整结果输出到JSON文件')
+    args = parser.parse_args()
+    
+    if args.csv:
+        data = load_prices(args.csv, args.price_field)
+    else:
+        data = load_candles(args.symbol, args.timeframe, args.since, args.until, sync=args.sync)
+    configs = expand_grid(json.loads(args.grid), json.loads(args.base))
+    sweep = run_sweep(
+        data['price'], configs, symbol=args.symbol, initial_quote=args.capital, fee_rate=args.fee,
+        slippage_pct=args.slippage, sort_by=args.sort, workers=args.workers, use_cache=not args.no_cache,
+        highs=data.get('high'), lows=data.get('low')
+    )
+    
+    print(f"📊 参数扫描完成: {sweep['total']} 组参数 × {sweep['bars']:,} 根K线, "
+          f"缓存命中 {sweep['cached']}, 新计算 {sweep['computed']}, 耗时 {sweep['elapsed']:.2f}秒")
+    print(f"{'排名':>4}  {'收益率%':>9}  {'最大回撤%':>9}  {'交易数':>6}  {'手续费':>9}  参数")
+    for row in sweep['results'][:args.top]:
+        print(f"{row['rank']:>4}  {row['return_pct']:>9.2f}  {row['max_drawdown_pct']:>9.2f}  "
+              f"{row['trades']:>6}  {row['fees']:>9.2f}  {json.dumps(row['config'])}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(sweep, f, ensure_ascii=False, indent=2)
+        print(f"✅ 完整结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+向量化网格回测
+网格状态只在成交时改变，两次成交之间每根K线的判断都只依赖价格本身。
+因此可以用 NumPy 对一段价格批量计算止损止盈/区间/信号/余额条件，直接跳到下一个成交点，
+成交本身仍然走 SimulatedExchange 和账本，结果与 engine.run_backtest 逐根回放完全一致。
+"""
+from typing import Any, Dict, Optional
+import numpy as np
+from backtest.engine import build_report, indicator_series
+from backtest.exchange import SimulatedExchange
+from core.exchange import FEE_RATE
+from core.ledger import apply_trade, new_entry
+from strategy.grid import grid_params
+
+
+# 每次批量扫描的K线数：找不到成交点时翻倍，成交后回到初始值
+MIN_CHUNK = 256
+MAX_CHUNK = 65536
+
+
+def adaptive_indicators(prices: np.ndarray, grid_mode: str, highs: Optional[np.ndarray] = None,
+                        lows: Optional[np.ndarray] = None) -> np.ndarray:
+    """自适应网格的逐根指标序列（float64，未预热为 NaN），与 engine.indicator_series 逐值相同"""
+    values = indicator_series(
+        np.asarray(prices, dtype=np.float64).tolist(), grid_mode,
+        None if highs is None else np.asarray(highs, dtype=np.float64).tolist(),
+        None if lows is None else np.asarray(lows, dtype=np.float64).tolist()
+    )
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def run_backtest_vectorized(prices: np.ndarray, config: Dict[str, Any], symbol: str = 'BTC/USDT',
+                            initial_quote: float = 1000.0, fee_rate: float = FEE_RATE,
+                            slippage_pct: float = 0.05, highs: Optional[np.ndarray] = None,
+                            lows: Optional[np.ndarray] = None,
+                            indicators: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    向量化回放价格序列执行网格策略（不返回逐笔交易明细）
+    
+    Args:
+        prices: float64 价格数组
+        config: 策略配置
+        symbol: 交易对
+        initial_quote: 初始资金（USDT）
+        fee_rate: 手续费率
+        slippage_pct: 滑点百分比
+        highs / lows: 最高/最低价（自适应网格计算ATR用，可选）
+        indicators: 预先算好的自适应指标序列（NaN 表示未预热），参数扫描时同一模式的配置共用
+    
+    Returns:
+        与 run_backtest 相同字段的回测报告（不含耗时统计）
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    params = grid_params(config)
+    amount = params['amount']
+    grid_gap = params['grid_gap']
+    stop_loss_pct = params['stop_loss_pct']
+    take_profit_pct = params['take_profit_pct']
+    grid_min = params['grid_min']
+    grid_max = params['grid_max']
+    max_position = params['max_position']
+    check_stops = stop_loss_pct is not None or take_profit_pct is not None
+    
+    # 自适应网格：逐根的网格间隔只取决于价格序列（与 adaptive_gap 相同：未预热时为 grid_gap）
+    gaps = grid_gap
+    if params['grid_mode'] != 'fixed':
+        if indicators is None:
+            indicators = adaptive_indicators(prices, params['grid_mode'], highs, lows)
+        scaled = np.minimum(np.maximum(indicators * params['gap_multiplier'], params['gap_min']), params['gap_max'])
+        gaps = np.where(np.isnan(indicators), grid_gap, scaled)
+    
+    exchange = SimulatedExchange(symbol, initial_quote=initial_quote, fee_rate=fee_rate, slippage_pct=slippage_pct)
+    ledger = new_entry()
+    n = len(prices)
+    
+    buys = 0
+    sells = 0
+    stop_reason = None
+    peak_equity = initial_quote
+    max_drawdown = 0.0
+    bars = n
+    
+    if n == 0:
+        return build_report(config, exchange, ledger, 0, 0, 0, 0.0, None, initial_quote)
+    
+    # 区间掩码与状态无关，预先计算
+    in_range = None
+    if grid_min is not None or grid_max is not None:
+        in_range = np.ones(n, dtype=bool)
+        if grid_min is not None:
+            in_range &= prices >= grid_min
+        if grid_max is not None:
+            in_range &= prices <= grid_max
+    
+    # 买入成交价（含滑点）与交易所 fill 的计算顺序一致
+    buy_fill_cost = amount * (prices * (1 + exchange.slippage))
+    buy_fill_total = buy_fill_cost + buy_fill_cost * exchange.fee_rate
+    
+    last_price = prices[0]
+    last_action = None
+    position = 0.0
+    cursor = 1
+    chunk = MIN_CHUNK
+    
+    # 第一根K线只记录初始价格，权益为初始资金
+    exchange.price = float(prices[0])
+    
+    while cursor < n:
+        end = min(cursor + chunk, n)
+        p = prices[cursor:end]
+        
+        # 止损止盈（与 compute_pnl 相同的计算顺序）
+        stop_mask = None
+        if check_stops and position > 0 and ledger['buy_cost'] > 0:
+            total_bought = ledger['bought']
+            total_buy_cost = ledger['buy_cost']
+            if ledger['sold'] > 0:
+                avg_buy_price = total_buy_cost / total_bought if total_bought > 0 else 0
+                realized_pnl = ledger['sell_revenue'] - (avg_buy_price * ledger['sold'])
+            else:
+                realized_pnl = 0.0
+            remaining_cost = total_buy_cost - (total_buy_cost / total_bought * ledger['sold']) if total_bought > 0 else 0
+            unrealized = np.where(p > 0, position * p - remaining_cost, 0.0)
+            pnl_pct = (realized_pnl + unrealized) / total_buy_cost * 100
+            stop_mask = np.zeros(len(p), dtype=bool)
+            if stop_loss_pct is not None:
+                stop_mask |= pnl_pct <= stop_loss_pct
+            if take_profit_pct is not None:
+                stop_mask |= pnl_pct >= take_profit_pct
+        
+        # 网格信号（与 grid_signal 相同：买入优先）
+        change_pct = (p - last_price) / last_price * 100
+        gap = gaps if np.isscalar(gaps) else gaps[cursor:end]
+        buy_mask = change_pct <= -gap if last_action != 'buy' else np.zeros(len(p), dtype=bool)
+        sell_mask = (change_pct >= gap) & ~buy_mask if last_action != 'sell' else np.zeros(len(p), dtype=bool)
+        
+        # 买卖前置条件：最大持仓、余额（含手续费和滑点）、现货持仓
+        if max_position and position >= max_position:
+            buy_mask = np.zeros(len(p), dtype=bool)
+        else:
+            quote = exchange.quote_balance
+            buy_mask &= ~(quote < amount * p) & ~(buy_fill_total[cursor:end] > quote + 1e-12)
+        if position < amount or amount > exchange.base_balance + 1e-12:
+            sell_mask = np.zeros(len(p), dtype=bool)
+        
+        trade_mask = buy_mask | sell_mask
+        if in_range is not None:
+            trade_mask &= in_range[cursor:end]
+        event_mask = trade_mask if stop_mask is None else (trade_mask | stop_mask)
+        
+        hits = np.flatnonzero(event_mask)
+        last = int(hits[0]) if len(hits) else len(p) - 1
+        
+        # 成交点之前（含成交点）的权益与回撤，余额在这段内不变
+        equity = exchange.quote_balance + exchange.base_balance * p[:last + 1]
+        peaks = np.maximum.accumulate(np.concatenate(([peak_equity], equity)))[1:]
+        if peaks[-1] > 0:
+            drawdown = float(((peaks - equity) / peaks).max())
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+        peak_equity = float(peaks[-1])
+        
+        if not len(hits):
+            cursor = end
+            chunk = min(chunk * 2, MAX_CHUNK)
+            continue
+        
+        index = cursor + last
+        price = float(prices[index])
+        exchange.price = price
+        
+        if stop_mask is not None and stop_mask[last]:
+            pnl_now = float(pnl_pct[last])
+            stop_reason = 'stop_loss' if stop_loss_pct is not None and pnl_now <= stop_loss_pct else 'take_profit'
+            try:
+                result = exchange.fill('sell', position)
+                apply_trade(ledger, 'sell', result['price'], result['amount'], result['fee'])
+                position = 0.0
+                sells += 1
+            except ValueError:
+                pass
+            bars = index + 1
+            break
+        
+        signal = 'buy' if buy_mask[last] else 'sell'
+        try:
+            result = exchange.fill(signal, amount)
+            apply_trade(ledger, signal, result['price'], amount, result['fee'])
+            position = ledger['position']
+            last_price = prices[index]
+            last_action = signal
+            if signal == 'buy':
+                buys += 1
+            else:
+                sells += 1
+        except ValueError:
+            pass
+        
+        cursor = index + 1
+        chunk = MIN_CHUNK
+    else:
+        exchange.price = float(prices[-1])
+    
+    return build_report(config, exchange, ledger, bars, buys, sells, max_drawdown, stop_reason, initial_quote)
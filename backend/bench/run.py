@@ -0,0 +1,379 @@
+"""
+交易引擎与API热点路径的基准测试
+
+离线运行（本地模拟交易所 + 临时数据库），测量：
+- 网格策略单线程 tick 吞吐（ticks/s）
+- GET /api/traders 延迟（10 / 100 / 1000 个交易员）
+- GET /api/traders/{id}/pnl 延迟（1千 / 10万 / 100万 笔交易）
+- _save_trade 吞吐（提交到写入完成）
+- main.py 冷启动耗时、重启后 /api/health 可用的耗时
+
+结果以JSON输出，并与 bench/baseline.json 对比，退化超过容差时以非零状态码退出。
+基线与机器相关，更换部署机器后先用 --update-baseline 重新生成。
+
+用法（在 backend 目录下）：
+    python -m bench.run                       # 运行并与基线对比
+    python -m bench.run --quick               # 缩小规模（跳过100万笔交易和1000个交易员）
+    python -m bench.run --output result.json  # 保存结果
+    python -m bench.run --update-baseline     # 用本次结果覆盖基线
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'bench', 'baseline.json')
+
+# 默认容差：比基线差 25% 以上视为退化（延迟类指标在共享机器上波动较大）
+DEFAULT_TOLERANCE = 0.25
+
+# 毫秒级指标的噪声下限：绝对变化小于该值时不算退化
+NOISE_FLOOR_MS = 1.0
+
+
+def metric(value: float, unit: str, higher_is_better: bool) -> Dict:
+    """单项结果"""
+    return {'value': round(value, 3), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """百分位数（最近秩）"""
+    ordered = sorted(samples)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def time_requests(request: Callable[[], None], repeat: int, warmup: int = 5) -> List[float]:
+    """多次执行请求，返回每次耗时（毫秒）"""
+    for _ in range(warmup):
+        request()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽策略和引擎的打印输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def setup_environment(db_dir: str) -> Dict[str, str]:
+    """基准测试环境：本地模拟交易所（无延迟）+ 临时数据库，需在导入引擎前调用"""
+    env = {
+        'GATE_SIMULATOR': 'true',
+        'GATE_API_KEY': '',
+        'DATABASE_URL': f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+        'SIMULATOR_LATENCY_MS': '0',
+        'SIMULATOR_ERROR_RATE': '0',
+        'SIMULATOR_TIME_SCALE': '3600'
+    }
+    os.environ.update(env)
+    return env
+
+
+# ===== 各项基准 =====
+
+def bench_cold_start(runs: int = 5) -> Dict[str, Dict]:
+    """main.py 冷启动：新进程导入 main 的耗时（引擎和交易所客户端在 lifespan 中后台预热，不计入）"""
+    command = [sys.executable, '-c', 'import main']
+    # 第一次运行执行数据库迁移，不计入
+    subprocess.run(command, cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, check=True)
+    
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, check=True)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'cold_start_ms': metric(statistics.median(samples), 'ms', False)}
+
+
+def bench_health_ready(runs: int = 3, timeout: float = 30.0) -> Dict[str, Dict]:
+    """重启耗时：启动 uvicorn 进程到 /api/health 首次返回 200"""
+    samples = []
+    for _ in range(runs):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        url = f'http://127.0.0.1:{port}/api/health'
+        
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+            cwd=BACKEND_DIR, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while True:
+                if time.perf_counter() - started > timeout or process.poll() is not None:
+                    raise RuntimeError("uvicorn 未能在超时前提供 /api/health")
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    return {'health_ready_ms': metric(statistics.median(samples), 'ms', False)}
+
+
+def bench_ticks(ticks: int) -> Dict[str, Dict]:
+    """网格策略单线程 tick 吞吐（每次 tick 都向模拟交易所取行情，包含偶发的下单和入库）"""
+    from core.exchange import GateIOExchange
+    from core.trade_writer import trade_writer
+    from simulator.gateio import SimulatedGateIO
+    from strategy.grid import GridStrategy
+    
+    exchange = GateIOExchange(client=SimulatedGateIO(seed=42, time_scale=3600), ticker_ttl=0)
+    config = {'amount': 0.0005, 'grid_gap': 0.05, 'check_interval': 1, 'max_position': 0.01}
+    with quiet():
+        strategy = GridStrategy('bench_ticks', 'BTC/USDT', config, exchange)
+        strategy.on_start()
+        started = time.perf_counter()
+        for _ in range(ticks):
+            strategy.tick()
+        elapsed = time.perf_counter() - started
+        strategy.on_stop()
+    trade_writer.flush(timeout=30)
+    return {'grid_ticks_per_s': metric(ticks / elapsed, 'ticks/s', True)}
+
+
+def bench_list_traders(client, sizes: List[int], repeat: int) -> Dict[str, Dict]:
+    """GET /api/traders 延迟（交易员数量逐级增加）"""
+    from core import database
+    
+    results = {}
+    created = 0
+    for size in sizes:
+        while created < size:
+            trader_id = f'bench_{created:05d}'
+            database.insert_trader(trader_id, trader_id, 'grid', 'BTC/USDT', 'stopped',
+                                   {'amount': 0.0005, 'grid_gap': 2.0, 'check_interval': 60})
+            created += 1
+        
+        def request():
+            response = client.get('/api/traders')
+            assert response.status_code == 200, response.text
+        
+        # 大列表单次请求较慢，减少次数
+        samples = time_requests(request, repeat if size <= 100 else repeat // 4)
+        results[f'api_traders_{size}_p50_ms'] = metric(percentile(samples, 50), 'ms', False)
+        results[f'api_traders_{size}_p95_ms'] = metric(percentile(samples, 95), 'ms', False)
+    return results
+
+
+def bench_pnl(client, sizes: List[int], repeat: int) -> Dict[str, Dict]:
+    """GET /api/traders/{id}/pnl 延迟（交易笔数逐级增加）"""
+    from core import database
+    
+    trader_id = 'bench_pnl'
+    database.insert_trader(trader_id, trader_id, 'grid', 'BTC/USDT', 'stopped', {'amount': 0.0005})
+    
+    results = {}
+    inserted = 0
+    for size in sizes:
+        while inserted < size:
+            batch = min(10000, size - inserted)
+            records = []
+            for i in range(inserted, inserted + batch):
+                # 买多卖少，保留持仓，接口需要查询行情计算未实现盈亏
+                action = 'sell' if i % 3 == 2 else 'buy'
+                trade = {
+                    'symbol': 'BTC/USDT', 'action': action, 'price': 50000.0 + (i % 100),
+                    'amount': 0.0005, 'cost': 25.0, 'fee': 0.0375, 'timestamp': 1700000000000 + i
+                }
+                records.append((trade, trader_id, 'grid', None, None))
+            database.insert_trades(records)
+            inserted += batch
+        
+        def request():
+            response = client.get(f'/api/traders/{trader_id}/pnl')
+            assert response.status_code == 200, response.text
+        
+        samples = time_requests(request, repeat)
+        label = f'{size // 1000000}m' if size >= 1000000 else f'{size // 1000}k'
+        results[f'api_pnl_{label}_p50_ms'] = metric(percentile(samples, 50), 'ms', False)
+        results[f'api_pnl_{label}_p95_ms'] = metric(percentile(samples, 95), 'ms', False)
+    return results
+
+
+def bench_save_trade(count: int) -> Dict[str, Dict]:
+    """_save_trade 吞吐：提交 count 笔交易并等待全部写入数据库"""
+    from core.exchange import GateIOExchange
+    from core.trade_writer import trade_writer
+    from simulator.gateio import SimulatedGateIO
+    from strategy.grid import GridStrategy
+    
+    with quiet():
+        strategy = GridStrategy('bench_save', 'BTC/USDT', {'amount': 0.0005}, GateIOExchange(client=SimulatedGateIO()))
+    trade = {
+        'order_id': 'bench', 'symbol': 'BTC/USDT', 'action': 'buy', 'amount': 0.0005,
+        'price': 50000.0, 'cost': 25.0, 'fee': 0.0375, 'timestamp': 1700000000000
+    }
+    
+    started = time.perf_counter()
+    for _ in range(count):
+        strategy._save_trade(trade)
+        strategy.current_position += trade['amount']
+    if not trade_writer.flush(timeout=120):
+        raise RuntimeError("交易写入超时")
+    elapsed = time.perf_counter() - started
+    return {'save_trade_per_s': metric(count / elapsed, 'trades/s', True)}
+
+
+# ===== 运行与对比 =====
+
+def run_all(quick: bool = False) -> Dict:
+    """运行全部基准，返回结果"""
+    db_dir = tempfile.mkdtemp(prefix='bench_')
+    setup_environment(db_dir)
+    
+    results: Dict[str, Dict] = {}
+    started = time.time()
+    
+    print("⏱️ 冷启动...")
+    results.update(bench_cold_start())
+    
+    print("⏱️ 重启到健康检查可用...")
+    results.update(bench_health_ready())
+    
+    # 导入应用并执行 lifespan（使用上面的临时数据库和模拟交易所），等后台预热完成后再计时
+    with quiet():
+        from fastapi.testclient import TestClient
+        import main
+        client = TestClient(main.app)
+        client.__enter__()
+        main.container.wait_ready(timeout=60)
+    
+    print("⏱️ 策略tick吞吐...")
+    results.update(bench_ticks(5000 if quick else 20000))
+    
+    print("⏱️ /api/traders 延迟...")
+    results.update(bench_list_traders(client, [10, 100] if quick else [10, 100, 1000], repeat=200))
+    
+    print("⏱️ /api/traders/{id}/pnl 延迟...")
+    results.update(bench_pnl(client, [1000, 100000] if quick else [1000, 100000, 1000000], repeat=200))
+    
+    print("⏱️ _save_trade 吞吐...")
+    results.update(bench_save_trade(20000 if quick else 100000))
+    
+    with quiet():
+        client.__exit__(None, None, None)
+    
+    return {
+        'meta': {
+            'timestamp': int(time.time()),
+            'elapsed_s': round(time.time() - started, 1),
+            'quick': quick,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Dict]:
+    """
+    与基线对比（只对比两边都有的指标，毫秒级指标的绝对变化低于噪声下限时忽略）
+    
+    Returns:
+        每项指标的对比结果，regression=True 表示退化超过容差
+    """
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or not base['value']:
+            continue
+        change = (current['value'] - base['value']) / base['value']
+        worse = -change if current['higher_is_better'] else change
+        if current['unit'] == 'ms' and abs(current['value'] - base['value']) < NOISE_FLOOR_MS:
+            worse = 0.0
+        rows.append({
+            'name': name,
+            'baseline': base['value'],
+            'current': current['value'],
+            'unit': current['unit'],
+            'change_pct': round(change * 100, 1),
+            'regression': worse > tolerance
+        })
+    return rows
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    """读取基线文件（不存在时返回None）"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='交易引擎与API基准测试')
+    parser.add_argument('--quick', action='store_true', help='缩小规模快速运行')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线文件')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='允许的退化比例（0.25表示25%%）')
+    parser.add_argument('--output', default=None, help='结果输出到JSON文件')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基线')
+    args = parser.parse_args()
+    
+    # 迁移脚本使用相对路径
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    
+    report = run_all(quick=args.quick)
+    baseline = load_baseline(args.baseline)
+    rows = compare(report['results'], baseline['results'], args.tolerance) if baseline else []
+    report['comparison'] = rows
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n{'指标':<28} {'基线':>12} {'本次':>12}  {'变化':>8}")
+    compared = {row['name']: row for row in rows}
+    for name, current in report['results'].items():
+        row = compared.get(name)
+        base = f"{row['baseline']:,.2f}" if row else '-'
+        change = f"{row['change_pct']:+.1f}%" if row else ''
+        flag = ' ❌' if row and row['regression'] else ''
+        print(f"{name:<28} {base:>12} {current['value']:>12,.2f}  {change:>8} {current['unit']}{flag}")
+    
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'meta': report['meta'], 'results': report['results']}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 基线已更新: {args.baseline}")
+        return
+    
+    if baseline is None:
+        print("⚠️ 未找到基线文件，跳过对比（使用 --update-baseline 生成）")
+        return
+    
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"❌ {len(regressions)} 项指标退化超过 {args.tolerance:.0%}")
+        sys.exit(1)
+    print(f"✅ 所有指标均在基线 {args.tolerance:.0%} 容差内")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,13 +15,65 @@ class Settings(BaseSettings):
     gate_api_key: str = ''
     gate_api_secret: str = ''
     gate_testnet: bool = True
+    ticker_cache_ttl: float = 2.0  # 行情缓存有效期（秒）
+    markets_cache_path: str = 'data/markets.json'  # 交易对元数据缓存文件（按网络加后缀）
+    markets_refresh_interval: float = 21600.0  # 交易对元数据后台刷新间隔（秒），0表示不刷新
+    indicator_timeframe: str = '1m'  # 技术指标的K线周期
+    indicator_warmup_bars: int = 500  # 指标从本地K线存储预热的根数，0表示不预热
+    startup_budget_ms: float = 1500.0  # 启动耗时预算（毫秒，导入 main 到开始服务），超出时告警；单核实测约1.1~1.3秒，其中导入 fastapi 约0.7秒
+    
+    # 本地模拟交易所（离线压测用，启用后不连接 Gate.io）
+    gate_simulator: bool = False
+    simulator_initial_price: float = 50000.0
+    simulator_initial_usdt: float = 100000.0
+    simulator_volatility: float = 0.6  # 年化波动率
+    simulator_time_scale: float = 1.0  # 行情时间倍速
+    simulator_latency_ms: float = 0.0  # 注入的调用延迟
+    simulator_error_rate: float = 0.0  # 注入的网络错误概率
+    
+    # 交易所容错配置
+    exchange_retries: int = 2  # 网络错误重试次数（下单不重试）
+    exchange_backoff_base: float = 0.2  # 首次重试退避上限（秒），之后指数增长并随机抖动
+    exchange_backoff_max: float = 2.0  # 单次退避上限（秒）
+    breaker_failure_threshold: int = 5  # 连续失败多少次后熔断
+    breaker_reset_timeout: float = 30.0  # 熔断多少秒后放行探测请求
     
     # DeepSeek AI配置
     deepseek_api_key: str = ''
+    ai_cache_size: int = 256  # 决策缓存条数
+    ai_cache_ttl: float = 300.0  # 决策缓存有效期（秒），0表示不缓存
+    ai_cache_price_bucket_pct: float = 0.5  # 价格变化在该百分比内视为同一行情区间
+    ai_cache_position_step: float = 0.0001  # 持仓量化步长
+    ai_cache_balance_step: float = 10.0  # 余额量化步长（USDT）
+    ai_cache_rsi_band: float = 10.0  # RSI 分档宽度（RSI 跨档后不复用缓存的决策）
+    ai_cache_volatility_ratio: float = 1.5  # 波动率（ATR%）相邻分档的倍数
+    ai_max_concurrency: int = 20  # 同时进行的AI请求数（批量决策）
+    ai_rate_limit: float = 10.0  # AI请求速率上限（次/秒），0表示不限流
+    ai_rate_burst: int = 50  # 允许的突发请求数
+    ai_batch_max_items: int = 100  # 单次批量决策的最大交易对/交易员数
     
     # 数据库配置
     database_url: str = 'sqlite:///./data/database.db'
     
+    # 交易记录写入配置
+    trade_writer_max_queue: int = 10000  # 写入队列上限，超过后策略提交交易时阻塞
+    trade_writer_batch_size: int = 500  # 单个事务最多写入的交易数
+    
+    # 订单对账配置
+    reconcile_interval: float = 30.0  # 按实际成交修正交易记录的周期（秒），0表示不自动对账
+    
+    # 事件日志配置
+    event_buffer_size: int = 10000  # 内存环形缓冲保留的最近事件数
+    event_flush_interval: float = 1.0  # 事件批量落库间隔（秒）
+    event_retention_days: int = 30  # 数据库中事件的保留天数
+    
+    # 推送流配置
+    stream_flush_interval: float = 1.0  # tick/价格/盈亏合并推送间隔（秒）
+    stream_client_queue_size: int = 1000  # 每个客户端的消息积压上限，超过后要求前端重新拉取
+    
+    # 策略调度配置
+    scheduler_workers: int = 8  # 执行策略tick的工作线程数
+    
     # API 配置
     api_host: str = '0.0.0.0'
     api_port: int = 8000
@@ -0,0 +1,148 @@
+"""
+Gate.io 异步交易所接口封装
+使用 ccxt.async_support 实现，供 FastAPI 的 async 路由直接 await，避免阻塞事件循环
+"""
+import asyncio
+import ccxt.async_support as ccxt_async
+from typing import Dict, Optional
+from core.exchange import (
+    format_balance, demo_balance, format_ticker,
+    is_price_abnormal, format_order, demo_order, new_client_order_id
+)
+from core.resilience import Resilience, exchange_resilience
+from core.ticker_cache import AsyncTickerCache
+
+
+class AsyncGateIOExchange:
+    """Gate.io 异步交易所适配器（接口与 GateIOExchange 保持一致）"""
+    
+    def __init__(self, api_key: str = "", api_secret: str = "", testnet: bool = True, ticker_ttl: float = 2.0,
+                 resilience: Optional[Resilience] = None, client=None):
+        """
+        初始化 Gate.io 异步交易所
+        
+        Args:
+            api_key: API密钥
+            api_secret: API密钥
+            testnet: 是否使用测试网
+            ticker_ttl: 行情缓存有效期（秒）
+            resilience: 容错层（重试/熔断），默认使用全局实例
+            client: 替代 ccxt 的底层客户端（如本地模拟交易所）
+        """
+        # 未配置API密钥（且未使用模拟交易所）时为演示模式：余额和订单返回模拟数据
+        self.demo_mode = not api_key and client is None
+        self.resilience = resilience or exchange_resilience
+        
+        # 按交易对缓存行情，并发请求合并为一次
+        self.ticker_cache = AsyncTickerCache(ttl=ticker_ttl)
+        
+        self.exchange = client or ccxt_async.gateio({
+            'apiKey': api_key,
+            'secret': api_secret,
+            'options': {'defaultType': 'spot'}
+        })
+        
+        if testnet:
+            # Gate.io 测试网配置
+            self.exchange.set_sandbox_mode(True)
+    
+    async def close(self):
+        """关闭底层HTTP会话"""
+        await self.exchange.close()
+    
+    async def get_balance(self, currency: Optional[str] = None) -> Dict:
+        """
+        获取余额
+        
+        Args:
+            currency: 币种，默认None（返回所有币种）
+        
+        Returns:
+            余额信息字典
+        """
+        if self.demo_mode:
+            return demo_balance(currency)
+        
+        balance = await self.resilience.acall('fetch_balance', self.exchange.fetch_balance)
+        return format_balance(balance, currency)
+    
+    async def get_ticker(self, symbol: str = 'BTC/USDT') -> Dict:
+        """获取行情 - TTL内走缓存，过期时合并并发请求，失败时回退到该交易对的缓存行情"""
+        return await self.ticker_cache.get(symbol, lambda: self._fetch_ticker(symbol))
+    
+    async def _fetch_ticker(self, symbol: str) -> Dict:
+        """从交易所获取行情（网络错误由容错层退避重试，熔断期间立即失败）"""
+        ticker = format_ticker(symbol, await self.resilience.acall('fetch_ticker', self.exchange.fetch_ticker, symbol))
+        
+        if is_price_abnormal(ticker['last']):
+            print(f"⚠️ 异常价格: ${ticker['last']:,.2f}，重新获取...")
+            await asyncio.sleep(self.resilience.policy.delay(0))
+            ticker = format_ticker(symbol, await self.resilience.acall('fetch_ticker', self.exchange.fetch_ticker, symbol))
+        
+        return ticker
+    
+    async def market_buy(self, symbol: str, amount: float, client_order_id: Optional[str] = None) -> Dict:
+        """
+        市价买入（限价单模拟，价格上浮0.5%确保成交）
+        
+        Args:
+            symbol: 交易对，如 BTC/USDT
+            amount: 买入数量（币的数量）
+            client_order_id: 自定义订单ID，默认按手动交易生成
+        
+        Returns:
+            订单信息
+        """
+        client_order_id = client_order_id or new_client_order_id('manual')
+        ticker = await self.get_ticker(symbol)
+        current_price = ticker.get('last')
+        if not current_price:
+            raise ValueError(f"无法获取{symbol}的当前价格")
+        
+        # 演示模式（未配置API密钥）：返回模拟订单
+        if self.demo_mode:
+            return demo_order(symbol, 'buy', amount, current_price)
+        
+        try:
+            # 下单不是幂等操作，不重试；熔断期间立即失败
+            order = await self.resilience.acall(
+                'create_order', self.exchange.create_limit_buy_order, symbol, amount, current_price * 1.005,
+                {'text': client_order_id}, retries=0
+            )
+            return format_order(order, symbol, 'buy', amount, current_price, client_order_id)
+        except Exception as e:
+            print(f"Buy order failed: {str(e)}")
+            raise
+    
+    async def market_sell(self, symbol: str, amount: float, client_order_id: Optional[str] = None) -> Dict:
+        """
+        市价卖出（限价单模拟，价格下浮0.5%确保成交）
+        
+        Args:
+            symbol: 交易对
+            amount: 卖出数量
+            client_order_id: 自定义订单ID，默认按手动交易生成
+        
+        Returns:
+            订单信息
+        """
+        client_order_id = client_order_id or new_client_order_id('manual')
+        ticker = await self.get_ticker(symbol)
+        current_price = ticker.get('last')
+        if not current_price:
+            raise ValueError(f"无法获取{symbol}的当前价格")
+        
+        # 演示模式（未配置API密钥）：返回模拟订单
+        if self.demo_mode:
+            return demo_order(symbol, 'sell', amount, current_price)
+        
+        try:
+            # 下单不是幂等操作，不重试；熔断期间立即失败
+            order = await self.resilience.acall(
+                'create_order', self.exchange.create_limit_sell_order, symbol, amount, current_price * 0.995,
+                {'text': client_order_id}, retries=0
+            )
+            return format_order(order, symbol, 'sell', amount, current_price, client_order_id)
+        except Exception as e:
+            print(f"Sell order failed: {str(e)}")
+            raise
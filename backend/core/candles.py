@@ -0,0 +1,149 @@
+"""
+K线本地存储
+每个 交易对 + 周期 的 OHLCV 存在 SQLite candles 表中（按主键聚簇），回测、指标和提示词直接读本地历史，不再重复下载：
+
+- sync(): 从最后一根已存K线开始用 fetch_ohlcv 增量拉取（最后一根可能尚未收盘，重新拉取覆盖），分页直到追上当前时间
+- read(): 按时间区间读取为 NumPy 数组（逐行直接填入数组，不构造中间的字典和列表）
+"""
+import itertools
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+from core import database
+
+
+# 单次 fetch_ohlcv 请求的根数（Gate.io 单次最多返回1000根）
+FETCH_LIMIT = 1000
+
+# 本地没有数据且未指定起点时，首次同步回溯的根数
+DEFAULT_BACKFILL = 1000
+
+# 读取结果中的价格/成交量列（timestamp 另为 int64）
+CANDLE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+TIMEFRAME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """K线周期的毫秒数（如 1m -> 60000）"""
+    match = re.fullmatch(r'(\d+)([smhdw])', timeframe)
+    if not match:
+        raise ValueError(f"不支持的K线周期: {timeframe}")
+    return int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)] * 1000
+
+
+class CandleStore:
+    """K线存储（线程安全：同一序列的同步串行执行，不同序列互不阻塞）"""
+    
+    def __init__(self, fetch_limit: int = FETCH_LIMIT, backfill: int = DEFAULT_BACKFILL):
+        """
+        初始化K线存储
+        
+        Args:
+            fetch_limit: 单次请求的根数
+            backfill: 首次同步（本地无数据且未指定起点）回溯的根数
+        """
+        self.fetch_limit = fetch_limit
+        self.backfill = backfill
+        
+        self._lock = threading.Lock()
+        self._series_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        
+        # 统计
+        self.syncs = 0
+        self.requests = 0
+        self.bars_written = 0
+    
+    def sync(self, exchange, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+             max_requests: Optional[int] = None) -> int:
+        """
+        增量同步K线
+        
+        Args:
+            exchange: 同步交易所客户端（GateIOExchange，需提供 get_ohlcv）
+            symbol: 交易对
+            timeframe: 周期
+            since: 本地没有数据时的起点（毫秒时间戳），默认回溯 backfill 根
+            max_requests: 本次最多请求次数（限制长区间回填的耗时），None 表示一直追到当前时间
+        
+        Returns:
+            写入（含覆盖未收盘K线）的根数
+        """
+        period = timeframe_ms(timeframe)
+        with self._series_lock(symbol, timeframe):
+            last = database.get_last_candle_ts(symbol, timeframe)
+            if last is not None:
+                cursor = last
+            elif since is not None:
+                cursor = since
+            else:
+                cursor = int(time.time() * 1000) // period * period - self.backfill * period
+            
+            written = 0
+            requests = 0
+            while max_requests is None or requests < max_requests:
+                bars = exchange.get_ohlcv(symbol, timeframe, cursor, self.fetch_limit)
+                bars = [bar for bar in bars if bar[0] >= cursor]
+                requests += 1
+                if not bars:
+                    break
+                written += database.upsert_candles(symbol, timeframe, bars)
+                # 返回不足一页或没有新K线，说明已追上当前时间
+                if len(bars) < self.fetch_limit or bars[-1][0] <= cursor:
+                    break
+                cursor = bars[-1][0]
+        
+        with self._lock:
+            self.syncs += 1
+            self.requests += requests
+            self.bars_written += written
+        return written
+    
+    def read(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+             until: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        读取K线
+        
+        Args:
+            symbol: 交易对
+            timeframe: 周期
+            since: 起始开盘时间（毫秒，含）
+            until: 结束开盘时间（毫秒，不含）
+            limit: 最多返回的根数；未指定 since 时取最近 limit 根
+        
+        Returns:
+            {'timestamp': int64数组, 'open'/'high'/'low'/'close'/'volume': float64数组}，按时间正序
+        """
+        rows = database.iter_candles(symbol, timeframe, since, until, limit)
+        table = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64)
+        table = table.reshape(-1, len(CANDLE_FIELDS) + 1)
+        
+        data = {'timestamp': table[:, 0].astype(np.int64)}
+        for index, name in enumerate(CANDLE_FIELDS, start=1):
+            data[name] = np.ascontiguousarray(table[:, index])
+        return data
+    
+    def get_stats(self) -> Dict:
+        """同步统计和已存储的序列"""
+        with self._lock:
+            stats = {
+                'syncs': self.syncs,
+                'requests': self.requests,
+                'bars_written': self.bars_written
+            }
+        stats['series'] = database.list_candle_series()
+        return stats
+    
+    def _series_lock(self, symbol: str, timeframe: str) -> threading.Lock:
+        """序列级锁（同一序列并发同步时只有一个在请求交易所）"""
+        with self._lock:
+            lock = self._series_locks.get((symbol, timeframe))
+            if lock is None:
+                lock = self._series_locks[(symbol, timeframe)] = threading.Lock()
+            return lock
+
+
+# 全局K线存储
+candle_store = CandleStore()
@@ -0,0 +1,137 @@
+"""
+应用容器（由 FastAPI lifespan 管理）
+导入 main 时不再建库、不再创建交易所客户端和交易员引擎，也不启动线程：
+
+- startup(): 只做数据库迁移检查（已迁移时几毫秒），然后立即开始服务，/api/health 随即可用
+- 后台预热线程：导入 ccxt、创建交易所客户端（含交易对元数据）、创建交易员引擎
+- 预热完成前访问 engine / exchange 的请求会就地构造（与预热线程共用同一把锁，只构造一次）
+
+启动耗时（导入 main 到开始服务）与预算 startup_budget_ms 对比，超出时打印告警，并通过 /api/health 暴露。
+"""
+import threading
+import time
+from typing import Dict, Optional
+from config import settings
+from core import database
+
+
+class AppContainer:
+    """应用级单例的延迟构造与生命周期（线程安全）"""
+    
+    def __init__(self, startup_budget_ms: float = 1500.0):
+        """
+        初始化容器
+        
+        Args:
+            startup_budget_ms: 启动耗时预算（毫秒）
+        """
+        self.startup_budget_ms = startup_budget_ms
+        
+        self._lock = threading.RLock()
+        self._engine = None
+        self._registry = None
+        self._schema_ready = False
+        self._warmup_thread: Optional[threading.Thread] = None
+        
+        # 启动计时（毫秒）
+        self.startup_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+    
+    # ===== 延迟构造的组件 =====
+    
+    @property
+    def engine(self):
+        """交易员引擎（首次访问时构造：重置运行状态、启动监控线程）"""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self.init_database()
+                    from core.trader import TraderEngine
+                    self._engine = TraderEngine(self.registry.get_sync())
+        return self._engine
+    
+    @property
+    def registry(self):
+        """交易所客户端注册表（首次访问时导入 ccxt）"""
+        if self._registry is None:
+            with self._lock:
+                if self._registry is None:
+                    from core.registry import exchange_registry
+                    self._registry = exchange_registry
+        return self._registry
+    
+    @property
+    def exchange(self):
+        """当前配置（API密钥、测试网）对应的异步交易所客户端，供 API 路由共享"""
+        return self.registry.get_async()
+    
+    def init_database(self):
+        """执行数据库迁移（只执行一次）"""
+        if self._schema_ready:
+            return
+        with self._lock:
+            if not self._schema_ready:
+                database.init_schema()
+                self._schema_ready = True
+    
+    # ===== 生命周期 =====
+    
+    def startup(self, started_at: float):
+        """
+        应用启动：迁移数据库后立即返回，其余组件在后台预热
+        
+        Args:
+            started_at: 开始导入 main 时的 time.perf_counter()
+        """
+        self.init_database()
+        self.startup_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        
+        status = '✅' if self.startup_ms <= self.startup_budget_ms else '⚠️ 超出预算'
+        print(f"{status} 启动耗时 {self.startup_ms}ms（预算 {self.startup_budget_ms:.0f}ms）")
+        
+        self._warmup_thread = threading.Thread(target=self._warm_up, name='app-warmup', daemon=True)
+        self._warmup_thread.start()
+    
+    async def shutdown(self):
+        """应用退出：关闭异步交易所的HTTP会话"""
+        if self._registry is not None:
+            await self._registry.close()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待后台预热完成（未启动预热时直接返回）"""
+        if self._warmup_thread is not None:
+            self._warmup_thread.join(timeout)
+        return self.ready
+    
+    @property
+    def ready(self) -> bool:
+        """交易员引擎是否已构造"""
+        return self._engine is not None
+    
+    def get_stats(self) -> Dict:
+        """启动状态"""
+        return {
+            'ready': self.ready,
+            'startup_ms': self.startup_ms,
+            'startup_budget_ms': self.startup_budget_ms,
+            'warmup_ms': self.warmup_ms,
+            'warmup_error': self.warmup_error
+        }
+    
+    def _warm_up(self):
+        """后台预热：构造交易所客户端和交易员引擎"""
+        started = time.perf_counter()
+        try:
+            self.registry.get_async()
+            self.engine
+        except Exception as e:
+            self.warmup_error = str(e)
+            print(f"⚠️ 后台预热失败（将在首次使用时重试）: {e}")
+            return
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ 后台预热完成，耗时 {self.warmup_ms}ms")
+
+
+# 全局容器
+container = AppContainer(startup_budget_ms=settings.startup_budget_ms)
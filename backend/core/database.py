@@ -0,0 +1,819 @@
+"""
+数据库访问层
+- 每个线程复用一个长连接（线程级连接池），避免频繁 connect/close
+- 启用 WAL 模式，读写互不阻塞
+- 提供 trades / traders / ai_decisions / candles 的仓储函数，SQL 固定以复用预编译语句
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from config import settings
+from core.ledger import LEDGER_FIELDS, LedgerMirror, new_entry
+from core.metrics import db_commit_latency, db_query_latency
+
+
+# 迁移脚本（按顺序执行，每个脚本只执行一次）
+MIGRATIONS = [
+    'data/init.sql',
+    'data/migrations/002_traders.sql',
+    'data/migrations/003_position_tracking.sql',
+    'data/migrations/004_ai_decisions.sql',
+    'data/migrations/005_trader_ledger.sql',
+    'data/migrations/006_events.sql',
+    'data/migrations/007_trades_keyset.sql',
+    'data/migrations/008_candles.sql',
+    'data/migrations/009_trade_orders.sql',
+]
+
+# 连接级 PRAGMA
+PRAGMAS = [
+    'PRAGMA journal_mode = WAL',        # 读写并发，读不阻塞写
+    'PRAGMA synchronous = NORMAL',      # WAL 模式下兼顾安全与性能
+    'PRAGMA busy_timeout = 5000',       # 遇到写锁时等待而不是立即报 "database is locked"
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',       # 约16MB页缓存
+    'PRAGMA mmap_size = 134217728',     # 128MB 内存映射读
+]
+
+
+def _db_path(database_url: str) -> str:
+    """从 sqlite:///path 形式的URL解析数据库文件路径"""
+    prefix = 'sqlite:///'
+    if database_url.startswith(prefix):
+        return database_url[len(prefix):]
+    return database_url
+
+
+def _statement_kind(sql: str) -> str:
+    """SQL语句类型（SELECT / INSERT / COMMIT ...），用作指标标签"""
+    kind = _statement_kinds.get(sql)
+    if kind is None:
+        words = [line.split(None, 1)[0] for line in sql.splitlines()
+                 if line.strip() and not line.strip().startswith('--')]
+        kind = words[0].upper() if words else 'EMPTY'
+        # 固定SQL可以缓存，动态拼接的SQL不无限增长
+        if len(_statement_kinds) < 1024:
+            _statement_kinds[sql] = kind
+    return kind
+
+
+_statement_kinds: Dict[str, str] = {}
+
+
+class TimedConnection(sqlite3.Connection):
+    """记录语句执行耗时的连接（SELECT 计时到取得第一行为止）"""
+    
+    def execute(self, sql: str, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - started)
+    
+    def executemany(self, sql: str, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - started)
+    
+    @staticmethod
+    def _observe(sql: str, elapsed: float):
+        kind = _statement_kind(sql)
+        if kind == 'COMMIT':
+            db_commit_latency.observe(elapsed)
+        else:
+            db_query_latency.observe(elapsed, kind)
+
+
+class ConnectionPool:
+    """线程级连接池：每个线程（包括事件循环线程）持有一个复用的连接"""
+    
+    def __init__(self, path: str):
+        """
+        初始化连接池
+        
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+    
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的连接（不存在则创建）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并应用PRAGMA"""
+        # isolation_level=None: 自动提交模式，事务由 transaction() 显式控制
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256,
+            factory=TimedConnection
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def close_all(self):
+        """关闭所有连接"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+pool = ConnectionPool(_db_path(settings.database_url))
+ledger_mirror = LedgerMirror()
+_commit_hooks = threading.local()
+
+
+def get_connection() -> sqlite3.Connection:
+    """获取当前线程的数据库连接"""
+    return pool.get()
+
+
+@contextmanager
+def transaction():
+    """
+    写事务上下文
+    
+    使用 BEGIN IMMEDIATE 提前获取写锁，避免读事务升级为写事务时死锁；
+    嵌套调用时复用外层事务。事务内不要 await，否则同线程的其他协程会混入同一事务。
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    
+    _commit_hooks.pending = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        _commit_hooks.pending = []
+        raise
+    conn.execute('COMMIT')
+    
+    hooks, _commit_hooks.pending = _commit_hooks.pending, []
+    for hook in hooks:
+        hook()
+
+
+def on_commit(hook: Callable[[], None]):
+    """注册在当前事务提交后执行的回调（事务回滚则丢弃）"""
+    _commit_hooks.pending.append(hook)
+
+
+def _split_statements(script: str) -> List[str]:
+    """拆分SQL脚本为单条语句（去掉注释行）"""
+    lines = [line for line in script.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+
+def init_schema():
+    """执行尚未执行过的迁移脚本"""
+    conn = get_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            applied_at INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+    ''')
+    applied = {row[0] for row in conn.execute('SELECT name FROM schema_migrations')}
+    
+    for path in MIGRATIONS:
+        if path in applied:
+            continue
+        
+        with open(path, 'r') as f:
+            statements = _split_statements(f.read())
+        
+        with transaction():
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    # 忽略"duplicate column"错误（旧库已手动执行过部分迁移）
+                    if 'duplicate column' not in str(e).lower():
+                        raise
+            conn.execute('INSERT INTO schema_migrations (name) VALUES (?)', (path,))
+        
+        print(f"✅ 数据库迁移完成: {path}")
+
+
+# ==================== trades ====================
+
+TRADE_INSERT_SQL = '''
+    INSERT INTO trades (trader_id, strategy, symbol, action, price, amount, cost, fee_amount, timestamp, position_before, position_after,
+                        order_id, client_order_id, reconciled)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _trade_params(trade_data: Dict, trader_id: str, strategy: str,
+                  position_before: Optional[float] = None, position_after: Optional[float] = None) -> Tuple:
+    """trades 插入参数（真实下单按委托记账，标记为待对账；已按实际成交记账的传 reconciled=True）"""
+    pending = trade_data.get('real') and not trade_data.get('reconciled')
+    return (
+        trader_id,
+        strategy,
+        trade_data['symbol'],
+        trade_data['action'],
+        trade_data['price'],
+        trade_data['amount'],
+        trade_data['cost'],
+        trade_data.get('fee', 0),
+        trade_data['timestamp'],
+        position_before or 0,
+        position_after or 0,
+        trade_data.get('order_id'),
+        trade_data.get('client_order_id'),
+        0 if pending else 1
+    )
+
+
+def insert_trade(trade_data: Dict, trader_id: str, strategy: str,
+                 position_before: Optional[float] = None, position_after: Optional[float] = None) -> int:
+    """
+    保存交易记录
+    
+    Args:
+        trade_data: 交易所返回的订单信息
+        trader_id: 交易员ID
+        strategy: 策略类型
+        position_before: 交易前持仓（可选）
+        position_after: 交易后持仓（可选）
+    
+    Returns:
+        交易记录ID
+    """
+    with transaction() as conn:
+        cursor = conn.execute(TRADE_INSERT_SQL, _trade_params(trade_data, trader_id, strategy, position_before, position_after))
+        _record_ledger(conn, trader_id, trade_data)
+        return cursor.lastrowid
+
+
+def insert_trades(records: List[Tuple[Dict, str, str, Optional[float], Optional[float]]]) -> List[int]:
+    """
+    批量保存交易记录（单个事务，executemany 写入 trades 和 trader_ledger）
+    
+    Args:
+        records: [(trade_data, trader_id, strategy, position_before, position_after), ...]
+    
+    Returns:
+        与 records 顺序对应的交易记录ID
+    """
+    if not records:
+        return []
+    
+    # 同一 (trader_id, symbol) 的账本增量先在内存中合并
+    deltas: Dict[Tuple[str, str], List] = {}
+    for trade_data, trader_id, _, _, _ in records:
+        params = _ledger_params(trader_id, trade_data)
+        key = (trader_id, trade_data['symbol'])
+        if key in deltas:
+            merged = deltas[key]
+            for i in range(2, len(params)):
+                merged[i] += params[i]
+        else:
+            deltas[key] = list(params)
+    
+    with transaction() as conn:
+        conn.executemany(TRADE_INSERT_SQL, [_trade_params(*record) for record in records])
+        # 持有写锁期间自增ID连续分配
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.executemany(LEDGER_UPSERT_SQL, [tuple(params) for params in deltas.values()])
+        
+        for trade_data, trader_id, _, _, _ in records:
+            _mirror_on_commit(trader_id, trade_data)
+    
+    return list(range(last_id - len(records) + 1, last_id + 1))
+
+
+def _trade_filters(trader_id: Optional[str] = None, symbol: Optional[str] = None,
+                   action: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                   before_id: Optional[int] = None, after_id: Optional[int] = None) -> Tuple[str, List]:
+    """交易查询的 WHERE 子句和参数（时间为毫秒时间戳，游标为交易ID）"""
+    clauses, params = [], []
+    for column, value in (('trader_id', trader_id), ('symbol', symbol), ('action', action)):
+        if value:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    if since is not None:
+        clauses.append('timestamp >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('timestamp < ?')
+        params.append(until)
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(before_id)
+    if after_id is not None:
+        clauses.append('id > ?')
+        params.append(after_id)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def list_trades(limit: int = 20, trader_id: Optional[str] = None, symbol: Optional[str] = None,
+                action: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                before_id: Optional[int] = None) -> List[Dict]:
+    """
+    获取交易历史（按ID倒序，即最新在前）
+    
+    键集分页：下一页传入本页最后一条的 id 作为 before_id，
+    翻页代价与页码无关（OFFSET 需要先扫描跳过的行）。
+    """
+    where, params = _trade_filters(trader_id, symbol, action, since, until, before_id=before_id)
+    rows = get_connection().execute(
+        f'SELECT * FROM trades{where} ORDER BY id DESC LIMIT ?',
+        params + [limit]
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def iter_trades(trader_id: Optional[str] = None, symbol: Optional[str] = None,
+                action: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                batch_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    按ID正序分批遍历交易（导出用）
+    
+    每批是一次独立的键集查询，内存占用只与 batch_size 有关；
+    不持有跨批次的游标和读事务，可以在不同线程中逐批迭代，也不会阻止 WAL 检查点。
+    """
+    after_id = 0
+    while True:
+        where, params = _trade_filters(trader_id, symbol, action, since, until, after_id=after_id)
+        rows = get_connection().execute(
+            f'SELECT * FROM trades{where} ORDER BY id LIMIT ?',
+            params + [batch_size]
+        ).fetchall()
+        if not rows:
+            return
+        yield [dict(row) for row in rows]
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1]['id']
+
+
+def list_negative_positions() -> List[Tuple[str, float]]:
+    """获取最新持仓为负的交易员（trader_id, position_after）"""
+    rows = get_connection().execute("""
+        SELECT trader_id, position_after
+        FROM trades
+        WHERE id IN (
+            SELECT MAX(id) FROM trades GROUP BY trader_id
+        )
+        AND position_after < 0
+    """).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def list_unreconciled_trades(limit: int = 500) -> List[Dict]:
+    """待对账的交易（走部分索引，按交易对、ID排序）"""
+    rows = get_connection().execute(
+        'SELECT * FROM trades WHERE reconciled = 0 ORDER BY symbol, id LIMIT ?', (limit,)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def apply_trade_corrections(confirmed_ids: List[int], corrections: List[Dict]) -> List[Dict]:
+    """
+    批量写入对账结果（单个事务）
+    
+    - confirmed_ids: 与实际成交一致的交易，只标记为已对账
+    - corrections: [{'id', 'price', 'amount', 'cost', 'fee'}, ...] 按实际成交改写；
+      amount 为 0（订单未成交即撤销/过期）时删除该交易
+    
+    被修正交易及同一交易员、交易对之后的交易的 position_before/position_after 一并平移
+    （手动交易不记录持仓快照，不平移），
+    账本按新旧差额合并后累加，提交后清除相关交易员的账本镜像。
+    
+    Returns:
+        实际修正的交易 [{'id', 'trader_id', 'symbol', 'action', 'position_delta', 'deleted'}, ...]
+    """
+    if not confirmed_ids and not corrections:
+        return []
+    
+    applied = []
+    deltas: Dict[Tuple[str, str], List] = {}
+    with transaction() as conn:
+        conn.executemany(
+            'UPDATE trades SET reconciled = 1 WHERE id = ?', [(trade_id,) for trade_id in confirmed_ids]
+        )
+        
+        for correction in corrections:
+            row = conn.execute(
+                '''SELECT trader_id, symbol, action, price, amount, fee_amount, position_before, position_after
+                   FROM trades WHERE id = ? AND reconciled = 0''',
+                (correction['id'],)
+            ).fetchone()
+            if row is None:
+                continue  # 已被其他对账周期处理
+            
+            old = _ledger_params(row['trader_id'], {
+                'symbol': row['symbol'], 'action': row['action'], 'price': row['price'],
+                'amount': row['amount'], 'fee': row['fee_amount']
+            })
+            # 手动交易不记录持仓快照（前后均为0），只修正账本
+            tracked = row['position_before'] != row['position_after']
+            deleted = correction['amount'] <= 0
+            if deleted:
+                new = (row['trader_id'], row['symbol'], 0, 0, 0, 0, 0, 0, 0)
+                conn.execute('DELETE FROM trades WHERE id = ?', (correction['id'],))
+            else:
+                new = _ledger_params(row['trader_id'], {
+                    'symbol': row['symbol'], 'action': row['action'], 'price': correction['price'],
+                    'amount': correction['amount'], 'fee': correction['fee']
+                })
+            
+            # 手动交易不平移持仓快照，修正量按0上报
+            position_delta = (new[7] - old[7]) if tracked else 0.0
+            if not deleted:
+                conn.execute(
+                    '''UPDATE trades SET price = ?, amount = ?, cost = ?, fee_amount = ?,
+                       position_after = position_after + ?, reconciled = 1 WHERE id = ?''',
+                    (correction['price'], correction['amount'], correction['cost'], correction['fee'],
+                     position_delta, correction['id'])
+                )
+            if position_delta:
+                conn.execute(
+                    '''UPDATE trades SET position_before = position_before + ?, position_after = position_after + ?
+                       WHERE trader_id = ? AND symbol = ? AND id > ?''',
+                    (position_delta, position_delta, row['trader_id'], row['symbol'], correction['id'])
+                )
+            
+            key = (row['trader_id'], row['symbol'])
+            merged = deltas.setdefault(key, [row['trader_id'], row['symbol']] + [0] * (len(old) - 2))
+            for i in range(2, len(old)):
+                merged[i] += new[i] - old[i]
+            
+            applied.append({
+                'id': correction['id'],
+                'trader_id': row['trader_id'],
+                'symbol': row['symbol'],
+                'action': row['action'],
+                'position_delta': position_delta,
+                'deleted': deleted
+            })
+        
+        conn.executemany(LEDGER_UPSERT_SQL, [tuple(params) for params in deltas.values()])
+        
+        for trader_id in {trader_id for trader_id, _ in deltas}:
+            on_commit(lambda trader_id=trader_id: ledger_mirror.invalidate(trader_id))
+    
+    return applied
+
+
+# ==================== trader_ledger ====================
+
+LEDGER_UPSERT_SQL = '''
+    INSERT INTO trader_ledger (trader_id, symbol, bought, sold, buy_cost, sell_revenue, fees, position, trade_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(trader_id, symbol) DO UPDATE SET
+        bought = bought + excluded.bought,
+        sold = sold + excluded.sold,
+        buy_cost = buy_cost + excluded.buy_cost,
+        sell_revenue = sell_revenue + excluded.sell_revenue,
+        fees = fees + excluded.fees,
+        position = position + excluded.position,
+        trade_count = trade_count + excluded.trade_count,
+        updated_at = strftime('%s', 'now')
+'''
+
+
+def _ledger_params(trader_id: str, trade_data: Dict) -> Tuple:
+    """单笔交易对应的账本增量参数"""
+    price = trade_data['price']
+    amount = trade_data['amount']
+    is_buy = trade_data['action'] == 'buy'
+    return (
+        trader_id,
+        trade_data['symbol'],
+        amount if is_buy else 0,
+        0 if is_buy else amount,
+        price * amount if is_buy else 0,
+        0 if is_buy else price * amount,
+        trade_data.get('fee', 0) or 0,
+        amount if is_buy else -amount,
+        1
+    )
+
+
+def _mirror_on_commit(trader_id: str, trade_data: Dict):
+    """事务提交后把成交同步到账本内存镜像"""
+    symbol = trade_data['symbol']
+    action = trade_data['action']
+    price = trade_data['price']
+    amount = trade_data['amount']
+    fee = trade_data.get('fee', 0) or 0
+    on_commit(lambda: ledger_mirror.apply(trader_id, symbol, action, price, amount, fee))
+
+
+def _record_ledger(conn: sqlite3.Connection, trader_id: str, trade_data: Dict):
+    """在插入交易的同一事务内累加账本，提交后同步内存镜像"""
+    conn.execute(LEDGER_UPSERT_SQL, _ledger_params(trader_id, trade_data))
+    _mirror_on_commit(trader_id, trade_data)
+
+
+def _load_ledger(trader_id: str, symbol: str) -> Optional[Dict[str, float]]:
+    """从数据库读取账本条目"""
+    row = get_connection().execute(
+        f"SELECT {', '.join(LEDGER_FIELDS)} FROM trader_ledger WHERE trader_id = ? AND symbol = ?",
+        (trader_id, symbol)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def get_ledger(trader_id: str, symbol: str) -> Dict[str, float]:
+    """获取交易员在某交易对上的账本（优先读内存镜像）"""
+    return ledger_mirror.get(trader_id, symbol, lambda: _load_ledger(trader_id, symbol))
+
+
+def get_trader_ledger(trader_id: str) -> Dict[str, float]:
+    """获取交易员所有交易对的账本合计"""
+    rows = get_connection().execute(
+        'SELECT symbol FROM trader_ledger WHERE trader_id = ?', (trader_id,)
+    ).fetchall()
+    
+    total = new_entry()
+    for row in rows:
+        entry = get_ledger(trader_id, row['symbol'])
+        for field in LEDGER_FIELDS:
+            total[field] += entry[field]
+    return total
+
+
+# ==================== traders ====================
+
+def _trader_from_row(row: sqlite3.Row) -> Dict:
+    """traders表行转字典"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'strategy': row['strategy'],
+        'symbol': row['symbol'],
+        'status': row['status'],
+        'config': json.loads(row['config']),
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at']
+    }
+
+
+def insert_trader(trader_id: str, name: str, strategy: str, symbol: str, status: str, config: Dict):
+    """创建交易员记录"""
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO traders (id, name, strategy, symbol, status, config)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (trader_id, name, strategy, symbol, status, json.dumps(config)))
+
+
+def get_trader(trader_id: str) -> Optional[Dict]:
+    """获取交易员记录"""
+    row = get_connection().execute('SELECT * FROM traders WHERE id = ?', (trader_id,)).fetchone()
+    return _trader_from_row(row) if row else None
+
+
+def list_traders() -> List[Dict]:
+    """获取所有交易员记录（按创建时间倒序）"""
+    rows = get_connection().execute('SELECT * FROM traders ORDER BY created_at DESC').fetchall()
+    return [_trader_from_row(row) for row in rows]
+
+
+def update_trader_status(trader_id: str, status: str):
+    """更新交易员状态"""
+    with transaction() as conn:
+        conn.execute('''
+            UPDATE traders
+            SET status = ?, updated_at = strftime('%s', 'now')
+            WHERE id = ?
+        ''', (status, trader_id))
+
+
+def reset_running_traders():
+    """重置所有running状态为stopped（后端重启后策略不再运行）"""
+    with transaction() as conn:
+        conn.execute("UPDATE traders SET status = 'stopped' WHERE status = 'running'")
+
+
+def delete_trader(trader_id: str) -> bool:
+    """删除交易员记录"""
+    with transaction() as conn:
+        cursor = conn.execute('DELETE FROM traders WHERE id = ?', (trader_id,))
+        return cursor.rowcount > 0
+
+
+# ==================== ai_decisions ====================
+
+def insert_ai_decision(trader_id: str, symbol: str, action: str, reasoning: str,
+                       confidence: float, price: float, timestamp: int) -> int:
+    """保存AI决策记录"""
+    with transaction() as conn:
+        cursor = conn.execute('''
+            INSERT INTO ai_decisions (trader_id, symbol, action, reasoning, confidence, price, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (trader_id, symbol, action, reasoning, confidence, price, timestamp))
+        return cursor.lastrowid
+
+
+def insert_ai_decisions(decisions: List[Dict]) -> List[int]:
+    """批量保存AI决策记录（单个事务），返回按顺序的记录ID"""
+    if not decisions:
+        return []
+    
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO ai_decisions (trader_id, symbol, action, reasoning, confidence, price, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (d['trader_id'], d['symbol'], d['action'], d['reasoning'], d['confidence'], d['price'], d['timestamp'])
+            for d in decisions
+        ])
+        # 持有写锁期间自增ID连续分配
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return list(range(last_id - len(decisions) + 1, last_id + 1))
+
+
+def list_ai_decisions(trader_id: str, limit: int = 10) -> List[Dict]:
+    """获取AI决策历史（按时间倒序）"""
+    rows = get_connection().execute('''
+        SELECT id, symbol, action, reasoning, confidence, price, timestamp
+        FROM ai_decisions
+        WHERE trader_id = ?
+        ORDER BY timestamp DESC
+        LIMIT ?
+    ''', (trader_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+# ==================== events ====================
+
+def insert_events(events: List[Dict]):
+    """批量写入事件（单个事务）"""
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO events (ts, type, trader_id, message, data) VALUES (?, ?, ?, ?, ?)',
+            [
+                (event['ts'], event['type'], event.get('trader_id'), event.get('message', ''),
+                 json.dumps(event.get('data') or {}, ensure_ascii=False))
+                for event in events
+            ]
+        )
+
+
+def _event_filters(trader_id: Optional[str], types: Optional[List[str]],
+                   since: Optional[float], until: Optional[float]) -> Tuple[str, List]:
+    """事件查询的 WHERE 子句和参数"""
+    clauses, params = [], []
+    if trader_id:
+        clauses.append('trader_id = ?')
+        params.append(trader_id)
+    if types:
+        clauses.append(f"type IN ({', '.join('?' for _ in types)})")
+        params.extend(types)
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(until)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def list_events(trader_id: Optional[str] = None, types: Optional[List[str]] = None,
+                since: Optional[float] = None, until: Optional[float] = None, limit: int = 100) -> List[Dict]:
+    """查询事件（按时间倒序）"""
+    where, params = _event_filters(trader_id, types, since, until)
+    rows = get_connection().execute(
+        f'SELECT id, ts, type, trader_id, message, data FROM events{where} ORDER BY ts DESC, id DESC LIMIT ?',
+        params + [limit]
+    ).fetchall()
+    
+    events = []
+    for row in rows:
+        event = dict(row)
+        event['data'] = json.loads(event['data']) if event['data'] else {}
+        events.append(event)
+    return events
+
+
+def count_events(trader_id: Optional[str] = None, since: Optional[float] = None,
+                 until: Optional[float] = None) -> List[Dict]:
+    """按 交易员 + 类型 统计事件数"""
+    where, params = _event_filters(trader_id, None, since, until)
+    rows = get_connection().execute(
+        f'SELECT trader_id, type, COUNT(*) AS count, MAX(ts) AS last_ts FROM events{where} '
+        'GROUP BY trader_id, type ORDER BY trader_id, type',
+        params
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def purge_events(before: float) -> int:
+    """删除早于指定时间的事件"""
+    with transaction() as conn:
+        return conn.execute('DELETE FROM events WHERE ts < ?', (before,)).rowcount
+
+
+# ==================== candles ====================
+
+CANDLE_COLUMNS = ('ts', 'open', 'high', 'low', 'close', 'volume')
+
+
+def upsert_candles(symbol: str, timeframe: str, bars: List[List[float]]) -> int:
+    """
+    批量写入K线（单个事务；同一开盘时间的K线覆盖旧值，未收盘的最后一根会被后续同步更新）
+    
+    Args:
+        symbol: 交易对
+        timeframe: 周期
+        bars: ccxt OHLCV 格式 [[ts, open, high, low, close, volume], ...]
+    
+    Returns:
+        写入的K线数
+    """
+    if not bars:
+        return 0
+    
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO candles (symbol, timeframe, ts, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (symbol, timeframe, int(bar[0]), bar[1], bar[2], bar[3], bar[4], bar[5] or 0.0)
+            for bar in bars
+        ])
+    return len(bars)
+
+
+def get_last_candle_ts(symbol: str, timeframe: str) -> Optional[int]:
+    """最后一根K线的开盘时间（没有数据时返回 None）"""
+    row = get_connection().execute(
+        'SELECT MAX(ts) FROM candles WHERE symbol = ? AND timeframe = ?',
+        (symbol, timeframe)
+    ).fetchone()
+    return row[0]
+
+
+def iter_candles(symbol: str, timeframe: str, since: Optional[int] = None,
+                 until: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Tuple]:
+    """
+    按开盘时间正序遍历K线，逐行返回 (ts, open, high, low, close, volume) 元组
+    
+    游标去掉 Row 工厂，调用方可以直接用 np.fromiter 组装数组，不产生中间列表。
+    只给 limit 不给 since 时取最近 limit 根。
+    """
+    clauses, params = ['symbol = ?', 'timeframe = ?'], [symbol, timeframe]
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(until)
+    where = ' AND '.join(clauses)
+    columns = ', '.join(CANDLE_COLUMNS)
+    
+    if limit is not None and since is None:
+        sql = (f'SELECT * FROM (SELECT {columns} FROM candles WHERE {where} ORDER BY ts DESC LIMIT ?) '
+               'ORDER BY ts')
+        params.append(limit)
+    elif limit is not None:
+        sql = f'SELECT {columns} FROM candles WHERE {where} ORDER BY ts LIMIT ?'
+        params.append(limit)
+    else:
+        sql = f'SELECT {columns} FROM candles WHERE {where} ORDER BY ts'
+    
+    cursor = get_connection().execute(sql, params)
+    cursor.row_factory = None
+    return cursor
+
+
+def list_candle_series() -> List[Dict]:
+    """已存储的K线序列：每个 交易对+周期 的根数和时间范围"""
+    rows = get_connection().execute('''
+        SELECT symbol, timeframe, COUNT(*) AS count, MIN(ts) AS first_ts, MAX(ts) AS last_ts
+        FROM candles
+        GROUP BY symbol, timeframe
+        ORDER BY symbol, timeframe
+    ''').fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,236 @@
+"""
+结构化事件日志
+策略和引擎把交易、跳过、失败、止损止盈、告警等事件写入内存环形缓冲，后台线程批量落库。
+查询最近的事件直接读内存，更早的事件按 交易员 / 类型 / 时间 走数据库索引，夜间报告不再需要 grep 日志。
+
+事件类型：
+- buy / sell: 成交
+- trade_failed: 下单失败
+- trade_skipped: 有信号但因持仓/余额限制未下单
+- tick_skipped: 行情过期或价格超出网格区间，本轮跳过
+- stop_triggered: 触发止损/止盈，策略停止
+- error: 策略运行错误
+- trader_started / trader_stopped: 交易员启停
+- alert: 引擎监控告警（余额、负持仓、心跳）
+"""
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from core import database
+from config import settings
+
+
+# 报告中列出明细的事件类型
+TRADE_EVENTS = ('buy', 'sell')
+PROBLEM_EVENTS = ('trade_failed', 'stop_triggered', 'error', 'alert')
+
+
+class EventJournal:
+    """事件日志（线程安全，emit 不访问数据库）"""
+    
+    def __init__(self, capacity: int = 10000, flush_interval: float = 1.0, retention_days: int = 30):
+        """
+        初始化事件日志
+        
+        Args:
+            capacity: 内存环形缓冲大小；落库积压超过该数量时丢弃最旧的待写事件
+            flush_interval: 批量落库间隔（秒）
+            retention_days: 数据库保留天数（0表示不清理）
+        """
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        
+        self._buffer: deque = deque(maxlen=capacity)
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+        
+        # 统计
+        self.emitted = 0
+        self.persisted = 0
+        self.dropped = 0
+    
+    def emit(self, type: str, trader_id: Optional[str] = None, message: str = '', **data: Any) -> Dict:
+        """
+        记录事件（立即返回）
+        
+        Args:
+            type: 事件类型
+            trader_id: 交易员ID（引擎级事件为空）
+            message: 可读描述
+            **data: 附加字段（价格、数量、原因等）
+        """
+        event = {'ts': time.time(), 'type': type, 'trader_id': trader_id, 'message': message, 'data': data}
+        with self._lock:
+            self._buffer.append(event)
+            if len(self._pending) >= self.capacity:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(event)
+            self.emitted += 1
+            backlog = len(self._pending)
+        
+        # 积压过半时提前落库，减少突发事件被丢弃
+        if backlog >= self.capacity // 2:
+            self._wakeup.set()
+        
+        if self._thread is None or not self._thread.is_alive():
+            self._ensure_thread()
+        return event
+    
+    def query(self, trader_id: Optional[str] = None, types: Optional[List[str]] = None,
+              since: Optional[float] = None, until: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """
+        查询事件（按时间倒序）
+        
+        查询起点在内存缓冲覆盖范围内时直接读内存，否则先落库再查数据库。
+        """
+        with self._lock:
+            in_memory = bool(since is not None and self._buffer and self._buffer[0]['ts'] <= since)
+            if in_memory:
+                events = list(self._buffer)
+        
+        if not in_memory:
+            self.flush()
+            return database.list_events(trader_id, types, since, until, limit)
+        
+        result = []
+        for event in reversed(events):
+            if event['ts'] < since or len(result) >= limit:
+                break
+            if until is not None and event['ts'] >= until:
+                continue
+            if trader_id and event['trader_id'] != trader_id:
+                continue
+            if types and event['type'] not in types:
+                continue
+            result.append(event)
+        return result
+    
+    def report(self, since: float, until: Optional[float] = None, trader_id: Optional[str] = None,
+               detail_limit: int = 50) -> Dict:
+        """
+        时间段报告：各交易员各类事件计数，以及成交和异常明细
+        
+        Args:
+            since: 起始时间（Unix秒）
+            until: 结束时间（默认当前）
+            trader_id: 只统计指定交易员
+            detail_limit: 每类明细的最大条数
+        """
+        until = until or time.time()
+        self.flush()
+        
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in database.count_events(trader_id, since, until):
+            counts.setdefault(row['trader_id'] or 'engine', {})[row['type']] = row['count']
+        
+        return {
+            'since': since,
+            'until': until,
+            'trader_id': trader_id,
+            'counts': counts,
+            'trades': database.list_events(trader_id, list(TRADE_EVENTS), since, until, detail_limit),
+            'problems': database.list_events(trader_id, list(PROBLEM_EVENTS), since, until, detail_limit)
+        }
+    
+    def flush(self):
+        """把待写事件立即落库（在调用线程执行）"""
+        with self._persist_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                events = list(self._pending)
+                self._pending.clear()
+            
+            try:
+                database.insert_events(events)
+            except Exception as e:
+                print(f"⚠️ 事件落库失败，稍后重试: {e}")
+                with self._lock:
+                    # 放回队首，超过容量时丢弃最旧的
+                    self._pending.extendleft(reversed(events))
+                    while len(self._pending) > self.capacity:
+                        self._pending.popleft()
+                        self.dropped += 1
+                return
+            
+            with self._lock:
+                self.persisted += len(events)
+    
+    def get_stats(self) -> Dict:
+        """获取事件日志状态"""
+        with self._lock:
+            return {
+                'buffered': len(self._buffer),
+                'pending': len(self._pending),
+                'emitted': self.emitted,
+                'persisted': self.persisted,
+                'dropped': self.dropped
+            }
+    
+    def _ensure_thread(self):
+        """按需启动落库线程"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name='event-journal', daemon=True)
+            self._thread.start()
+    
+    def _flush_loop(self):
+        """落库循环：定期批量写入，每小时清理过期事件"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            
+            now = time.time()
+            if self.retention_days and now - self._last_purge > 3600:
+                self._last_purge = now
+                try:
+                    database.purge_events(now - self.retention_days * 86400)
+                except Exception as e:
+                    print(f"⚠️ 清理过期事件失败: {e}")
+
+
+def format_report(report: Dict) -> str:
+    """把报告渲染为文本（夜间报告）"""
+    fmt = '%Y-%m-%d %H:%M:%S'
+    lines = [
+        '=' * 34,
+        f"交易报告 {time.strftime(fmt, time.localtime(report['since']))} ~ {time.strftime(fmt, time.localtime(report['until']))}",
+        '=' * 34,
+        '',
+        '【事件统计】'
+    ]
+    if not report['counts']:
+        lines.append('（无事件）')
+    for trader_id, counts in report['counts'].items():
+        summary = ', '.join(f"{event_type} {count}" for event_type, count in sorted(counts.items()))
+        lines.append(f"{trader_id}: {summary}")
+    
+    for title, events in (('【成交】', report['trades']), ('【异常】', report['problems'])):
+        lines.extend(['', title])
+        if not events:
+            lines.append('（无）')
+        for event in reversed(events):
+            when = time.strftime(fmt, time.localtime(event['ts']))
+            lines.append(f"{when} [{event['trader_id'] or 'engine'}] {event['type']}: {event['message']}")
+    return '\n'.join(lines) + '\n'
+
+
+# 全局事件日志
+event_journal = EventJournal(
+    capacity=settings.event_buffer_size,
+    flush_interval=settings.event_flush_interval,
+    retention_days=settings.event_retention_days
+)
+
+# 进程退出前落库
+atexit.register(event_journal.flush)
@@ -3,14 +3,161 @@ Gate.io 交易所接口封装
 使用 ccxt 库实现
 """
 import ccxt
-from typing import Dict, Optional
+import itertools
+import zlib
+from typing import Dict, List, Optional
 from decimal import Decimal
 import time
+from core.resilience import Resilience, exchange_resilience
+from core.ticker_cache import TickerCache
+
+
+FEE_RATE = 0.0015  # 交易所未返回手续费时使用的默认费率（0.15%）
+
+# 自定义订单ID序号（以毫秒时间戳起始，重启后不与之前的ID重复）
+_client_order_seq = itertools.count(int(time.time() * 1000))
+
+
+def client_order_prefix(trader_id: str) -> str:
+    """交易员的自定义订单ID前缀（Gate.io 的 text 字段需以 "t-" 开头）"""
+    return f"t-{zlib.crc32(trader_id.encode()):08x}-"
+
+
+def new_client_order_id(trader_id: str) -> str:
+    """
+    生成自定义订单ID：交易员前缀 + 递增序号（共22字符，Gate.io 限制28字符）
+    
+    对账服务按该ID把交易所的挂单和成交匹配回交易记录。
+    """
+    return f"{client_order_prefix(trader_id)}{next(_client_order_seq):x}"
+
+
+def format_balance(balance: Dict, currency: Optional[str] = None) -> Dict:
+    """
+    格式化ccxt余额数据
+    
+    Args:
+        balance: ccxt fetch_balance 返回值
+        currency: 币种，默认None（返回所有币种）
+    """
+    # 如果指定了币种，只返回该币种
+    if currency:
+        return {
+            'currency': currency,
+            'free': float(balance.get(currency, {}).get('free', 0)),
+            'used': float(balance.get(currency, {}).get('used', 0)),
+            'total': float(balance.get(currency, {}).get('total', 0))
+        }
+    
+    # 返回所有币种（为 grid.py 等策略使用）
+    return balance
+
+
+def demo_balance(currency: Optional[str] = None) -> Dict:
+    """没有API密钥时返回的模拟余额"""
+    if currency:
+        return {
+            'currency': currency,
+            'free': 1000.0,
+            'used': 0.0,
+            'total': 1000.0,
+            'demo': True
+        }
+    
+    # 返回模拟的完整余额
+    return {
+        'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0},
+        'BTC': {'free': 0.0, 'used': 0.0, 'total': 0.0},
+        'demo': True
+    }
+
+
+def format_ticker(symbol: str, ticker: Dict) -> Dict:
+    """
+    格式化ccxt行情数据
+    
+    Raises:
+        ValueError: 返回数据不完整
+    """
+    # 验证数据完整性
+    if not ticker or 'last' not in ticker:
+        raise ValueError("返回数据不完整")
+    
+    last_price = float(ticker['last'])
+    
+    return {
+        'symbol': symbol,
+        'last': last_price,
+        'bid': float(ticker.get('bid', last_price)),
+        'ask': float(ticker.get('ask', last_price)),
+        'high': float(ticker.get('high', last_price)),
+        'low': float(ticker.get('low', last_price)),
+        'volume': float(ticker.get('baseVolume', 0))
+    }
+
+
+def is_price_abnormal(price: float) -> bool:
+    """验证价格合理性（BTC价格应该在10K-200K之间）"""
+    return price < 10000 or price > 200000
+
+
+def format_order(order: Dict, symbol: str, action: str, amount: float, current_price: float,
+                 client_order_id: Optional[str] = None) -> Dict:
+    """
+    格式化ccxt订单数据
+    
+    下单返回时订单往往尚未（完全）成交，数量和价格按委托记账，之后由对账服务（core.reconcile）按实际成交修正。
+    
+    Raises:
+        ValueError: 订单返回为空
+    """
+    # 确保order不为None
+    if not order:
+        raise ValueError("订单返回为空")
+    
+    # 安全获取字段，提供默认值
+    actual_cost = float(order.get('cost') or (amount * current_price))
+    actual_fee = float((order.get('fee') or {}).get('cost', 0) if order.get('fee') else 0)
+    
+    # 如果Gate.io没有返回手续费，我们自己计算
+    if actual_fee == 0:
+        actual_fee = actual_cost * FEE_RATE
+    
+    return {
+        'order_id': str(order.get('id', f"order_{int(time.time())}")),
+        'client_order_id': order.get('clientOrderId') or client_order_id,
+        'symbol': symbol,
+        'action': action,
+        'amount': float(order.get('amount') or order.get('filled') or amount),
+        'price': float(order.get('average') or order.get('price') or current_price),
+        'cost': actual_cost,
+        'fee': actual_fee,
+        'timestamp': int(order.get('timestamp') or (time.time() * 1000)),
+        'real': True  # 真实交易
+    }
+
+
+def demo_order(symbol: str, action: str, amount: float, current_price: float) -> Dict:
+    """演示模式下的模拟订单（使用实时价格）"""
+    cost = amount * current_price
+    return {
+        'order_id': f"demo_{int(time.time())}",
+        'symbol': symbol,
+        'action': action,
+        'amount': amount,
+        'price': current_price,
+        'cost': cost,
+        'fee': cost * FEE_RATE,
+        'timestamp': int(time.time() * 1000),
+        'demo': True
+    }
+
 
 class GateIOExchange:
     """Gate.io 交易所适配器"""
     
-    def __init__(self, api_key: str = "", api_secret: str = "", testnet: bool = True):
+    def __init__(self, api_key: str = "", api_secret: str = "", testnet: bool = True, ticker_ttl: float = 2.0,
+                 resilience: Optional[Resilience] = None, client=None):
         """
         初始化 Gate.io 交易所
         
@@ -18,10 +165,18 @@ class GateIOExchange:
             api_key: API密钥
             api_secret: API密钥
             testnet: 是否使用测试网
+            ticker_ttl: 行情缓存有效期（秒）
+            resilience: 容错层（重试/熔断），默认使用全局实例
+            client: 替代 ccxt 的底层客户端（如本地模拟交易所）
         """
-        self.last_valid_price = None  # ✅ 缓存最后的有效价格
+        # 未配置API密钥（且未使用模拟交易所）时为演示模式：余额和订单返回模拟数据
+        self.demo_mode = not api_key and client is None
+        self.resilience = resilience or exchange_resilience
+        
+        # ✅ 按交易对缓存行情，并发请求合并为一次
+        self.ticker_cache = TickerCache(ttl=ticker_ttl)
         
-        self.exchange = ccxt.gateio({
+        self.exchange = client or ccxt.gateio({
             'apiKey': api_key,
             'secret': api_secret,
             'options': {'defaultType': 'spot'}
@@ -37,229 +192,184 @@ class GateIOExchange:
         
         Args:
             currency: 币种，默认None（返回所有币种）
-            
+        
         Returns:
             余额信息字典
         """
-        try:
-            balance = self.exchange.fetch_balance()
-            
-            # 如果指定了币种，只返回该币种
-            if currency:
-                return {
-                    'currency': currency,
-                    'free': float(balance.get(currency, {}).get('free', 0)),
-                    'used': float(balance.get(currency, {}).get('used', 0)),
-                    'total': float(balance.get(currency, {}).get('total', 0))
-                }
-            
-            # 返回所有币种（为 grid.py 等策略使用）
-            return balance
-            
-        except Exception as e:
-            # 如果没有API密钥，返回模拟数据
-            if currency:
-                return {
-                    'currency': currency,
-                    'free': 1000.0,
-                    'used': 0.0,
-                    'total': 1000.0,
-                    'demo': True
-                }
-            else:
-                # 返回模拟的完整余额
-                return {
-                    'USDT': {'free': 1000.0, 'used': 0.0, 'total': 1000.0},
-                    'BTC': {'free': 0.0, 'used': 0.0, 'total': 0.0},
-                    'demo': True
-                }
+        if self.demo_mode:
+            return demo_balance(currency)
+        
+        balance = self.resilience.call('fetch_balance', self.exchange.fetch_balance)
+        return format_balance(balance, currency)
     
     def get_ticker(self, symbol: str = 'BTC/USDT') -> Dict:
-        """获取行情 - 带重试机制和缓存"""
-        max_retries = 3
-        retry_delay = 1  # 秒
+        """获取行情 - TTL内走缓存，过期时合并并发请求，失败时回退到该交易对的缓存行情"""
+        return self.ticker_cache.get(symbol, lambda: self._fetch_ticker(symbol))
+    
+    def _fetch_ticker(self, symbol: str) -> Dict:
+        """从交易所获取行情（网络错误由容错层退避重试，熔断期间立即失败）"""
+        ticker = format_ticker(symbol, self.resilience.call('fetch_ticker', self.exchange.fetch_ticker, symbol))
         
-        for attempt in range(max_retries):
-            try:
-                ticker = self.exchange.fetch_ticker(symbol)
-                
-                # 验证数据完整性
-                if not ticker or 'last' not in ticker:
-                    raise ValueError("返回数据不完整")
-                
-                last_price = float(ticker['last'])
-                
-                # 验证价格合理性（BTC价格应该在10K-200K之间）
-                if last_price < 10000 or last_price > 200000:
-                    print(f"⚠️ 异常价格: ${last_price:,.2f}，重试中...")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                
-                # 缓存最后的有效价格
-                self.last_valid_price = last_price
-                
-                return {
-                    'symbol': symbol,
-                    'last': last_price,
-                    'bid': float(ticker.get('bid', last_price)),
-                    'ask': float(ticker.get('ask', last_price)),
-                    'high': float(ticker.get('high', last_price)),
-                    'low': float(ticker.get('low', last_price)),
-                    'volume': float(ticker.get('baseVolume', 0))
-                }
-                
-            except Exception as e:
-                print(f"⚠️ 获取行情失败 (尝试{attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    continue
+        if is_price_abnormal(ticker['last']):
+            print(f"⚠️ 异常价格: ${ticker['last']:,.2f}，重新获取...")
+            time.sleep(self.resilience.policy.delay(0))
+            ticker = format_ticker(symbol, self.resilience.call('fetch_ticker', self.exchange.fetch_ticker, symbol))
         
-        # 所有重试都失败，使用缓存的价格
-        if hasattr(self, 'last_valid_price') and self.last_valid_price:
-            print(f"⚠️ 使用缓存价格: ${self.last_valid_price:,.2f}")
-            return {
-                'symbol': symbol,
-                'last': self.last_valid_price,
-                'bid': self.last_valid_price,
-                'ask': self.last_valid_price,
-                'high': self.last_valid_price,
-                'low': self.last_valid_price,
-                'volume': 0,
-                'cached': True
-            }
+        return ticker
+    
+    def get_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                  limit: Optional[int] = None) -> List[List[float]]:
+        """
+        获取K线（公开行情，演示模式下同样可用）
+        
+        Args:
+            symbol: 交易对
+            timeframe: 周期，如 1m / 1h / 1d
+            since: 起始开盘时间（毫秒时间戳），None 表示最近的K线
+            limit: 最多返回的根数
         
-        # 完全没有有效数据，抛出异常（不返回虚假的模拟价格）
-        raise Exception(f"无法获取{symbol}的有效行情数据，且无缓存可用")
+        Returns:
+            [[ts, open, high, low, close, volume], ...]，按时间正序
+        """
+        return self.resilience.call('fetch_ohlcv', self.exchange.fetch_ohlcv, symbol, timeframe, since, limit)
     
-    def market_buy(self, symbol: str, amount: float) -> Dict:
+    def create_limit_order(self, symbol: str, side: str, amount: float, price: float,
+                           client_order_id: Optional[str] = None) -> Dict:
+        """
+        挂限价单（挂单策略使用，不做市价保护）
+        
+        Args:
+            symbol: 交易对
+            side: buy / sell
+            amount: 数量
+            price: 限价
+            client_order_id: 自定义订单ID（Gate.io 的 text 字段，需以 "t-" 开头，最长28字符）
+        
+        Returns:
+            ccxt 订单（id / clientOrderId / status / filled / cost / fee 等）
+        
+        Raises:
+            ValueError: 演示模式不支持挂单
+        """
+        if self.demo_mode:
+            raise ValueError("演示模式不支持挂单，请配置API密钥或使用模拟交易所")
+        
+        params = {'text': client_order_id} if client_order_id else {}
+        # 下单不是幂等操作，不重试；熔断期间立即失败
+        return self.resilience.call(
+            'create_order', self.exchange.create_order, symbol, 'limit', side, amount, price, params, retries=0
+        )
+    
+    def cancel_order(self, order_id: str, symbol: str) -> Dict:
+        """
+        撤单
+        
+        Raises:
+            ccxt.OrderNotFound: 订单不存在或已结束（已成交/已撤销）
+        """
+        return self.resilience.call('cancel_order', self.exchange.cancel_order, order_id, symbol)
+    
+    def fetch_order(self, order_id: str, symbol: str) -> Dict:
+        """查询订单（ccxt 订单格式）"""
+        return self.resilience.call('fetch_order', self.exchange.fetch_order, order_id, symbol)
+    
+    def fetch_open_orders(self, symbol: str) -> List[Dict]:
+        """交易对的全部未完成订单（一次请求，挂单策略据此发现成交）"""
+        return self.resilience.call('fetch_open_orders', self.exchange.fetch_open_orders, symbol)
+    
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        账户在交易对上的成交明细（ccxt trade 格式，按时间正序）
+        
+        Args:
+            symbol: 交易对
+            since: 起始时间（毫秒时间戳）
+            limit: 最多返回的条数
+        """
+        return self.resilience.call('fetch_my_trades', self.exchange.fetch_my_trades, symbol, since, limit)
+    
+    def market_buy(self, symbol: str, amount: float, client_order_id: Optional[str] = None) -> Dict:
         """
         市价买入
         
         Args:
             symbol: 交易对，如 BTC/USDT
             amount: 买入数量（币的数量）
-            
+            client_order_id: 自定义订单ID，默认按手动交易生成
+        
         Returns:
             订单信息
         """
+        client_order_id = client_order_id or new_client_order_id('manual')
+        
         # 先获取当前市场价格
         ticker = self.get_ticker(symbol)
         current_price = ticker.get('last')
         if not current_price:
             raise ValueError(f"无法获取{symbol}的当前价格")
-        cost = amount * current_price
+        
+        # 演示模式（未配置API密钥）：返回模拟订单（使用实时价格）
+        if self.demo_mode:
+            return demo_order(symbol, 'buy', amount, current_price)
         
         try:
             # Gate.io测试网可能不支持市价单，使用限价单模拟市价单
             # 买入时价格设置为当前价格的1.005倍（0.5%溢价），确保成交
-            order = self.exchange.create_limit_buy_order(
+            # 下单不是幂等操作，不重试；熔断期间立即失败
+            order = self.resilience.call(
+                'create_order',
+                self.exchange.create_limit_buy_order,
                 symbol,
-                amount,  # BTC数量
-                current_price * 1.005  # 稍高于市价，确保成交
+                amount,
+                current_price * 1.005,
+                {'text': client_order_id},
+                retries=0
             )
-            
-            # 确保order不为None
-            if not order:
-                raise ValueError("订单返回为空")
-            
-            # 安全获取字段，提供默认值
-            actual_cost = float(order.get('cost') or (amount * current_price))
-            actual_fee = float((order.get('fee') or {}).get('cost', 0) if order.get('fee') else 0)
-            
-            # 如果Gate.io没有返回手续费，我们自己计算
-            if actual_fee == 0:
-                actual_fee = actual_cost * 0.0015  # 0.15%
-            
-            return {
-                'order_id': str(order.get('id', f"order_{int(time.time())}")),
-                'symbol': symbol,
-                'action': 'buy',
-                'amount': float(order.get('amount') or order.get('filled') or amount),
-                'price': float(order.get('average') or order.get('price') or current_price),
-                'cost': actual_cost,
-                'fee': actual_fee,
-                'timestamp': int(order.get('timestamp') or (time.time() * 1000)),
-                'real': True  # 真实交易
-            }
+            return format_order(order, symbol, 'buy', amount, current_price, client_order_id)
         except Exception as e:
-            # 模拟订单（使用实时价格）
-            print(f"Buy order failed: {str(e)}")  # 打印错误日志
-            return {
-                'order_id': f"demo_{int(time.time())}",
-                'symbol': symbol,
-                'action': 'buy',
-                'amount': amount,
-                'price': current_price,
-                'cost': cost,
-                'fee': cost * 0.0015,
-                'timestamp': int(time.time() * 1000),
-                'demo': True,
-                'error': str(e)
-            }
+            # 真实模式下不再伪造订单，由调用方处理失败
+            print(f"Buy order failed: {str(e)}")
+            raise
     
-    def market_sell(self, symbol: str, amount: float) -> Dict:
+    def market_sell(self, symbol: str, amount: float, client_order_id: Optional[str] = None) -> Dict:
         """
         市价卖出
         
         Args:
             symbol: 交易对
             amount: 卖出数量
-            
+            client_order_id: 自定义订单ID，默认按手动交易生成
+        
         Returns:
             订单信息
         """
+        client_order_id = client_order_id or new_client_order_id('manual')
+        
         # 先获取当前市场价格
         ticker = self.get_ticker(symbol)
         current_price = ticker.get('last')
         if not current_price:
             raise ValueError(f"无法获取{symbol}的当前价格")
-        cost = amount * current_price
+        
+        # 演示模式（未配置API密钥）：返回模拟订单（使用实时价格）
+        if self.demo_mode:
+            return demo_order(symbol, 'sell', amount, current_price)
         
         try:
             # 使用限价单模拟市价单
             # 卖出时价格设置为当前价格的0.995倍（0.5%折价），确保成交
-            order = self.exchange.create_limit_sell_order(
+            # 下单不是幂等操作，不重试；熔断期间立即失败
+            order = self.resilience.call(
+                'create_order',
+                self.exchange.create_limit_sell_order,
                 symbol,
                 amount,
-                current_price * 0.995
+                current_price * 0.995,
+                {'text': client_order_id},
+                retries=0
             )
-            
-            # 确保order不为None
-            if not order:
-                raise ValueError("订单返回为空")
-            
-            # 安全获取字段
-            actual_cost = float(order.get('cost') or (amount * current_price))
-            actual_fee = float((order.get('fee') or {}).get('cost', 0) if order.get('fee') else 0)
-            
-            # 如果Gate.io没有返回手续费，我们自己计算
-            if actual_fee == 0:
-                actual_fee = actual_cost * 0.0015  # 0.15%
-            
-            return {
-                'order_id': str(order.get('id', f"order_{int(time.time())}")),
-                'symbol': symbol,
-                'action': 'sell',
-                'amount': float(order.get('amount') or order.get('filled') or amount),
-                'price': float(order.get('average') or order.get('price') or current_price),
-                'cost': actual_cost,
-                'fee': actual_fee,
-                'timestamp': int(order.get('timestamp') or (time.time() * 1000)),
-                'real': True
-            }
+            return format_order(order, symbol, 'sell', amount, current_price, client_order_id)
         except Exception as e:
-            # 模拟订单（使用实时价格）
+            # 真实模式下不再伪造订单，由调用方处理失败
             print(f"Sell order failed: {str(e)}")
-            return {
-                'order_id': f"demo_{int(time.time())}",
-                'symbol': symbol,
-                'action': 'sell',
-                'amount': amount,
-                'price': current_price,
-                'cost': cost,
-                'fee': cost * 0.0015,
-                'timestamp': int(time.time() * 1000),
-                'demo': True,
-                'error': str(e)
-            }
+            raise
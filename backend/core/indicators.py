@@ -0,0 +1,359 @@
+"""
+流式技术指标
+每个交易对一份状态，由行情中心每次拉取行情时更新一次，所有策略和 AI 决策共享同一份结果：
+
+- 行情按周期（默认1分钟）聚合成K线，K线收盘时各指标 O(1) 增量更新（环形缓冲 + 滚动和）
+- 指标：SMA / EMA / ATR / 滚动波动率 / 布林带 / RSI / 滚动 VWAP
+- 首次使用某交易对时从本地K线存储批量预热，不必等几十根K线走完
+"""
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import settings
+from core.candles import timeframe_ms
+
+
+class RollingWindow:
+    """定长环形缓冲，维护滚动和与平方和（相对首个值平移，避免大数相减丢失精度）"""
+    
+    __slots__ = ('size', 'values', 'index', 'count', 'shift', 'total', 'total_sq')
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.values = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.shift: Optional[float] = None
+        self.total = 0.0
+        self.total_sq = 0.0
+    
+    def push(self, value: float):
+        """加入新值，窗口满时挤出最旧的值"""
+        if self.shift is None:
+            self.shift = value
+        value -= self.shift
+        if self.count == self.size:
+            old = self.values[self.index]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.total += value
+        self.total_sq += value * value
+    
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+    
+    @property
+    def sum(self) -> float:
+        return self.total + self.shift * self.count
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count + self.shift
+    
+    @property
+    def std(self) -> float:
+        """总体标准差"""
+        mean = self.total / self.count
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+
+class SymbolIndicators:
+    """单个交易对的指标状态（调用方负责加锁）"""
+    
+    def __init__(self, symbol: str, period_ms: int, sma_period: int = 20, ema_period: int = 20,
+                 atr_period: int = 14, volatility_period: int = 30, bb_period: int = 20, bb_width: float = 2.0,
+                 rsi_period: int = 14, vwap_period: int = 60):
+        self.symbol = symbol
+        self.period_ms = period_ms
+        self.ema_period = ema_period
+        self.atr_period = atr_period
+        self.rsi_period = rsi_period
+        self.bb_width = bb_width
+        
+        self.closes = RollingWindow(sma_period)
+        self.bands = self.closes if bb_period == sma_period else RollingWindow(bb_period)
+        self.returns = RollingWindow(volatility_period)
+        self.vwap_pv = RollingWindow(vwap_period)
+        self.vwap_volume = RollingWindow(vwap_period)
+        
+        # EMA / ATR / RSI 用前 N 根的均值做种子，之后递推
+        self.ema: Optional[float] = None
+        self.atr: Optional[float] = None
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self._seed_close = 0.0
+        self._seed_tr = 0.0
+        self._seed_gain = 0.0
+        self._seed_loss = 0.0
+        
+        self.bars = 0
+        self.last_close: Optional[float] = None
+        self.last_bar_ts: Optional[int] = None  # 最后一根已收盘K线的开盘时间
+        
+        # 正在形成的K线 [ts, open, high, low, close, volume]
+        self.forming: Optional[List[float]] = None
+        self.price: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self._volume_24h: Optional[float] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+    
+    def on_tick(self, price: float, volume_24h: Optional[float], timestamp: int):
+        """一笔行情：更新正在形成的K线，跨周期时先收盘上一根"""
+        # 24h 成交量的增量近似为两次行情之间的成交量（窗口滚动导致变小时记为0）
+        volume = 0.0
+        if volume_24h is not None:
+            if self._volume_24h is not None:
+                volume = max(volume_24h - self._volume_24h, 0.0)
+            self._volume_24h = volume_24h
+        
+        start = timestamp - timestamp % self.period_ms
+        bar = self.forming
+        if bar is not None and start > bar[0]:
+            self.add_bar(*bar)
+            bar = None
+        if bar is None:
+            self.forming = [start, price, price, price, price, volume]
+        elif start == bar[0]:
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            bar[5] += volume
+        
+        self.price = price
+        self.updated_at = time.time()
+        self._snapshot = None
+    
+    def add_bar(self, ts: int, open_: float, high: float, low: float, close: float, volume: float):
+        """一根已收盘的K线：各指标 O(1) 递推"""
+        if self.last_bar_ts is not None and ts <= self.last_bar_ts:
+            return
+        
+        prev = self.last_close
+        self.bars += 1
+        self.closes.push(close)
+        if self.bands is not self.closes:
+            self.bands.push(close)
+        typical = (high + low + close) / 3
+        self.vwap_pv.push(typical * volume)
+        self.vwap_volume.push(volume)
+        
+        # EMA
+        if self.ema is None:
+            self._seed_close += close
+            if self.bars == self.ema_period:
+                self.ema = self._seed_close / self.ema_period
+        else:
+            alpha = 2 / (self.ema_period + 1)
+            self.ema += alpha * (close - self.ema)
+        
+        if prev is not None:
+            # ATR（Wilder 平滑）
+            true_range = max(high - low, abs(high - prev), abs(low - prev))
+            if self.atr is None:
+                self._seed_tr += true_range
+                if self.bars - 1 == self.atr_period:
+                    self.atr = self._seed_tr / self.atr_period
+            else:
+                self.atr += (true_range - self.atr) / self.atr_period
+            
+            # RSI（Wilder 平滑）
+            change = close - prev
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if self.avg_gain is None:
+                self._seed_gain += gain
+                self._seed_loss += loss
+                if self.bars - 1 == self.rsi_period:
+                    self.avg_gain = self._seed_gain / self.rsi_period
+                    self.avg_loss = self._seed_loss / self.rsi_period
+            else:
+                self.avg_gain += (gain - self.avg_gain) / self.rsi_period
+                self.avg_loss += (loss - self.avg_loss) / self.rsi_period
+            
+            # 对数收益率（滚动波动率）
+            if prev > 0 and close > 0:
+                self.returns.push(math.log(close / prev))
+        
+        self.last_close = close
+        self.last_bar_ts = ts
+        if self.updated_at is None:
+            self.price = close  # 尚未收到行情（预热中）时以收盘价为当前价
+        self._snapshot = None
+    
+    @property
+    def atr_pct(self) -> Optional[float]:
+        """ATR 占最新收盘价的百分比"""
+        return self.atr / self.last_close * 100 if self.atr is not None and self.last_close else None
+    
+    @property
+    def volatility_pct(self) -> Optional[float]:
+        """单根K线对数收益率的滚动标准差（百分比）"""
+        return self.returns.std * 100 if self.returns.full else None
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前指标（缓存到下一次更新；预热不足的指标为 None）"""
+        if self._snapshot is not None:
+            return self._snapshot
+        
+        closes, bands = self.closes, self.bands
+        rsi = None
+        if self.avg_gain is not None:
+            rsi = 100.0 if self.avg_loss == 0 else 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        bb_middle = bb_upper = bb_lower = None
+        if bands.full:
+            bb_middle = bands.mean
+            bb_upper = bb_middle + self.bb_width * bands.std
+            bb_lower = bb_middle - self.bb_width * bands.std
+        volume = self.vwap_volume.sum if self.vwap_volume.count else 0.0
+        
+        self._snapshot = {
+            'symbol': self.symbol,
+            'price': self.price,
+            'bars': self.bars,
+            'last_bar_ts': self.last_bar_ts,
+            'sma': closes.mean if closes.full else None,
+            'ema': self.ema,
+            'atr': self.atr,
+            'atr_pct': self.atr_pct,
+            'volatility_pct': self.volatility_pct,
+            'bb_upper': bb_upper,
+            'bb_middle': bb_middle,
+            'bb_lower': bb_lower,
+            'rsi': rsi,
+            'vwap': self.vwap_pv.sum / volume if volume > 0 else None,
+            'updated_at': self.updated_at
+        }
+        return self._snapshot
+
+
+class IndicatorEngine:
+    """按交易对共享的指标引擎（线程安全）"""
+    
+    def __init__(self, timeframe: str = '1m', warmup_bars: int = 500, **periods):
+        """
+        初始化指标引擎
+        
+        Args:
+            timeframe: 指标K线周期
+            warmup_bars: 从本地K线存储预热的根数，0表示不预热
+            periods: 指标参数（sma_period / ema_period / atr_period / volatility_period /
+                     bb_period / bb_width / rsi_period / vwap_period）
+        """
+        self.timeframe = timeframe
+        self.period_ms = timeframe_ms(timeframe)
+        self.warmup_bars = warmup_bars
+        self.periods = periods
+        
+        self._lock = threading.Lock()
+        self._symbols: Dict[str, SymbolIndicators] = {}
+        
+        # 统计
+        self.ticks = 0
+        self.warmups = 0
+        self.warmup_errors = 0
+    
+    def on_tick(self, symbol: str, price: float, volume_24h: Optional[float] = None,
+                timestamp: Optional[int] = None):
+        """
+        一笔行情（由行情中心每次拉取后调用一次）
+        
+        Args:
+            symbol: 交易对
+            price: 最新价
+            volume_24h: 24h 成交量（用于估算K线成交量）
+            timestamp: 行情时间（毫秒），默认当前时间
+        """
+        timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+        with self._lock:
+            self._state(symbol).on_tick(price, volume_24h, timestamp)
+            self.ticks += 1
+    
+    def catch_up(self, symbol: str, exchange=None) -> int:
+        """
+        从本地K线存储补入尚未计入的已收盘K线（首次使用时即为批量预热）
+        
+        行情中心在交易对首次拉取前调用；没有交易员订阅的交易对由 AI 决策在读取前调用，
+        增量同步后只补入新收盘的K线。
+        
+        Args:
+            symbol: 交易对
+            exchange: 同步交易所客户端，提供时先增量同步K线存储
+        
+        Returns:
+            补入的K线根数
+        """
+        if not self.warmup_bars:
+            return 0
+        
+        from core.candles import candle_store
+        
+        now = int(time.time() * 1000)
+        current = now - now % self.period_ms
+        with self._lock:
+            state = self._symbols.get(symbol)
+            last = state.last_bar_ts if state else None
+            forming = state.forming[0] if state and state.forming else None
+        if last is not None and last >= current - self.period_ms:
+            return 0  # 已是最新
+        
+        try:
+            if exchange is not None:
+                candle_store.sync(exchange, symbol, self.timeframe, max_requests=1)
+            if last is None:
+                candles = candle_store.read(symbol, self.timeframe, until=current, limit=self.warmup_bars)
+            else:
+                candles = candle_store.read(symbol, self.timeframe, since=last + 1, until=current)
+        except Exception as e:
+            self.warmup_errors += 1
+            print(f"⚠️ {symbol} 指标预热失败: {e}")
+            return 0
+        
+        columns = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+        bars = list(zip(*(candles[column].tolist() for column in columns)))
+        with self._lock:
+            state = self._state(symbol)
+            # 只补入早于正在形成的K线的部分，保证按时间顺序递推
+            limit = forming if forming is not None else current
+            for bar in bars:
+                if bar[0] < limit:
+                    state.add_bar(*bar)
+            self.warmups += 1
+        return len(bars)
+    
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """交易对的当前指标（未跟踪时返回 None）"""
+        with self._lock:
+            state = self._symbols.get(symbol)
+            return state.snapshot() if state else None
+    
+    def drop(self, symbol: str):
+        """停止跟踪交易对（最后一个订阅者离开时），再次使用时重新预热"""
+        with self._lock:
+            self._symbols.pop(symbol, None)
+    
+    def get_stats(self) -> Dict:
+        """指标引擎状态"""
+        with self._lock:
+            return {
+                'timeframe': self.timeframe,
+                'symbols': {symbol: state.bars for symbol, state in self._symbols.items()},
+                'ticks': self.ticks,
+                'warmups': self.warmups,
+                'warmup_errors': self.warmup_errors
+            }
+    
+    def _state(self, symbol: str) -> SymbolIndicators:
+        """交易对状态（不存在则创建，调用方需持有锁）"""
+        state = self._symbols.get(symbol)
+        if state is None:
+            state = self._symbols[symbol] = SymbolIndicators(symbol, self.period_ms, **self.periods)
+        return state
+
+
+# 全局指标引擎（行情中心写入，策略和 AI 决策读取）
+indicator_engine = IndicatorEngine(timeframe=settings.indicator_timeframe, warmup_bars=settings.indicator_warmup_bars)
@@ -0,0 +1,131 @@
+"""
+持仓/盈亏账本
+按 (trader_id, symbol) 累计买卖数量、成本、收入和手续费，盈亏和持仓查询为 O(1)
+"""
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+
+LEDGER_FIELDS = ('bought', 'sold', 'buy_cost', 'sell_revenue', 'fees', 'position', 'trade_count')
+
+
+def new_entry() -> Dict[str, float]:
+    """空账本条目"""
+    return {field: 0.0 for field in LEDGER_FIELDS}
+
+
+def apply_trade(entry: Dict[str, float], action: str, price: float, amount: float, fee: float = 0.0) -> Dict[str, float]:
+    """
+    把一笔成交累加到账本条目（原地修改）
+    
+    Args:
+        entry: 账本条目
+        action: buy 或 sell
+        price: 成交价格
+        amount: 成交数量
+        fee: 手续费
+    """
+    if action == 'buy':
+        entry['bought'] += amount
+        entry['buy_cost'] += price * amount
+        entry['position'] += amount
+    else:  # sell
+        entry['sold'] += amount
+        entry['sell_revenue'] += price * amount
+        entry['position'] -= amount
+    entry['fees'] += fee or 0
+    entry['trade_count'] += 1
+    return entry
+
+
+def compute_pnl(entry: Dict[str, float], current_price: float = 0.0) -> Dict[str, float]:
+    """
+    根据账本条目计算盈亏（平均成本法）
+    
+    Args:
+        entry: 账本条目
+        current_price: 当前市场价格（有持仓时用于计算未实现盈亏）
+    
+    Returns:
+        realized_pnl / unrealized_pnl / total_pnl / pnl_pct / total_cost / current_value / current_position
+    """
+    total_bought = entry['bought']
+    total_sold = entry['sold']
+    total_buy_cost = entry['buy_cost']
+    current_position = entry['position']
+    
+    # 已实现盈亏（已卖出部分）
+    if total_sold > 0:
+        avg_buy_price = total_buy_cost / total_bought if total_bought > 0 else 0
+        realized_pnl = entry['sell_revenue'] - (avg_buy_price * total_sold)
+    else:
+        realized_pnl = 0.0
+    
+    # 未实现盈亏（当前持仓）
+    unrealized_pnl = 0.0
+    current_value = 0.0
+    if current_position > 0 and current_price > 0:
+        # 当前持仓的平均成本
+        remaining_cost = total_buy_cost - (total_buy_cost / total_bought * total_sold) if total_bought > 0 else 0
+        current_value = current_position * current_price
+        unrealized_pnl = current_value - remaining_cost
+    
+    total_pnl = realized_pnl + unrealized_pnl
+    pnl_pct = (total_pnl / total_buy_cost * 100) if total_buy_cost > 0 else 0.0
+    
+    return {
+        'realized_pnl': realized_pnl,
+        'unrealized_pnl': unrealized_pnl,
+        'total_pnl': total_pnl,
+        'pnl_pct': pnl_pct,
+        'total_cost': total_buy_cost,
+        'current_value': current_value,
+        'current_position': current_position
+    }
+
+
+class LedgerMirror:
+    """
+    账本内存镜像
+    
+    只在数据库事务提交后更新；未命中时在锁内从数据库加载，
+    保证加载与提交后的增量更新不会互相覆盖。
+    """
+    
+    def __init__(self):
+        """初始化内存镜像"""
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, float]] = {}
+    
+    def get(self, trader_id: str, symbol: str, loader: Callable[[], Optional[Dict[str, float]]]) -> Dict[str, float]:
+        """
+        获取账本条目副本
+        
+        Args:
+            trader_id: 交易员ID
+            symbol: 交易对
+            loader: 未命中时从数据库加载条目的函数
+        """
+        key = (trader_id, symbol)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = loader() or new_entry()
+                self._entries[key] = entry
+            return dict(entry)
+    
+    def apply(self, trader_id: str, symbol: str, action: str, price: float, amount: float, fee: float = 0.0):
+        """事务提交后把成交累加到镜像（未缓存的条目下次读取时会从数据库加载）"""
+        with self._lock:
+            entry = self._entries.get((trader_id, symbol))
+            if entry is not None:
+                apply_trade(entry, action, price, amount, fee)
+    
+    def invalidate(self, trader_id: Optional[str] = None):
+        """清除镜像（指定trader_id时只清除该交易员）"""
+        with self._lock:
+            if trader_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == trader_id]:
+                    del self._entries[key]
@@ -0,0 +1,204 @@
+"""行情中心 - 按交易对统一拉取行情，分发给所有订阅的策略，并更新该交易对的共享技术指标"""
+import threading
+import time
+from typing import Dict, Optional
+from core.exchange import GateIOExchange
+from core.indicators import IndicatorEngine, indicator_engine
+from core.stream import stream_hub
+
+
+class MarketDataHub:
+    """
+    行情中心
+    
+    每个交易对只由一个后台线程轮询一次，所有订阅该交易对的策略共享最新行情。
+    交易所请求数只与交易对数量有关，与交易员数量无关。
+    """
+    
+    def __init__(self, exchange: GateIOExchange, stale_factor: float = 3.0,
+                 indicators: Optional[IndicatorEngine] = None):
+        """
+        初始化行情中心
+        
+        Args:
+            exchange: 交易所实例
+            stale_factor: 行情超过 轮询间隔×stale_factor 未更新即视为过期
+            indicators: 技术指标引擎，默认使用全局实例
+        """
+        self.exchange = exchange
+        self.stale_factor = stale_factor
+        self.indicators = indicators or indicator_engine
+        
+        self._cond = threading.Condition()
+        self._wakeup = threading.Event()
+        self._subscribers: Dict[str, Dict[str, float]] = {}  # symbol -> {subscriber_id: interval}
+        self._ticks: Dict[str, Dict] = {}  # symbol -> 最新行情
+        self._next_poll: Dict[str, float] = {}  # symbol -> 下次轮询时间
+        self._warm: set = set()  # 指标已预热的交易对
+        self._thread: Optional[threading.Thread] = None
+        
+        # 统计
+        self.request_count = 0
+        self.error_count = 0
+    
+    def subscribe(self, symbol: str, subscriber_id: str, interval: float):
+        """
+        订阅交易对行情
+        
+        Args:
+            symbol: 交易对
+            subscriber_id: 订阅者ID（通常为trader_id）
+            interval: 订阅者期望的刷新间隔（秒），交易对按所有订阅者中最短的间隔轮询
+        """
+        with self._cond:
+            subscribers = self._subscribers.setdefault(symbol, {})
+            is_new_symbol = not subscribers
+            subscribers[subscriber_id] = max(float(interval), 1.0)
+            
+            # 新交易对立即拉取一次
+            if is_new_symbol:
+                self._next_poll[symbol] = time.time()
+        
+        self._ensure_thread()
+        self._wakeup.set()
+    
+    def unsubscribe(self, symbol: str, subscriber_id: str):
+        """取消订阅，最后一个订阅者离开时停止轮询该交易对"""
+        with self._cond:
+            subscribers = self._subscribers.get(symbol)
+            if not subscribers:
+                return
+            
+            subscribers.pop(subscriber_id, None)
+            
+            if not subscribers:
+                del self._subscribers[symbol]
+                self._next_poll.pop(symbol, None)
+                self._ticks.pop(symbol, None)
+                self._warm.discard(symbol)
+                self.indicators.drop(symbol)
+    
+    def get_ticker(self, symbol: str, timeout: float = 10.0) -> Dict:
+        """
+        获取交易对最新行情
+        
+        Args:
+            symbol: 交易对
+            timeout: 首笔行情尚未到达时的最长等待时间（秒）
+        
+        Returns:
+            行情字典，额外包含:
+                - received_at: 行情接收时间（秒）
+                - age: 行情距今的秒数
+                - stale: 是否已过期
+        """
+        with self._cond:
+            if symbol not in self._subscribers:
+                tick = None
+            else:
+                self._cond.wait_for(lambda: symbol in self._ticks or symbol not in self._subscribers, timeout)
+                tick = self._ticks.get(symbol)
+                interval = self._poll_interval(symbol)
+        
+        # 未订阅的交易对直接请求交易所
+        if tick is None:
+            if symbol in self._subscribers:
+                raise Exception(f"{symbol} 行情尚未就绪")
+            ticker = self.exchange.get_ticker(symbol)
+            age = ticker.get('age', 0.0)
+            ticker.update({'received_at': time.time() - age, 'age': age, 'stale': False})
+            return ticker
+        
+        age = time.time() - tick['received_at']
+        result = dict(tick)
+        result['age'] = age
+        result['stale'] = interval is not None and age > interval * self.stale_factor
+        return result
+    
+    def get_indicators(self, symbol: str) -> Optional[Dict]:
+        """交易对的共享技术指标（每次拉取行情时更新一次，所有订阅者读取同一份结果）"""
+        return self.indicators.get(symbol)
+    
+    def get_stats(self) -> Dict:
+        """获取行情中心状态"""
+        now = time.time()
+        with self._cond:
+            symbols = {}
+            for symbol, subscribers in self._subscribers.items():
+                tick = self._ticks.get(symbol)
+                symbols[symbol] = {
+                    'subscribers': len(subscribers),
+                    'interval': self._poll_interval(symbol),
+                    'age': (now - tick['received_at']) if tick else None
+                }
+        
+        return {
+            'symbols': symbols,
+            'request_count': self.request_count,
+            'error_count': self.error_count
+        }
+    
+    def _poll_interval(self, symbol: str) -> Optional[float]:
+        """交易对的轮询间隔（调用方需持有锁）"""
+        subscribers = self._subscribers.get(symbol)
+        if not subscribers:
+            return None
+        return min(subscribers.values())
+    
+    def _ensure_thread(self):
+        """按需启动轮询线程"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._poll_loop, name='market-data-hub', daemon=True)
+            self._thread.start()
+    
+    def _poll_loop(self):
+        """轮询循环"""
+        while True:
+            now = time.time()
+            with self._cond:
+                due = [symbol for symbol, at in self._next_poll.items() if at <= now]
+            
+            for symbol in due:
+                self._poll(symbol)
+            
+            with self._cond:
+                next_at = min(self._next_poll.values()) if self._next_poll else None
+            
+            timeout = None if next_at is None else max(next_at - time.time(), 0)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+    
+    def _poll(self, symbol: str):
+        """拉取单个交易对行情并分发"""
+        # 交易对首次拉取前，用本地K线存储预热指标
+        if symbol not in self._warm:
+            self._warm.add(symbol)
+            self.indicators.catch_up(symbol, self.exchange)
+        
+        ticker = None
+        try:
+            self.request_count += 1
+            ticker = self.exchange.get_ticker(symbol)
+        except Exception as e:
+            self.error_count += 1
+            print(f"⚠️ 行情中心获取{symbol}失败: {e}")
+        
+        with self._cond:
+            interval = self._poll_interval(symbol)
+            if interval is None:
+                return  # 轮询期间已无订阅者
+            
+            self._next_poll[symbol] = time.time() + interval
+            
+            if ticker is not None:
+                tick = dict(ticker)
+                tick['received_at'] = time.time() - ticker.get('age', 0.0)  # 扣除行情在交易所缓存中的时长
+                self._ticks[symbol] = tick
+                self._cond.notify_all()
+        
+        if ticker is not None:
+            received_ms = int((time.time() - ticker.get('age', 0.0)) * 1000)
+            self.indicators.on_tick(symbol, ticker['last'], ticker.get('volume'), received_ms)
+            stream_hub.update_price(symbol, ticker['last'])
@@ -0,0 +1,243 @@
+"""
+进程内指标（Prometheus 文本格式导出）
+
+- 直方图：固定桶计数，observe() 只做一次二分查找和三次加法，适合放在 tick / 交易所调用 / SQL 执行等热点路径
+- 计数器：按标签累加
+- 仪表：抓取时调用回调函数现算（线程数、心跳延迟等），平时零开销
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+
+# 默认延迟桶（秒）：0.5ms ~ 10s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 仪表回调返回单个值，或 标签值元组 -> 值
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """渲染标签 {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """渲染数值（整数不带小数点）"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """单个标签组合的直方图"""
+    
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+    
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """记录一个观测值"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """一致性快照：(累计桶计数, 总和, 次数)"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class HistogramFamily:
+    """按标签区分的一组直方图"""
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values: str) -> Histogram:
+        """获取（或创建）标签组合对应的直方图"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+    
+    def observe(self, value: float, *labels: str):
+        """记录一个观测值"""
+        self.labels(*labels).observe(value)
+    
+    @contextmanager
+    def time(self, *labels: str):
+        """计时上下文（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(*labels).observe(time.perf_counter() - started)
+    
+    def remove(self, *labels: str):
+        """删除标签组合（如交易员被删除）"""
+        with self._lock:
+            self._children.pop(labels, None)
+    
+    def render(self) -> List[str]:
+        """Prometheus 文本格式"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            cumulative, total, count = child.snapshot()
+            for bound, value in zip(self.buckets + (float('inf'),), cumulative):
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {value}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class CounterFamily:
+    """按标签区分的一组计数器"""
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        """累加"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def get(self, *labels: str) -> float:
+        """当前值"""
+        return self._values.get(labels, 0.0)
+    
+    def render(self) -> List[str]:
+        """Prometheus 文本格式"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class GaugeFamily:
+    """抓取时由回调计算的仪表"""
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], callback: Callable[[], GaugeValue]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+    
+    def render(self) -> List[str]:
+        """Prometheus 文本格式（回调失败时只输出元信息）"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"⚠️ 指标 {self.name} 采集失败: {e}")
+            return lines
+        
+        if isinstance(value, dict):
+            for labels, item in sorted(value.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(item)}')
+        else:
+            lines.append(f'{self.name} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+    
+    def __init__(self, prefix: str = 'ai_spot_'):
+        self.prefix = prefix
+        self._families: Dict[str, Union[HistogramFamily, CounterFamily, GaugeFamily]] = {}
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        """注册直方图（同名重复注册返回已有实例）"""
+        return self._register(HistogramFamily(self.prefix + name, help, labelnames, buckets))
+    
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> CounterFamily:
+        """注册计数器"""
+        return self._register(CounterFamily(self.prefix + name, help, labelnames))
+    
+    def gauge(self, name: str, help: str, callback: Callable[[], GaugeValue],
+              labelnames: Sequence[str] = ()) -> GaugeFamily:
+        """注册回调仪表（同名重复注册时替换回调）"""
+        family = GaugeFamily(self.prefix + name, help, labelnames, callback)
+        with self._lock:
+            self._families[family.name] = family
+        return family
+    
+    def render(self) -> str:
+        """导出全部指标"""
+        with self._lock:
+            families = list(self._families.values())
+        lines: List[str] = []
+        for family in families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+    
+    def _register(self, family):
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+
+def _asyncio_tasks() -> float:
+    """当前事件循环中的任务数（在事件循环外抓取时为0）"""
+    try:
+        return len(asyncio.all_tasks())
+    except RuntimeError:
+        return 0
+
+
+# 全局注册表
+metrics = MetricsRegistry()
+
+# 热点路径的直方图和计数器
+tick_duration = metrics.histogram('tick_duration_seconds', '策略单次tick耗时', ('trader_id',))
+exchange_latency = metrics.histogram('exchange_call_seconds', '交易所调用耗时（每次尝试）', ('method',))
+exchange_errors = metrics.counter('exchange_errors_total', '交易所调用失败次数', ('method', 'error'))
+db_query_latency = metrics.histogram('db_query_seconds', 'SQLite语句执行耗时', ('statement',))
+db_commit_latency = metrics.histogram('db_commit_seconds', 'SQLite事务提交耗时')
+
+metrics.gauge('threads', '活动线程数', threading.active_count)
+metrics.gauge('asyncio_tasks', '事件循环中的任务数', _asyncio_tasks)
@@ -0,0 +1,311 @@
+"""
+订单对账服务
+市价买卖以限价单模拟，下单返回时按委托数量和价格记账（trades.reconciled = 0），
+对账服务周期性地按交易对批量拉取交易所的挂单和成交，修正为实际成交：
+
+- 每个交易对每周期 1 次 fetch_open_orders + 分页 fetch_my_trades（与交易员数量无关）
+- 按自定义订单ID（下单时的 text 字段）匹配成交，找不到时按订单ID
+- 仍在挂单中的订单留到下一周期；既不在挂单中也找不到成交的订单才单独 fetch_order 确认
+- 一个周期的全部确认和修正在同一个事务中写入（交易记录、后续持仓快照、账本）
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from core import database
+from core.events import event_journal
+from core.exchange import GateIOExchange
+from core.trade_writer import trade_writer
+
+
+# 单次 fetch_my_trades 请求的条数
+FETCH_LIMIT = 1000
+
+# 单个交易对每周期最多请求的成交页数
+MAX_PAGES = 10
+
+# 成交查询起点相对最早待对账交易的回溯时间（毫秒），容忍本地与交易所的时钟偏差
+LOOKBACK_MS = 60000
+
+# 每周期最多处理的待对账交易数
+BATCH_LIMIT = 500
+
+# 与记账值的相对误差在此以内视为一致
+TOLERANCE = 1e-9
+
+
+def summarize_fills(fills: List[Dict], base: str) -> Optional[Dict[str, float]]:
+    """
+    汇总一个订单的成交明细
+    
+    Args:
+        fills: ccxt trade 列表
+        base: 基础币种（以基础币收取的手续费按成交价折算为计价币，与账本口径一致）
+    
+    Returns:
+        {'price', 'amount', 'cost', 'fee'}，没有成交时返回 None
+    """
+    amount = cost = fee = 0.0
+    for fill in fills:
+        fill_amount = float(fill.get('amount') or 0)
+        fill_price = float(fill.get('price') or 0)
+        fill_cost = float(fill.get('cost') or fill_price * fill_amount)
+        amount += fill_amount
+        cost += fill_cost
+        
+        fill_fee = fill.get('fee') or {}
+        fee_cost = float(fill_fee.get('cost') or 0)
+        fee += fee_cost * fill_price if fill_fee.get('currency') == base else fee_cost
+    
+    if amount <= 0:
+        return None
+    return {'price': cost / amount, 'amount': amount, 'cost': cost, 'fee': fee}
+
+
+def _client_order_id(item: Dict) -> Optional[str]:
+    """ccxt 订单/成交的自定义订单ID（Gate.io 成交明细只在原始数据的 text 字段中返回）"""
+    return item.get('clientOrderId') or (item.get('info') or {}).get('text')
+
+
+def _matches(trade: Dict, actual: Dict[str, float]) -> bool:
+    """记账值与实际成交是否一致"""
+    for field, column in (('amount', 'amount'), ('price', 'price'), ('fee', 'fee_amount')):
+        recorded = trade[column] or 0.0
+        if abs(recorded - actual[field]) > TOLERANCE * max(abs(recorded), abs(actual[field]), 1.0):
+            return False
+    return True
+
+
+class OrderReconciler:
+    """订单对账服务（后台线程周期运行，也可通过 run_once 手动触发）"""
+    
+    def __init__(self, exchange: GateIOExchange, interval: float = 30.0,
+                 on_corrected: Optional[Callable[[str, str, float], None]] = None):
+        """
+        初始化对账服务
+        
+        Args:
+            exchange: 同步交易所客户端
+            interval: 对账周期（秒），0表示只手动触发
+            on_corrected: 持仓被修正后的回调 (trader_id, symbol, position_delta)，供运行中的策略同步内存持仓
+        """
+        self.exchange = exchange
+        self.interval = interval
+        self.on_corrected = on_corrected
+        
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # 统计
+        self.cycles = 0
+        self.requests = 0
+        self.confirmed = 0
+        self.corrected = 0
+        self.deleted = 0
+        self.errors = 0
+        self.last_run: Optional[float] = None
+        self.last_pending = 0
+    
+    def start(self):
+        """启动后台对账线程"""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='order-reconciler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止后台对账线程"""
+        self._stop.set()
+    
+    def run_once(self) -> Dict:
+        """
+        执行一次对账（与后台线程串行执行）
+        
+        Returns:
+            本次的 pending / confirmed / corrected / deleted / requests 计数
+        """
+        with self._run_lock:
+            return self._reconcile()
+    
+    def get_stats(self) -> Dict:
+        """对账统计"""
+        return {
+            'interval': self.interval,
+            'cycles': self.cycles,
+            'requests': self.requests,
+            'confirmed': self.confirmed,
+            'corrected': self.corrected,
+            'deleted': self.deleted,
+            'errors': self.errors,
+            'last_run': self.last_run,
+            'pending': self.last_pending
+        }
+    
+    def _loop(self):
+        """对账循环"""
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ 订单对账异常: {e}")
+    
+    def _reconcile(self) -> Dict:
+        """对账一个周期：逐交易对比对，最后一次性写入"""
+        summary = {'pending': 0, 'confirmed': 0, 'corrected': 0, 'deleted': 0, 'requests': 0}
+        if self.exchange.demo_mode:
+            return summary
+        
+        pending = database.list_unreconciled_trades(BATCH_LIMIT)
+        summary['pending'] = len(pending)
+        
+        by_symbol: Dict[str, List[Dict]] = {}
+        for trade in pending:
+            by_symbol.setdefault(trade['symbol'], []).append(trade)
+        
+        confirmed_ids: List[int] = []
+        corrections: List[Dict] = []
+        for symbol, trades in by_symbol.items():
+            try:
+                confirmed, corrected, requests = self._reconcile_symbol(symbol, trades)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ {symbol} 对账失败: {e}")
+                continue
+            confirmed_ids.extend(confirmed)
+            corrections.extend(corrected)
+            summary['requests'] += requests
+        
+        # 修正会平移之后交易的持仓快照，先让已提交但尚未写入的交易落库
+        if corrections:
+            trade_writer.flush(timeout=5)
+        applied = database.apply_trade_corrections(confirmed_ids, corrections)
+        
+        for item in applied:
+            self._notify(item)
+        
+        summary['confirmed'] = len(confirmed_ids)
+        summary['deleted'] = sum(1 for item in applied if item['deleted'])
+        summary['corrected'] = len(applied) - summary['deleted']
+        
+        self.cycles += 1
+        self.requests += summary['requests']
+        self.confirmed += summary['confirmed']
+        self.corrected += summary['corrected']
+        self.deleted += summary['deleted']
+        self.last_run = time.time()
+        self.last_pending = summary['pending'] - summary['confirmed'] - len(applied)
+        return summary
+    
+    def _reconcile_symbol(self, symbol: str, trades: List[Dict]) -> Tuple[List[int], List[Dict], int]:
+        """
+        对账单个交易对
+        
+        Returns:
+            (一致的交易ID, 修正列表, 交易所请求数)
+        """
+        open_orders = self.exchange.fetch_open_orders(symbol)
+        open_keys = {order['id'] for order in open_orders} | {_client_order_id(order) for order in open_orders}
+        open_keys.discard(None)
+        
+        since = min(trade['timestamp'] for trade in trades) - LOOKBACK_MS
+        fills, requests = self._fetch_fills(symbol, since)
+        requests += 1
+        
+        by_client_id: Dict[str, List[Dict]] = {}
+        by_order_id: Dict[str, List[Dict]] = {}
+        for fill in fills:
+            client_order_id = _client_order_id(fill)
+            if client_order_id:
+                by_client_id.setdefault(client_order_id, []).append(fill)
+            by_order_id.setdefault(str(fill.get('order')), []).append(fill)
+        
+        base = symbol.split('/')[0]
+        confirmed, corrections = [], []
+        for trade in trades:
+            client_order_id, order_id = trade['client_order_id'], trade['order_id']
+            if not client_order_id and not order_id:
+                confirmed.append(trade['id'])  # 无法关联订单（迁移前的旧记录）
+                continue
+            if client_order_id in open_keys or order_id in open_keys:
+                continue  # 仍在挂单中，下一周期再对
+            
+            matched = by_client_id.get(client_order_id) or by_order_id.get(order_id)
+            if matched:
+                actual = summarize_fills(matched, base)
+            else:
+                # 成交明细中找不到：单独查询订单（未成交即撤销/过期，或成交早于查询窗口）
+                order = self._fetch_order(order_id, symbol)
+                requests += 1
+                if order is None or order.get('status') == 'open':
+                    continue
+                actual = summarize_fills(order.get('trades') or [], base) or self._order_fill(order, base)
+            
+            if actual is None:
+                corrections.append({'id': trade['id'], 'price': trade['price'], 'amount': 0.0, 'cost': 0.0, 'fee': 0.0})
+            elif _matches(trade, actual):
+                confirmed.append(trade['id'])
+            else:
+                corrections.append({'id': trade['id'], **actual})
+        
+        return confirmed, corrections, requests
+    
+    def _fetch_fills(self, symbol: str, since: int) -> Tuple[List[Dict], int]:
+        """分页拉取成交明细（同一毫秒的成交可能跨页，按成交ID去重）"""
+        fills: Dict[str, Dict] = {}
+        requests = 0
+        while requests < MAX_PAGES:
+            page = self.exchange.fetch_my_trades(symbol, since, FETCH_LIMIT)
+            requests += 1
+            for fill in page:
+                fills[str(fill['id'])] = fill
+            if len(page) < FETCH_LIMIT or page[-1]['timestamp'] <= since:
+                break
+            since = page[-1]['timestamp']
+        return list(fills.values()), requests
+    
+    def _fetch_order(self, order_id: Optional[str], symbol: str) -> Optional[Dict]:
+        """查询单个订单，失败时返回 None（留到下一周期）"""
+        if not order_id:
+            return None
+        try:
+            return self.exchange.fetch_order(order_id, symbol)
+        except Exception as e:
+            print(f"⚠️ 对账查询订单 {order_id} 失败: {e}")
+            return None
+    
+    @staticmethod
+    def _order_fill(order: Dict, base: str) -> Optional[Dict[str, float]]:
+        """订单不带成交明细时按订单汇总字段计算实际成交"""
+        filled = float(order.get('filled') or 0)
+        if filled <= 0:
+            return None
+        cost = float(order.get('cost') or 0) or filled * float(order.get('average') or order.get('price') or 0)
+        price = cost / filled
+        fee = order.get('fee') or {}
+        fee_cost = float(fee.get('cost') or 0)
+        return {
+            'price': price,
+            'amount': filled,
+            'cost': cost,
+            'fee': fee_cost * price if fee.get('currency') == base else fee_cost
+        }
+    
+    def _notify(self, item: Dict):
+        """记录修正事件并通知运行中的策略"""
+        if item['deleted']:
+            message = f"订单未成交，删除交易记录 #{item['id']}"
+        else:
+            message = f"按实际成交修正交易记录 #{item['id']}"
+        print(f"[{item['trader_id']}] 🔄 {message}（持仓 {item['position_delta']:+.8f}）")
+        event_journal.emit(
+            'trade_corrected', item['trader_id'], message, trade_id=item['id'], symbol=item['symbol'],
+            action=item['action'], position_delta=item['position_delta'], deleted=item['deleted']
+        )
+        
+        if self.on_corrected and item['position_delta']:
+            try:
+                self.on_corrected(item['trader_id'], item['symbol'], item['position_delta'])
+            except Exception as e:
+                print(f"⚠️ 同步策略持仓失败: {e}")
@@ -0,0 +1,253 @@
+"""
+交易所客户端注册表
+整个进程按 (API密钥, 测试网) 共享同一组交易所客户端，不再各模块、各请求各自创建。
+
+交易对元数据（精度、下单限制、手续费）每个网络只从交易所加载一次：
+- 启动时从本地文件恢复，ccxt 不再在第一次下单/查行情时同步拉取 markets
+- 后台线程定期刷新，并写回文件、推送给所有已创建的客户端
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import ccxt
+from core.async_exchange import AsyncGateIOExchange
+from core.exchange import GateIOExchange
+from core.resilience import Resilience, exchange_resilience
+from simulator.gateio import AsyncSimulatedGateIO, get_simulator
+from config import settings
+
+
+class ExchangeRegistry:
+    """进程级交易所客户端注册表（线程安全）"""
+    
+    def __init__(self, cache_path: str = 'data/markets.json', refresh_interval: float = 21600.0,
+                 resilience: Optional[Resilience] = None):
+        """
+        初始化注册表
+        
+        Args:
+            cache_path: 交易对元数据缓存文件（按网络加 .testnet / .live 后缀）
+            refresh_interval: 后台刷新间隔（秒），0表示不刷新
+            resilience: 容错层，默认使用全局实例
+        """
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.resilience = resilience or exchange_resilience
+        
+        self._sync: Dict[Tuple, GateIOExchange] = {}
+        self._async: Dict[Tuple, AsyncGateIOExchange] = {}
+        self._markets: Dict[bool, Dict] = {}  # testnet -> {'markets', 'currencies', 'saved_at', 'source'}
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+    
+    # ===== 客户端 =====
+    
+    def get_sync(self, api_key: Optional[str] = None, api_secret: Optional[str] = None,
+                 testnet: Optional[bool] = None) -> GateIOExchange:
+        """获取同步客户端（参数默认取当前配置）"""
+        api_key, api_secret, testnet = self._credentials(api_key, api_secret, testnet)
+        key = self._key(api_key, api_secret, testnet)
+        with self._lock:
+            exchange = self._sync.get(key)
+            if exchange is None:
+                exchange = GateIOExchange(
+                    api_key=api_key,
+                    api_secret=api_secret,
+                    testnet=testnet,
+                    ticker_ttl=settings.ticker_cache_ttl,
+                    resilience=self.resilience,
+                    client=get_simulator() if settings.gate_simulator else None
+                )
+                self._attach_markets(exchange.exchange, testnet)
+                self._sync[key] = exchange
+        return exchange
+    
+    def get_async(self, api_key: Optional[str] = None, api_secret: Optional[str] = None,
+                  testnet: Optional[bool] = None) -> AsyncGateIOExchange:
+        """获取异步客户端（参数默认取当前配置）"""
+        api_key, api_secret, testnet = self._credentials(api_key, api_secret, testnet)
+        key = self._key(api_key, api_secret, testnet)
+        with self._lock:
+            exchange = self._async.get(key)
+            if exchange is None:
+                exchange = AsyncGateIOExchange(
+                    api_key=api_key,
+                    api_secret=api_secret,
+                    testnet=testnet,
+                    ticker_ttl=settings.ticker_cache_ttl,
+                    resilience=self.resilience,
+                    client=AsyncSimulatedGateIO(get_simulator()) if settings.gate_simulator else None
+                )
+                self._attach_markets(exchange.exchange, testnet)
+                self._async[key] = exchange
+        return exchange
+    
+    async def close(self):
+        """关闭所有异步客户端的HTTP会话（进程退出时）"""
+        with self._lock:
+            clients = list(self._async.values())
+            self._async.clear()
+        for exchange in clients:
+            await exchange.close()
+    
+    # ===== 交易对元数据 =====
+    
+    def get_market(self, symbol: str, testnet: Optional[bool] = None) -> Optional[Dict]:
+        """交易对的精度、下单限制和手续费（元数据尚未加载时返回 None）"""
+        testnet = settings.gate_testnet if testnet is None else testnet
+        if settings.gate_simulator:
+            market = get_simulator().load_markets().get(symbol)
+        else:
+            market = (self._markets.get(testnet) or {}).get('markets', {}).get(symbol)
+        if not market:
+            return None
+        return {
+            'symbol': symbol,
+            'precision': market.get('precision'),
+            'limits': market.get('limits'),
+            'maker': market.get('maker'),
+            'taker': market.get('taker')
+        }
+    
+    def refresh_markets(self, testnet: bool) -> int:
+        """从交易所重新加载元数据，写入缓存文件并推送给已创建的客户端，返回交易对数"""
+        loader = ccxt.gateio({'options': {'defaultType': 'spot'}})
+        if testnet:
+            loader.set_sandbox_mode(True)
+        self.resilience.call('load_markets', loader.load_markets, True)
+        
+        entry = {
+            'markets': loader.markets,
+            'currencies': loader.currencies,
+            'saved_at': time.time(),
+            'source': 'exchange'
+        }
+        self._save(testnet, entry)
+        with self._lock:
+            self._markets[testnet] = entry
+            clients = [exchange.exchange for key, exchange in list(self._sync.items()) + list(self._async.items())
+                       if key[2] == testnet]
+        for client in clients:
+            client.set_markets(entry['markets'], entry['currencies'])
+        return len(entry['markets'])
+    
+    def get_stats(self) -> Dict:
+        """注册表状态"""
+        with self._lock:
+            return {
+                'sync_clients': len(self._sync),
+                'async_clients': len(self._async),
+                'markets': {
+                    'testnet' if testnet else 'live': {
+                        'count': len(entry['markets']),
+                        'saved_at': entry['saved_at'],
+                        'source': entry['source']
+                    }
+                    for testnet, entry in self._markets.items()
+                }
+            }
+    
+    # ===== 内部实现 =====
+    
+    @staticmethod
+    def _credentials(api_key: Optional[str], api_secret: Optional[str],
+                     testnet: Optional[bool]) -> Tuple[str, str, bool]:
+        return (
+            settings.gate_api_key if api_key is None else api_key,
+            settings.gate_api_secret if api_secret is None else api_secret,
+            settings.gate_testnet if testnet is None else testnet
+        )
+    
+    @staticmethod
+    def _key(api_key: str, api_secret: str, testnet: bool) -> Tuple:
+        """客户端键（密钥只保留摘要）"""
+        digest = hashlib.sha256(api_secret.encode()).hexdigest()[:16] if api_secret else ''
+        return (settings.gate_simulator, api_key, testnet, digest)
+    
+    def _cache_file(self, testnet: bool) -> str:
+        root, ext = os.path.splitext(self.cache_path)
+        return f"{root}.{'testnet' if testnet else 'live'}{ext}"
+    
+    def _attach_markets(self, client, testnet: bool):
+        """给新客户端装入已加载（或文件缓存）的元数据，并确保后台刷新在运行"""
+        if settings.gate_simulator:
+            return
+        
+        if testnet not in self._markets:
+            entry = self._load(testnet)
+            if entry:
+                self._markets[testnet] = entry
+        entry = self._markets.get(testnet)
+        if entry:
+            client.set_markets(entry['markets'], entry['currencies'])
+        self._ensure_thread()
+    
+    def _load(self, testnet: bool) -> Optional[Dict]:
+        """从缓存文件恢复元数据"""
+        path = self._cache_file(testnet)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 交易对缓存读取失败 ({path}): {e}")
+            return None
+        entry['source'] = 'file'
+        print(f"📦 已从缓存恢复 {len(entry['markets'])} 个交易对元数据 ({path})")
+        return entry
+    
+    def _save(self, testnet: bool, entry: Dict):
+        """写入缓存文件（先写临时文件再替换，避免读到半个文件）"""
+        path = self._cache_file(testnet)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({key: entry[key] for key in ('markets', 'currencies', 'saved_at')}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ 交易对缓存写入失败 ({path}): {e}")
+    
+    def _ensure_thread(self):
+        """按需启动后台刷新线程"""
+        if not self.refresh_interval:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name='market-metadata', daemon=True)
+            self._thread.start()
+    
+    def _due(self) -> List[bool]:
+        """需要刷新的网络：已有客户端，且元数据缺失或超过刷新间隔"""
+        now = time.time()
+        with self._lock:
+            networks = {key[2] for key in list(self._sync) + list(self._async)}
+            return [
+                testnet for testnet in networks
+                if testnet not in self._markets or now - self._markets[testnet]['saved_at'] >= self.refresh_interval
+            ]
+    
+    def _refresh_loop(self):
+        """后台刷新循环（失败时一分钟后重试）"""
+        while True:
+            retry = False
+            for testnet in self._due():
+                try:
+                    count = self.refresh_markets(testnet)
+                    print(f"✅ 已刷新 {count} 个交易对元数据（{'测试网' if testnet else '主网'}）")
+                except Exception as e:
+                    retry = True
+                    print(f"⚠️ 交易对元数据刷新失败: {e}")
+            time.sleep(60 if retry else min(self.refresh_interval, 3600))
+
+
+# 全局注册表
+exchange_registry = ExchangeRegistry(
+    cache_path=settings.markets_cache_path,
+    refresh_interval=settings.markets_refresh_interval
+)
@@ -0,0 +1,259 @@
+"""
+交易所调用容错层
+- 指数退避 + 随机抖动重试（只重试网络类错误，下单等非幂等调用不重试）
+- 按接口的熔断器：连续失败达到阈值后熔断，熔断期间直接失败，不再等待超时
+- 熔断状态可通过 API 查看
+- 每次尝试的耗时和失败次数按接口计入指标
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from config import settings
+from core.metrics import exchange_errors, exchange_latency
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被直接拒绝"""
+    
+    def __init__(self, endpoint: str, retry_in: float):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f"{endpoint} 已熔断，{retry_in:.0f}秒后重试")
+
+
+def is_retryable(error: Exception) -> bool:
+    """网络类错误（超时、交易所不可用、限流）可以重试，业务错误（余额不足、参数错误、认证失败）不重试"""
+    from ccxt.base.errors import NetworkError  # 延迟导入：ccxt 只在真正调用交易所时加载
+    return isinstance(error, (NetworkError, TimeoutError, ConnectionError))
+
+
+class RetryPolicy:
+    """指数退避重试策略（full jitter）"""
+    
+    def __init__(self, retries: int = 2, base_delay: float = 0.2, max_delay: float = 2.0):
+        """
+        Args:
+            retries: 失败后的最大重试次数
+            base_delay: 第一次重试的退避上限（秒）
+            max_delay: 单次退避的最大时长（秒）
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, attempt: int) -> float:
+        """第attempt次重试前的等待时间：在 [0, min(max_delay, base_delay * 2^attempt)] 内随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    
+    closed: 正常调用，连续失败达到阈值后 → open
+    open: 直接拒绝调用，reset_timeout 秒后 → half_open
+    half_open: 只放行一个探测调用，成功 → closed，失败 → open
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0  # 连续失败次数
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        
+        # 统计
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+    
+    def before_call(self):
+        """
+        调用前检查
+        
+        Raises:
+            CircuitOpenError: 熔断中
+        """
+        with self._lock:
+            if self.state == 'open':
+                retry_in = self.opened_at + self.reset_timeout - time.time()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_in)
+                self.state = 'half_open'
+                self._probing = False
+            
+            if self.state == 'half_open':
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0)
+                self._probing = True
+            
+            self.total_calls += 1
+    
+    def record_success(self):
+        """调用成功（或交易所正常返回了业务错误）"""
+        with self._lock:
+            if self.state != 'closed':
+                print(f"✅ {self.name} 熔断恢复")
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+    
+    def release(self):
+        """调用被取消，不计入成功或失败（释放半开状态的探测名额）"""
+        with self._lock:
+            self._probing = False
+    
+    def record_failure(self, error: Exception):
+        """调用因网络类错误失败"""
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            self.last_error = str(error)
+            self._probing = False
+            
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"🔴 {self.name} 连续失败{self.failures}次，熔断{self.reset_timeout:.0f}秒")
+                self.state = 'open'
+                self.opened_at = time.time()
+    
+    def get_state(self) -> Dict:
+        """熔断器状态"""
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = max(self.opened_at + self.reset_timeout - time.time(), 0)
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': retry_in,
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'rejected': self.rejected,
+                'last_error': self.last_error
+            }
+
+
+class Resilience:
+    """按接口名管理熔断器，并提供带重试/熔断的同步和异步调用"""
+    
+    def __init__(self, policy: Optional[RetryPolicy] = None, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.policy = policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+    
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """获取（或创建）接口对应的熔断器"""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+                self._breakers[endpoint] = breaker
+            return breaker
+    
+    def get_states(self) -> Dict[str, Dict]:
+        """所有熔断器的状态"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.get_state() for name, breaker in breakers.items()}
+    
+    def call(self, endpoint: str, fn: Callable, *args, retries: Optional[int] = None, **kwargs) -> Any:
+        """
+        同步调用（重试等待只占用当前线程，熔断期间立即失败）
+        
+        Args:
+            endpoint: 接口名（熔断器粒度）
+            fn: 实际调用
+            retries: 覆盖默认重试次数（下单传0）
+        """
+        breaker = self.breaker(endpoint)
+        retries = self.policy.retries if retries is None else retries
+        
+        for attempt in range(retries + 1):
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                exchange_errors.inc(endpoint, type(e).__name__)
+                raise
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                exchange_latency.observe(time.perf_counter() - started, endpoint)
+                exchange_errors.inc(endpoint, type(e).__name__)
+                if not is_retryable(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure(e)
+                if attempt >= retries or breaker.state == 'open':
+                    raise
+                delay = self.policy.delay(attempt)
+                print(f"⚠️ {endpoint} 失败 (尝试{attempt + 1}/{retries + 1}): {e}，{delay:.2f}秒后重试")
+                time.sleep(delay)
+                continue
+            
+            exchange_latency.observe(time.perf_counter() - started, endpoint)
+            breaker.record_success()
+            return result
+    
+    async def acall(self, endpoint: str, fn: Callable, *args, retries: Optional[int] = None, **kwargs) -> Any:
+        """异步调用（重试等待不阻塞事件循环，熔断期间立即失败）"""
+        breaker = self.breaker(endpoint)
+        retries = self.policy.retries if retries is None else retries
+        
+        for attempt in range(retries + 1):
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                exchange_errors.inc(endpoint, type(e).__name__)
+                raise
+            started = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                exchange_latency.observe(time.perf_counter() - started, endpoint)
+                exchange_errors.inc(endpoint, type(e).__name__)
+                if not is_retryable(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure(e)
+                if attempt >= retries or breaker.state == 'open':
+                    raise
+                delay = self.policy.delay(attempt)
+                print(f"⚠️ {endpoint} 失败 (尝试{attempt + 1}/{retries + 1}): {e}，{delay:.2f}秒后重试")
+                await asyncio.sleep(delay)
+                continue
+            
+            exchange_latency.observe(time.perf_counter() - started, endpoint)
+            breaker.record_success()
+            return result
+
+
+# 全局容错层：同步/异步交易所共用，Gate.io 故障时所有调用方一起熔断
+exchange_resilience = Resilience(
+    policy=RetryPolicy(
+        retries=settings.exchange_retries,
+        base_delay=settings.exchange_backoff_base,
+        max_delay=settings.exchange_backoff_max
+    ),
+    failure_threshold=settings.breaker_failure_threshold,
+    reset_timeout=settings.breaker_reset_timeout
+)
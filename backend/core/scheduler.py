@@ -0,0 +1,189 @@
+"""策略调度器 - 用少量工作线程按截止时间轮流执行所有策略的tick"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from core.metrics import tick_duration
+from core.stream import stream_hub
+from strategy.base import BaseStrategy
+
+
+class StrategyScheduler:
+    """
+    策略调度器
+    
+    每个交易员有自己的下一次执行截止时间，调度线程按截止时间从最小堆中取出到期的策略，
+    交给工作线程池执行一次 tick。同一交易员同一时刻最多只有一个 tick 在执行，
+    空闲的交易员不占用线程，一个进程可以托管成千上万个交易员。
+    """
+    
+    def __init__(self, workers: int = 8, on_finished: Optional[Callable[[str], None]] = None):
+        """
+        初始化调度器
+        
+        Args:
+            workers: 工作线程数
+            on_finished: 策略自行停止（如触发止损止盈）后的回调，参数为trader_id
+        """
+        self.workers = workers
+        self.on_finished = on_finished
+        
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='strategy-worker')
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str]] = []  # (deadline, seq, trader_id)
+        self._entries: Dict[str, Dict] = {}  # trader_id -> 调度条目
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+    
+    def add(self, trader_id: str, strategy: BaseStrategy) -> bool:
+        """
+        开始调度策略（立即执行第一次tick）
+        
+        Returns:
+            是否添加成功（已在调度中返回False）
+        """
+        with self._cond:
+            if trader_id in self._entries:
+                return False
+            
+            strategy.on_start()
+            
+            entry = {
+                'strategy': strategy,
+                'deadline': time.time(),
+                'busy': False,
+                'idle': threading.Event(),
+                'tick_count': 0,
+                'late_count': 0,
+                'last_tick_duration': None
+            }
+            entry['idle'].set()
+            self._entries[trader_id] = entry
+            self._push(trader_id, entry)
+        
+        self._ensure_thread()
+        return True
+    
+    def remove(self, trader_id: str, timeout: float = 5.0) -> bool:
+        """
+        停止调度策略，等待正在执行的tick结束（最多timeout秒）
+        
+        Returns:
+            是否移除成功（不在调度中返回False）
+        """
+        with self._cond:
+            entry = self._entries.pop(trader_id, None)
+        if entry is None:
+            return False
+        
+        strategy = entry['strategy']
+        strategy.stop()
+        entry['idle'].wait(timeout)
+        strategy.on_stop()
+        return True
+    
+    def is_scheduled(self, trader_id: str) -> bool:
+        """策略是否在调度中"""
+        with self._cond:
+            return trader_id in self._entries
+    
+    def get_stats(self) -> Dict:
+        """获取调度器状态"""
+        now = time.time()
+        with self._cond:
+            traders = {
+                trader_id: {
+                    'next_tick_in': max(entry['deadline'] - now, 0),
+                    'busy': entry['busy'],
+                    'tick_count': entry['tick_count'],
+                    'late_count': entry['late_count'],
+                    'last_tick_duration': entry['last_tick_duration']
+                }
+                for trader_id, entry in self._entries.items()
+            }
+        return {
+            'workers': self.workers,
+            'scheduled': len(traders),
+            'traders': traders
+        }
+    
+    def _push(self, trader_id: str, entry: Dict):
+        """把条目按截止时间放入堆（调用方需持有锁）"""
+        heapq.heappush(self._heap, (entry['deadline'], next(self._seq), trader_id))
+        self._cond.notify()
+    
+    def _ensure_thread(self):
+        """按需启动调度线程"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, name='strategy-scheduler', daemon=True)
+            self._thread.start()
+    
+    def _dispatch_loop(self):
+        """调度循环：取出到期的策略交给工作线程"""
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                
+                deadline, _, trader_id = self._heap[0]
+                now = time.time()
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    continue
+                
+                heapq.heappop(self._heap)
+                entry = self._entries.get(trader_id)
+                
+                # 已移除或已重新排期的过期堆项
+                if entry is None or entry['busy'] or entry['deadline'] != deadline:
+                    continue
+                
+                entry['busy'] = True
+                entry['idle'].clear()
+            
+            self._executor.submit(self._run_tick, trader_id, entry)
+    
+    def _run_tick(self, trader_id: str, entry: Dict):
+        """在工作线程中执行一次tick并排期下一次"""
+        strategy = entry['strategy']
+        started = time.time()
+        try:
+            strategy.tick()
+        except Exception as e:
+            print(f"[{trader_id}] 策略tick异常: {e}")
+        duration = time.time() - started
+        tick_duration.observe(duration, trader_id)
+        if stream_hub.client_count:
+            stream_hub.update_tick(trader_id, strategy.get_status())
+        
+        finished = False
+        with self._cond:
+            entry['busy'] = False
+            entry['tick_count'] += 1
+            entry['last_tick_duration'] = duration
+            
+            if self._entries.get(trader_id) is entry:
+                if strategy.running:
+                    # 下一次截止时间按固定节奏推进，落后时从当前时间重新起算
+                    next_deadline = entry['deadline'] + strategy.check_interval
+                    now = time.time()
+                    if next_deadline < now:
+                        entry['late_count'] += 1
+                        next_deadline = now
+                    entry['deadline'] = next_deadline
+                    self._push(trader_id, entry)
+                else:
+                    # 策略自行停止
+                    del self._entries[trader_id]
+                    finished = True
+            
+            entry['idle'].set()
+        
+        if finished:
+            strategy.on_stop()
+            if self.on_finished:
+                self.on_finished(trader_id)
@@ -0,0 +1,261 @@
+"""
+推送流中心（SSE）
+引擎直接把变化推给已连接的前端，前端不再轮询 /api/traders、/api/trades 和 /pnl。
+
+- trader_status / trade: 发生时立即推送
+- tick / 价格 / 盈亏: 合并后每 flush_interval 秒推送一次 update 消息，只包含有变化的交易员
+每个客户端的负载只与变化量有关，与轮询频率和交易员总数无关。
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+from config import settings
+from core import database
+from core.ledger import compute_pnl
+from core.metrics import metrics
+
+
+class StreamClient:
+    """一个SSE连接（消息在事件循环线程中入队）"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, trader_id: Optional[str], queue_size: int):
+        self.loop = loop
+        self.trader_id = trader_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+    
+    def send(self, event: str, data: str):
+        """从任意线程投递消息"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event, data)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+    
+    def _put(self, event: str, data: str):
+        """入队；客户端消费太慢时清空积压，改发 resync 让前端重新拉取一次全量"""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resyncs += 1
+            event, data = 'resync', json.dumps({'reason': 'lagging'})
+        self.queue.put_nowait((event, data))
+
+
+class StreamHub:
+    """推送流中心（线程安全）"""
+    
+    def __init__(self, flush_interval: float = 1.0, client_queue_size: int = 1000):
+        """
+        初始化推送中心
+        
+        Args:
+            flush_interval: tick/价格/盈亏合并推送的间隔（秒）
+            client_queue_size: 每个客户端的消息积压上限
+        """
+        self.flush_interval = flush_interval
+        self.client_queue_size = client_queue_size
+        
+        self._lock = threading.Lock()
+        self._clients: Set[StreamClient] = set()
+        self._ticks: Dict[str, Dict] = {}  # 本周期内更新的 tick 状态
+        self._prices: Dict[str, float] = {}  # 本周期内更新的价格
+        self._dirty_pnl: Set[str] = set()  # 有成交的交易员
+        self._sent_ticks: Dict[str, Dict] = {}  # 上次推送的 tick 状态（只推变化）
+        self._sent_pnl: Dict[str, Dict] = {}  # 上次推送的盈亏
+        self._symbols: Dict[str, str] = {}  # trader_id -> symbol
+        self._latest_prices: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        
+        # 统计
+        self.messages = 0
+    
+    # ===== 客户端 =====
+    
+    def connect(self, loop: asyncio.AbstractEventLoop, trader_id: Optional[str] = None) -> StreamClient:
+        """
+        注册客户端
+        
+        Args:
+            loop: 客户端所在的事件循环
+            trader_id: 只接收该交易员的消息（价格除外）
+        """
+        client = StreamClient(loop, trader_id, self.client_queue_size)
+        with self._lock:
+            self._clients.add(client)
+        self._ensure_thread()
+        return client
+    
+    def disconnect(self, client: StreamClient):
+        """注销客户端"""
+        with self._lock:
+            self._clients.discard(client)
+            if not self._clients:
+                # 无人订阅时不保留增量状态，重连后由前端拉取全量
+                self._sent_ticks.clear()
+                self._sent_pnl.clear()
+    
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+    
+    # ===== 发布（任意线程） =====
+    
+    def publish(self, event: str, data: Dict[str, Any], trader_id: Optional[str] = None):
+        """立即推送（交易员状态变化、新成交等低频消息）"""
+        if not self._clients:
+            return
+        if event == 'trade' and trader_id:
+            with self._lock:
+                self._dirty_pnl.add(trader_id)
+                self._symbols[trader_id] = data['symbol']
+        elif event == 'trader_status' and data.get('status') == 'deleted':
+            with self._lock:
+                self._symbols.pop(trader_id, None)
+                self._sent_ticks.pop(trader_id, None)
+                self._sent_pnl.pop(trader_id, None)
+        self._broadcast(event, {trader_id: data} if trader_id else None, data)
+    
+    def update_tick(self, trader_id: str, status: Dict[str, Any]):
+        """记录策略tick后的状态（合并推送，只推有变化的字段集）"""
+        if not self._clients:
+            return
+        status = {key: value for key, value in status.items() if key != 'config'}
+        with self._lock:
+            self._ticks[trader_id] = status
+            if status.get('symbol'):
+                self._symbols[trader_id] = status['symbol']
+    
+    def update_price(self, symbol: str, price: float):
+        """记录最新价格（合并推送）"""
+        with self._lock:
+            self._latest_prices[symbol] = price
+            if self._clients:
+                self._prices[symbol] = price
+    
+    def get_stats(self) -> Dict:
+        """获取推送中心状态"""
+        with self._lock:
+            clients = list(self._clients)
+        return {
+            'clients': len(clients),
+            'messages': self.messages,
+            'resyncs': sum(client.resyncs for client in clients),
+            'flush_interval': self.flush_interval
+        }
+    
+    # ===== 内部实现 =====
+    
+    def _broadcast(self, event: str, per_trader: Optional[Dict[str, Any]], payload: Any):
+        """
+        推送给所有客户端
+        
+        Args:
+            event: 消息类型
+            per_trader: trader_id -> 数据（用于按交易员过滤），None 表示不区分交易员
+            payload: 未过滤客户端收到的数据
+        """
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return
+        
+        encoded = json.dumps(payload, ensure_ascii=False, default=str)
+        for client in clients:
+            if client.trader_id is None or per_trader is None:
+                client.send(event, encoded)
+            elif client.trader_id in per_trader:
+                client.send(event, json.dumps(per_trader[client.trader_id], ensure_ascii=False, default=str))
+        self.messages += 1
+    
+    def _ensure_thread(self):
+        """按需启动合并推送线程"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name='stream-hub', daemon=True)
+            self._thread.start()
+    
+    def _flush_loop(self):
+        """合并推送循环"""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"⚠️ 推送流合并失败: {e}")
+    
+    def _flush(self):
+        """把本周期的 tick、价格、盈亏变化合并为一条 update 消息"""
+        with self._lock:
+            ticks, self._ticks = self._ticks, {}
+            prices, self._prices = self._prices, {}
+            dirty, self._dirty_pnl = self._dirty_pnl, set()
+            latest_prices = dict(self._latest_prices)
+            symbols = dict(self._symbols)
+        
+        changed_ticks = {}
+        for trader_id, status in ticks.items():
+            if self._sent_ticks.get(trader_id) != status:
+                self._sent_ticks[trader_id] = status
+                changed_ticks[trader_id] = status
+        
+        # 价格变化影响所有该交易对交易员的未实现盈亏
+        candidates = dirty | set(ticks)
+        if prices:
+            candidates |= {trader_id for trader_id, symbol in symbols.items() if symbol in prices}
+        changed_pnl = self._changed_pnl(candidates, symbols, latest_prices)
+        
+        if not (changed_ticks or prices or changed_pnl):
+            return
+        
+        payload = {'ticks': changed_ticks, 'prices': prices, 'pnl': changed_pnl}
+        per_trader = {
+            trader_id: {
+                'ticks': {trader_id: changed_ticks[trader_id]} if trader_id in changed_ticks else {},
+                'prices': prices,
+                'pnl': {trader_id: changed_pnl[trader_id]} if trader_id in changed_pnl else {}
+            }
+            for trader_id in set(changed_ticks) | set(changed_pnl)
+        }
+        
+        with self._lock:
+            clients = list(self._clients)
+        encoded = json.dumps(payload, ensure_ascii=False, default=str)
+        for client in clients:
+            if client.trader_id is None:
+                client.send('update', encoded)
+            elif client.trader_id in per_trader:
+                client.send('update', json.dumps(per_trader[client.trader_id], ensure_ascii=False, default=str))
+            elif prices:
+                client.send('update', json.dumps({'ticks': {}, 'prices': prices, 'pnl': {}}))
+        self.messages += 1
+    
+    def _changed_pnl(self, trader_ids: Set[str], symbols: Dict[str, str],
+                     prices: Dict[str, float]) -> Dict[str, Dict]:
+        """计算候选交易员的盈亏（账本内存镜像，O(1)），只返回有变化的"""
+        changed = {}
+        for trader_id in trader_ids:
+            symbol = symbols.get(trader_id)
+            if not symbol or symbol not in prices:
+                continue
+            ledger = database.get_ledger(trader_id, symbol)
+            if not ledger['trade_count']:
+                continue
+            pnl = compute_pnl(ledger, prices[symbol])
+            pnl = {key: round(value, 2) if key != 'current_position' else value for key, value in pnl.items()}
+            pnl['current_price'] = round(prices[symbol], 2)
+            if self._sent_pnl.get(trader_id) != pnl:
+                self._sent_pnl[trader_id] = pnl
+                changed[trader_id] = pnl
+        return changed
+
+
+# 全局推送中心
+stream_hub = StreamHub(
+    flush_interval=settings.stream_flush_interval,
+    client_queue_size=settings.stream_client_queue_size
+)
+
+metrics.gauge('stream_clients', '已连接的推送流客户端数', lambda: stream_hub.client_count)
@@ -0,0 +1,192 @@
+"""
+行情缓存
+按交易对缓存最近一次有效行情，TTL 内直接返回；过期后同一交易对的并发请求只发起一次网络请求（single-flight），
+其余调用方等待并共享结果。请求失败时回退到该交易对最近一次的有效行情。
+"""
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class _TickerStore:
+    """行情缓存存储与统计（同步/异步版本共用）"""
+    
+    def __init__(self, ttl: float = 2.0):
+        """
+        Args:
+            ttl: 行情有效期（秒），0表示每次都请求交易所（仍合并并发请求）
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}  # symbol -> {'ticker': ..., 'fetched_at': ...}
+        
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+    
+    def peek(self, symbol: str) -> Optional[Dict]:
+        """返回缓存中的行情（不论是否过期），没有则返回None"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        return self._result(entry) if entry else None
+    
+    def invalidate(self, symbol: Optional[str] = None):
+        """清除缓存（指定symbol时只清除该交易对）"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol, None)
+    
+    def get_stats(self) -> Dict:
+        """获取缓存状态"""
+        now = time.time()
+        with self._lock:
+            ages = {symbol: now - entry['fetched_at'] for symbol, entry in self._entries.items()}
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            'ttl': self.ttl,
+            'symbols': ages,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'fallbacks': self.fallbacks,
+            'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0
+        }
+    
+    def _fresh(self, symbol: str) -> Optional[Dict]:
+        """TTL内的缓存条目（调用方需持有锁）"""
+        entry = self._entries.get(symbol)
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            return entry
+        return None
+    
+    def _store(self, symbol: str, ticker: Dict) -> Dict:
+        """保存新行情"""
+        entry = {'ticker': ticker, 'fetched_at': time.time()}
+        with self._lock:
+            self._entries[symbol] = entry
+        return entry
+    
+    def _fallback(self, symbol: str, error: Exception) -> Dict:
+        """请求失败时回退到该交易对最近一次的有效行情，没有则抛出原异常"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is None:
+            raise error
+        
+        self.fallbacks += 1
+        result = self._result(entry)
+        result['cached'] = True
+        print(f"⚠️ 使用缓存价格: {symbol} ${result['last']:,.2f} ({result['age']:.0f}秒前)")
+        return result
+    
+    @staticmethod
+    def _result(entry: Dict) -> Dict:
+        """行情副本，附带 age（距获取时的秒数）"""
+        result = dict(entry['ticker'])
+        result['age'] = time.time() - entry['fetched_at']
+        return result
+
+
+class TickerCache(_TickerStore):
+    """线程安全的行情缓存（供同步的 GateIOExchange 使用）"""
+    
+    def __init__(self, ttl: float = 2.0):
+        super().__init__(ttl)
+        self._inflight: Dict[str, Dict] = {}  # symbol -> {'done': Event, 'entry': ..., 'error': ...}
+    
+    def get(self, symbol: str, fetch: Callable[[], Dict]) -> Dict:
+        """
+        获取行情
+        
+        Args:
+            symbol: 交易对
+            fetch: 缓存过期时请求交易所的函数
+        
+        Returns:
+            行情字典（含 age 字段；回退到旧行情时含 cached=True）
+        """
+        with self._lock:
+            entry = self._fresh(symbol)
+            if entry:
+                self.hits += 1
+                return self._result(entry)
+            
+            flight = self._inflight.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = {'done': threading.Event(), 'entry': None, 'error': None}
+                self._inflight[symbol] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if leader:
+            try:
+                flight['entry'] = self._store(symbol, fetch())
+            except Exception as e:
+                flight['error'] = e
+            finally:
+                with self._lock:
+                    self._inflight.pop(symbol, None)
+                flight['done'].set()
+        else:
+            flight['done'].wait()
+        
+        if flight['error'] is not None:
+            return self._fallback(symbol, flight['error'])
+        return self._result(flight['entry'])
+
+
+class AsyncTickerCache(_TickerStore):
+    """协程版行情缓存（供 AsyncGateIOExchange 使用，同一事件循环内合并并发请求）"""
+    
+    def __init__(self, ttl: float = 2.0):
+        super().__init__(ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def get(self, symbol: str, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        获取行情
+        
+        Args:
+            symbol: 交易对
+            fetch: 缓存过期时请求交易所的协程函数
+        
+        Returns:
+            行情字典（含 age 字段；回退到旧行情时含 cached=True）
+        """
+        with self._lock:
+            entry = self._fresh(symbol)
+            if entry:
+                self.hits += 1
+                return self._result(entry)
+            
+            task = self._inflight.get(symbol)
+            if task is None:
+                task = asyncio.ensure_future(self._load(symbol, fetch))
+                self._inflight[symbol] = task
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        try:
+            # shield：某个调用方被取消时不影响其他等待同一请求的调用方
+            entry = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return self._fallback(symbol, e)
+        return self._result(entry)
+    
+    async def _load(self, symbol: str, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """请求交易所并写入缓存"""
+        try:
+            return self._store(symbol, await fetch())
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
@@ -0,0 +1,287 @@
+"""
+后台批量交易写入器
+策略成交后只把交易记录放入队列，由专用写线程把队列中积压的记录合并为一个事务批量写入，
+策略tick不再等待 SQLite 提交。
+
+持久性：
+- 写线程连接使用 synchronous=FULL，提交即落盘（批量提交摊薄 fsync 开销）
+- submit() 返回的凭证可以 wait()，需要"落盘后再确认"的调用方（如手动交易API）等待提交完成
+- 进程退出时自动排空队列
+背压：队列达到上限时 submit() 阻塞，直到写线程追上。
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from core import database
+from core.metrics import metrics
+from core.stream import stream_hub
+from config import settings
+
+
+class TradeTicket:
+    """交易写入凭证"""
+    
+    def __init__(self, on_failed: Optional[Callable[[Exception], None]] = None):
+        """
+        Args:
+            on_failed: 写入失败时在写线程中调用的回调（不等待凭证的调用方，如策略，据此回滚内存状态）
+        """
+        self._done = threading.Event()
+        self._on_failed = on_failed
+        self.trade_id: Optional[int] = None
+        self.error: Optional[Exception] = None
+    
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        等待交易记录提交
+        
+        Returns:
+            交易记录ID
+        
+        Raises:
+            TimeoutError: 超时仍未提交
+            Exception: 写入失败
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("交易记录写入超时")
+        if self.error is not None:
+            raise self.error
+        return self.trade_id
+    
+    @property
+    def done(self) -> bool:
+        """是否已提交（或失败）"""
+        return self._done.is_set()
+    
+    def _resolve(self, trade_id: Optional[int] = None, error: Optional[Exception] = None):
+        self.trade_id = trade_id
+        self.error = error
+        self._done.set()
+        
+        if error is not None and self._on_failed is not None:
+            try:
+                self._on_failed(error)
+            except Exception as e:
+                print(f"⚠️ 交易写入失败回调异常: {e}")
+
+
+class TradeWriter:
+    """交易记录批量写入器"""
+    
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, retries: int = 3):
+        """
+        初始化写入器
+        
+        Args:
+            max_queue: 队列上限，超过后 submit() 阻塞（背压）
+            batch_size: 单个事务最多写入的记录数
+            retries: 批量写入失败时的重试次数
+        """
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.retries = retries
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        
+        # 统计
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.blocked = 0  # 因队列已满而等待的次数
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+    
+    def submit(self, trade_data: Dict, trader_id: str, strategy: str,
+               position_before: Optional[float] = None, position_after: Optional[float] = None,
+               on_failed: Optional[Callable[[Exception], None]] = None) -> TradeTicket:
+        """
+        提交交易记录（立即返回，队列已满时阻塞）
+        
+        Args:
+            trade_data: 交易所返回的订单信息
+            trader_id: 交易员ID
+            strategy: 策略类型
+            position_before: 交易前持仓
+            position_after: 交易后持仓
+            on_failed: 该记录最终写入失败时的回调（参数为异常）
+        
+        Returns:
+            写入凭证
+        """
+        self._ensure_thread()
+        ticket = TradeTicket(on_failed)
+        record = (trade_data, trader_id, strategy, position_before, position_after)
+        
+        with self._lock:
+            self.submitted += 1
+        try:
+            self._queue.put_nowait((record, ticket))
+        except queue.Full:
+            with self._lock:
+                self.blocked += 1
+                blocked = self.blocked
+            if blocked % 1000 == 1:
+                print(f"⚠️ 交易写入队列已满({self.max_queue})，等待写入（累计{blocked}次）")
+            self._queue.put((record, ticket))
+        return ticket
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待此前提交的所有记录写入完成
+        
+        Returns:
+            是否在超时前完成
+        """
+        if not self._thread or not self._thread.is_alive():
+            return self._queue.empty()
+        
+        marker = TradeTicket()
+        self._queue.put((None, marker))
+        try:
+            marker.wait(timeout)
+            return True
+        except TimeoutError:
+            return False
+    
+    def get_stats(self) -> Dict:
+        """获取写入器状态"""
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'submitted': self.submitted,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'avg_batch': self.written / self.batches if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'blocked': self.blocked,
+            'last_commit_ms': self.last_commit_ms,
+            'max_commit_ms': self.max_commit_ms
+        }
+    
+    def _ensure_thread(self):
+        """按需启动写线程"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._write_loop, name='trade-writer', daemon=True)
+            self._thread.start()
+    
+    def _write_loop(self):
+        """写循环：取出队列中已积压的记录，合并为一个事务写入"""
+        # 写线程专用连接：每次提交都 fsync
+        database.get_connection().execute('PRAGMA synchronous = FULL')
+        
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            records = [record for record, _ in items if record is not None]
+            tickets = [ticket for record, ticket in items if record is not None]
+            markers = [ticket for record, ticket in items if record is None]
+            
+            if records:
+                self._write_batch(records, tickets)
+            
+            for marker in markers:
+                marker._resolve()
+    
+    def _write_batch(self, records: List, tickets: List[TradeTicket]):
+        """
+        写入一批记录（失败时退避重试）
+        
+        违反约束（IntegrityError）或重试仍失败时改为逐条写入，
+        只有出错的记录失败，同批其他交易员的记录照常落库。
+        """
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                trade_ids = database.insert_trades(records)
+            except sqlite3.IntegrityError as e:
+                print(f"⚠️ 批量写入交易违反约束，改为逐条写入 {len(records)} 条记录: {e}")
+                break
+            except Exception as e:
+                if attempt < self.retries:
+                    print(f"⚠️ 批量写入交易失败 (尝试{attempt + 1}/{self.retries + 1}): {e}")
+                    time.sleep(0.1 * (2 ** attempt))
+                    continue
+                
+                print(f"⚠️ 批量写入交易失败，改为逐条写入 {len(records)} 条记录: {e}")
+                break
+            
+            self._record_commit(records, tickets, trade_ids, started)
+            return
+        
+        self._write_each(records, tickets)
+    
+    def _write_each(self, records: List, tickets: List[TradeTicket]):
+        """逐条写入（每条一个事务），只让写入失败的凭证报错"""
+        for record, ticket in zip(records, tickets):
+            started = time.perf_counter()
+            try:
+                trade_ids = database.insert_trades([record])
+            except Exception as e:
+                trade_data, trader_id = record[0], record[1]
+                print(f"❌ 未写入交易 [{trader_id}]: {trade_data} ({e})")
+                ticket._resolve(error=e)
+                with self._lock:
+                    self.failed += 1
+                continue
+            self._record_commit([record], [ticket], trade_ids, started)
+    
+    def _record_commit(self, records: List, tickets: List[TradeTicket], trade_ids: List[int], started: float):
+        """记录提交统计，完成凭证并推送给前端"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.written += len(records)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(records))
+            self.last_commit_ms = elapsed_ms
+            self.max_commit_ms = max(self.max_commit_ms, elapsed_ms)
+        
+        for trade_id, ticket in zip(trade_ids, tickets):
+            ticket._resolve(trade_id)
+        self._publish(records, trade_ids)
+    
+    def _publish(self, records: List, trade_ids: List[int]):
+        """把已提交的交易推送给前端（与 /api/trades 的记录格式一致）"""
+        if not stream_hub.client_count:
+            return
+        for trade_id, (trade_data, trader_id, strategy, position_before, position_after) in zip(trade_ids, records):
+            stream_hub.publish('trade', {
+                'id': trade_id,
+                'trader_id': trader_id,
+                'strategy': strategy,
+                'symbol': trade_data['symbol'],
+                'action': trade_data['action'],
+                'price': trade_data['price'],
+                'amount': trade_data['amount'],
+                'cost': trade_data['cost'],
+                'fee_amount': trade_data.get('fee', 0),
+                'timestamp': trade_data['timestamp'],
+                'position_before': position_before or 0,
+                'position_after': position_after or 0
+            }, trader_id)
+
+
+# 全局写入器
+trade_writer = TradeWriter(
+    max_queue=settings.trade_writer_max_queue,
+    batch_size=settings.trade_writer_batch_size
+)
+
+metrics.gauge('trade_writer_queued', '等待写入的交易记录数', trade_writer._queue.qsize)
+
+# 进程退出前排空队列
+atexit.register(trade_writer.flush, 10)
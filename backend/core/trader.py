@@ -1,71 +1,60 @@
 """交易员引擎 - 管理策略运行"""
-import json
-import sqlite3
 import threading
 import time
 from typing import Dict, Optional
+from core import database
+from core.events import event_journal
 from core.exchange import GateIOExchange
-from strategy.grid import GridStrategy
+from core.market_data import MarketDataHub
+from core.metrics import metrics, tick_duration
+from core.reconcile import OrderReconciler
+from core.scheduler import StrategyScheduler
+from core.stream import stream_hub
+from core.trade_writer import trade_writer
+from strategy.grid import GridStrategy, grid_params
+from strategy.ladder import LadderStrategy, ladder_params
 from config import settings
 
 
 class TraderEngine:
     """交易员引擎"""
     
-    def __init__(self):
-        """初始化交易员引擎"""
-        self.traders: Dict[str, threading.Thread] = {}  # trader_id -> thread
+    def __init__(self, exchange: GateIOExchange):
+        """
+        初始化交易员引擎（由 core.container 在首次使用时构造）
+        
+        Args:
+            exchange: 同步交易所客户端（来自交易所注册表）
+        """
         self.strategies: Dict[str, GridStrategy] = {}  # trader_id -> strategy
-        self.exchange = GateIOExchange(
-            api_key=settings.gate_api_key,
-            api_secret=settings.gate_api_secret,
-            testnet=settings.gate_testnet
+        self.exchange = exchange
+        
+        # 行情中心：每个交易对只拉取一次行情，分发给所有交易员
+        self.market_data = MarketDataHub(self.exchange)
+        
+        # 策略调度器：所有交易员共享少量工作线程，不再每个交易员一个线程
+        self.scheduler = StrategyScheduler(
+            workers=settings.scheduler_workers,
+            on_finished=self._on_strategy_finished
+        )
+        
+        # 订单对账：按实际成交修正所有交易员的交易记录和持仓
+        self.reconciler = OrderReconciler(
+            self.exchange,
+            interval=settings.reconcile_interval,
+            on_corrected=self._on_position_corrected
         )
         
         # ✅ Phase 3.5 - P2: 监控告警
         self.last_heartbeat: Dict[str, float] = {}  # trader_id -> timestamp
-        self.alert_log: list = []  # 告警日志
+        metrics.gauge('heartbeat_lag_seconds', '交易员距上次心跳的秒数', self._heartbeat_lags, ('trader_id',))
         
-        # 初始化数据库
-        self._init_database()
+        # 重置所有running状态为stopped（因为后端重启后线程丢失）
+        database.reset_running_traders()
         
         # 启动监控线程
         self._start_monitor()
-    
-    def _init_database(self):
-        """初始化数据库"""
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        # 执行traders表迁移
-        with open('data/migrations/002_traders.sql', 'r') as f:
-            cursor.executescript(f.read())
-        
-        # ✅ Phase 3.5 - P0: 执行持仓追踪迁移（忽略重复字段错误）
-        try:
-            # 读取并执行迁移脚本，但忽略ALTER TABLE重复错误
-            with open('data/migrations/003_position_tracking.sql', 'r') as f:
-                migration_sql = f.read()
-                # 逐条执行SQL，忽略重复字段错误
-                for statement in migration_sql.split(';'):
-                    statement = statement.strip()
-                    if statement and not statement.startswith('--'):
-                        try:
-                            cursor.execute(statement)
-                        except sqlite3.OperationalError as e:
-                            # 忽略"duplicate column"错误
-                            if 'duplicate column' not in str(e).lower():
-                                print(f"⚠️ 数据库迁移警告: {e}")
-            conn.commit()
-            print("✅ 持仓追踪迁移完成")
-        except Exception as e:
-            print(f"⚠️ 持仓追踪迁移失败: {e}")
-        
-        # 重置所有running状态为stopped（因为后端重启后线程丢失）
-        cursor.execute("UPDATE traders SET status = 'stopped' WHERE status = 'running'")
-        
-        conn.commit()
-        conn.close()
+        self.reconciler.start()
     
     def create_trader(self, trader_id: str, name: str, strategy: str, symbol: str, config: Dict) -> Dict:
         """
@@ -74,23 +63,26 @@ class TraderEngine:
         Args:
             trader_id: 交易员ID
             name: 交易员名称
-            strategy: 策略类型（目前只支持'grid'）
+            strategy: 策略类型（grid / ladder）
             symbol: 交易对
             config: 策略配置
-            
+        
         Returns:
             交易员信息
-        """
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO traders (id, name, strategy, symbol, status, config)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (trader_id, name, strategy, symbol, 'stopped', json.dumps(config)))
+        Raises:
+            ValueError: 策略配置无效
+        """
+        # 配置有误时创建即失败，而不是等到启动时
+        if strategy == 'grid':
+            grid_params(config)
+        elif strategy == 'ladder':
+            ladder_params(config)
+        else:
+            raise ValueError(f"不支持的策略类型: {strategy}")
         
-        conn.commit()
-        conn.close()
+        database.insert_trader(trader_id, name, strategy, symbol, 'stopped', config)
+        stream_hub.publish('trader_status', {'trader_id': trader_id, 'status': 'stopped', 'created': True}, trader_id)
         
         return {
             'id': trader_id,
@@ -103,54 +95,16 @@ class TraderEngine:
     
     def get_trader(self, trader_id: str) -> Optional[Dict]:
         """获取交易员信息"""
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM traders WHERE id = ?', (trader_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
-            return None
-        
-        return {
-            'id': row[0],
-            'name': row[1],
-            'strategy': row[2],
-            'symbol': row[3],
-            'status': row[4],
-            'config': json.loads(row[5]),
-            'created_at': row[6],
-            'updated_at': row[7]
-        }
+        return database.get_trader(trader_id)
     
     def list_traders(self) -> list:
         """获取所有交易员"""
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM traders ORDER BY created_at DESC')
-        rows = cursor.fetchall()
-        conn.close()
+        traders = database.list_traders()
         
-        traders = []
-        for row in rows:
-            trader = {
-                'id': row[0],
-                'name': row[1],
-                'strategy': row[2],
-                'symbol': row[3],
-                'status': row[4],
-                'config': json.loads(row[5]),
-                'created_at': row[6],
-                'updated_at': row[7]
-            }
-            
+        for trader in traders:
             # 如果正在运行，添加实时状态
-            if row[0] in self.strategies:
-                trader['runtime_status'] = self.strategies[row[0]].get_status()
-            
-            traders.append(trader)
+            if trader['id'] in self.strategies:
+                trader['runtime_status'] = self.strategies[trader['id']].get_status()
         
         return traders
     
@@ -160,12 +114,12 @@ class TraderEngine:
         
         Args:
             trader_id: 交易员ID
-            
+        
         Returns:
             是否启动成功
         """
         # 检查是否已经在运行
-        if trader_id in self.traders and self.traders[trader_id].is_alive():
+        if trader_id in self.strategies:
             return False
         
         # 获取交易员配置
@@ -174,29 +128,28 @@ class TraderEngine:
             return False
         
         # 创建策略实例
-        if trader['strategy'] == 'grid':
-            strategy = GridStrategy(
-                trader_id=trader_id,
-                symbol=trader['symbol'],
-                config=trader['config'],
-                exchange=self.exchange
-            )
-        else:
+        strategies = {'grid': GridStrategy, 'ladder': LadderStrategy}
+        strategy_class = strategies.get(trader['strategy'])
+        if strategy_class is None:
             return False
+        strategy = strategy_class(
+            trader_id=trader_id,
+            symbol=trader['symbol'],
+            config=trader['config'],
+            exchange=self.exchange,
+            market_data=self.market_data
+        )
         
-        # 在新线程中运行策略
-        thread = threading.Thread(target=strategy.run, daemon=True)
-        thread.start()
-        
-        # 保存引用
-        self.traders[trader_id] = thread
+        # 保存引用并交给调度器运行
         self.strategies[trader_id] = strategy
+        self.scheduler.add(trader_id, strategy)
         
         # ✅ Phase 3.5 - P2: 初始化心跳
         self.update_heartbeat(trader_id)
         
         # 更新数据库状态
         self._update_trader_status(trader_id, 'running')
+        event_journal.emit('trader_started', trader_id, f"交易员启动: {trader['symbol']}", symbol=trader['symbol'])
         
         return True
     
@@ -206,41 +159,42 @@ class TraderEngine:
         
         Args:
             trader_id: 交易员ID
-            
+        
         Returns:
             是否停止成功
         """
         if trader_id not in self.strategies:
             return False
         
-        # 停止策略
-        self.strategies[trader_id].stop()
+        # 停止策略，等待正在执行的tick结束（最多5秒）
+        self.scheduler.remove(trader_id, timeout=5)
+        self.strategies.pop(trader_id, None)
         
-        # 等待线程结束（最多5秒）
-        if trader_id in self.traders:
-            self.traders[trader_id].join(timeout=5)
-            del self.traders[trader_id]
-        
-        del self.strategies[trader_id]
+        # 等待已提交的交易记录写入，停止后查询盈亏即为最终结果
+        trade_writer.flush(timeout=5)
         
         # 更新数据库状态
         self._update_trader_status(trader_id, 'stopped')
+        event_journal.emit('trader_stopped', trader_id, "交易员停止", reason='manual')
         
         return True
     
+    def _on_strategy_finished(self, trader_id: str):
+        """策略自行停止（如触发止损止盈）后的回调"""
+        self.strategies.pop(trader_id, None)
+        self._update_trader_status(trader_id, 'stopped')
+        event_journal.emit('trader_stopped', trader_id, "策略自行停止", reason='finished')
+    
+    def _on_position_corrected(self, trader_id: str, symbol: str, delta: float):
+        """对账修正持仓后同步给运行中的策略（未运行的交易员启动时从账本加载）"""
+        strategy = self.strategies.get(trader_id)
+        if strategy is not None and strategy.symbol == symbol:
+            strategy.correct_position(delta)
+    
     def _update_trader_status(self, trader_id: str, status: str):
-        """更新交易员状态"""
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE traders 
-            SET status = ?, updated_at = strftime('%s', 'now')
-            WHERE id = ?
-        ''', (status, trader_id))
-        
-        conn.commit()
-        conn.close()
+        """更新交易员状态（并推送给前端）"""
+        database.update_trader_status(trader_id, status)
+        stream_hub.publish('trader_status', {'trader_id': trader_id, 'status': status}, trader_id)
     
     def delete_trader(self, trader_id: str) -> bool:
         """删除交易员"""
@@ -248,16 +202,11 @@ class TraderEngine:
         if trader_id in self.strategies:
             self.stop_trader(trader_id)
         
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM traders WHERE id = ?', (trader_id,))
-        affected = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
-        
-        return affected > 0
+        tick_duration.remove(trader_id)
+        deleted = database.delete_trader(trader_id)
+        if deleted:
+            stream_hub.publish('trader_status', {'trader_id': trader_id, 'status': 'deleted'}, trader_id)
+        return deleted
     
     def _start_monitor(self):
         """✅ Phase 3.5 - P2: 启动监控线程"""
@@ -292,25 +241,12 @@ class TraderEngine:
     def _check_position_alert(self):
         """✅ Phase 3.5 - P2: 持仓异常预警"""
         try:
-            conn = sqlite3.connect('data/database.db')
-            cursor = conn.cursor()
-            
             # 检查所有交易员的最新持仓
-            cursor.execute("""
-                SELECT trader_id, position_after 
-                FROM trades 
-                WHERE id IN (
-                    SELECT MAX(id) FROM trades GROUP BY trader_id
-                )
-                AND position_after < 0
-            """)
-            
-            negative_positions = cursor.fetchall()
-            conn.close()
+            negative_positions = database.list_negative_positions()
             
             for trader_id, position in negative_positions:
                 alert_msg = f"🚨 持仓异常: {trader_id} 出现负持仓 ({position:.6f} BTC)"
-                self._log_alert('position', alert_msg)
+                self._log_alert('position', alert_msg, trader_id)
         except Exception as e:
             print(f"持仓检查失败: {e}")
     
@@ -325,28 +261,23 @@ class TraderEngine:
                 # 5分钟无更新
                 if elapsed > 300:
                     alert_msg = f"💔 心跳异常: {trader_id} 已 {int(elapsed/60)} 分钟无响应"
-                    self._log_alert('heartbeat', alert_msg)
+                    self._log_alert('heartbeat', alert_msg, trader_id)
     
-    def _log_alert(self, alert_type: str, message: str):
-        """✅ Phase 3.5 - P2: 记录告警"""
+    def _log_alert(self, alert_type: str, message: str, trader_id: Optional[str] = None):
+        """✅ Phase 3.5 - P2: 记录告警（写入事件日志，可按类型和时间查询）"""
         timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        alert_entry = {
-            'type': alert_type,
-            'message': message,
-            'timestamp': timestamp
-        }
-        
-        self.alert_log.append(alert_entry)
         print(f"[{timestamp}] {message}")
-        
-        # 保留最近100条告警
-        if len(self.alert_log) > 100:
-            self.alert_log = self.alert_log[-100:]
+        event_journal.emit('alert', trader_id, message, alert_type=alert_type)
     
     def update_heartbeat(self, trader_id: str):
         """✅ Phase 3.5 - P2: 更新心跳"""
         self.last_heartbeat[trader_id] = time.time()
-
-
-# 全局交易员引擎实例
-trader_engine = TraderEngine()
+    
+    def _heartbeat_lags(self) -> Dict[tuple, float]:
+        """运行中交易员的心跳延迟（指标采集）"""
+        now = time.time()
+        return {
+            (trader_id,): now - self.last_heartbeat[trader_id]
+            for trader_id in list(self.strategies)
+            if trader_id in self.last_heartbeat
+        }
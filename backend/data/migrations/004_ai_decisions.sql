@@ -0,0 +1,14 @@
+-- AI决策记录表（原先在每次保存决策时临时创建）
+CREATE TABLE IF NOT EXISTS ai_decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trader_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    reasoning TEXT,
+    confidence REAL,
+    price REAL,
+    timestamp INTEGER NOT NULL
+);
+
+-- 按交易员查询决策历史
+CREATE INDEX IF NOT EXISTS idx_ai_decisions_trader_time ON ai_decisions(trader_id, timestamp);
@@ -0,0 +1,29 @@
+-- 交易员持仓/盈亏汇总账本：随每笔交易增量更新，避免全表扫描trades
+CREATE TABLE IF NOT EXISTS trader_ledger (
+    trader_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    bought REAL NOT NULL DEFAULT 0,        -- 累计买入数量
+    sold REAL NOT NULL DEFAULT 0,          -- 累计卖出数量
+    buy_cost REAL NOT NULL DEFAULT 0,      -- 累计买入成本（price * amount）
+    sell_revenue REAL NOT NULL DEFAULT 0,  -- 累计卖出收入（price * amount）
+    fees REAL NOT NULL DEFAULT 0,          -- 累计手续费
+    position REAL NOT NULL DEFAULT 0,      -- 当前持仓 = bought - sold
+    trade_count INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER DEFAULT (strftime('%s', 'now')),
+    PRIMARY KEY (trader_id, symbol)
+);
+
+-- 用历史交易回填账本
+INSERT OR IGNORE INTO trader_ledger (trader_id, symbol, bought, sold, buy_cost, sell_revenue, fees, position, trade_count)
+SELECT
+    trader_id,
+    symbol,
+    SUM(CASE WHEN action = 'buy' THEN amount ELSE 0 END),
+    SUM(CASE WHEN action = 'sell' THEN amount ELSE 0 END),
+    SUM(CASE WHEN action = 'buy' THEN price * amount ELSE 0 END),
+    SUM(CASE WHEN action = 'sell' THEN price * amount ELSE 0 END),
+    SUM(COALESCE(fee_amount, 0)),
+    SUM(CASE WHEN action = 'buy' THEN amount ELSE -amount END),
+    COUNT(*)
+FROM trades
+GROUP BY trader_id, symbol;
@@ -0,0 +1,13 @@
+-- 结构化事件日志：策略和引擎的交易、跳过、失败、止损止盈、告警等事件
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,              -- 事件时间（Unix秒）
+    type TEXT NOT NULL,            -- 事件类型：buy / sell / trade_failed / tick_skipped / stop_triggered / alert ...
+    trader_id TEXT,                -- 交易员ID（引擎级事件为空）
+    message TEXT,
+    data TEXT                      -- 附加字段（JSON）
+);
+
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_trader_ts ON events(trader_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events(type, ts);
@@ -0,0 +1,3 @@
+-- 交易历史键集分页：按交易员筛选并按 id 排序时直接走索引，无需排序
+-- （按 交易员+交易对 筛选时复用 idx_trades_trader_symbol，SQLite 索引隐含 rowid 排序）
+CREATE INDEX IF NOT EXISTS idx_trades_trader_id ON trades(trader_id, id);
@@ -0,0 +1,13 @@
+-- K线（OHLCV）本地存储：按 交易对 + 周期 + 开盘时间 聚簇存放，
+-- 区间读取沿主键顺序扫描，增量同步用 MAX(ts) 直接定位最后一根
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,       -- 周期：1m / 5m / 1h / 1d ...
+    ts INTEGER NOT NULL,           -- 开盘时间（毫秒时间戳）
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    PRIMARY KEY (symbol, timeframe, ts)
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+-- 交易记录关联交易所订单：对账服务按自定义订单ID匹配挂单和成交，修正按委托记账的交易
+ALTER TABLE trades ADD COLUMN order_id TEXT;
+ALTER TABLE trades ADD COLUMN client_order_id TEXT;
+ALTER TABLE trades ADD COLUMN reconciled INTEGER DEFAULT 1;  -- 0=待对账（真实下单按委托记账），1=已按实际成交确认
+
+-- 待对账的交易很少，部分索引只包含这些行
+CREATE INDEX IF NOT EXISTS idx_trades_unreconciled ON trades(symbol, id) WHERE reconciled = 0;
@@ -2,17 +2,29 @@
 AI-Spot-Master 后端入口
 FastAPI 应用程序主文件
 """
+import time
+STARTED_AT = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from api import trade, trader, ai
-import uvicorn
+from api import trade, trader, ai, metrics, events, stream
+from core.container import container
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时只迁移数据库，交易所和交易员引擎在后台预热；退出时关闭HTTP会话"""
+    container.startup(STARTED_AT)
+    yield
+    await container.shutdown()
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
     title="AI-Spot-Master API",
     description="AI驱动的现货交易系统",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # 配置 CORS
@@ -28,6 +40,9 @@ app.add_middleware(
 app.include_router(trade.router)
 app.include_router(trader.router)
 app.include_router(ai.router)
+app.include_router(metrics.router)
+app.include_router(events.router)
+app.include_router(stream.router)
 
 @app.get("/")
 async def root():
@@ -40,10 +55,13 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "ai-spot-master",
-        "version": "0.1.0"
+        "version": "0.1.0",
+        "startup": container.get_stats()
     }
 
 if __name__ == "__main__":
+    import uvicorn  # 只在直接运行时需要，不计入 uvicorn/测试客户端加载 main 的启动耗时
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,528 @@
+"""
+本地 Gate.io 模拟交易所
+实现项目用到的 ccxt gateio 接口子集，可直接作为 GateIOExchange / AsyncGateIOExchange 的底层客户端：
+fetch_ticker / fetch_balance / create_limit_buy_order / create_limit_sell_order /
+fetch_open_orders / fetch_order / cancel_order / fetch_my_trades / fetch_order_book / fetch_ohlcv
+
+- 价格过程驱动做市商在盘口两侧挂多档流动性，用户订单与做市商及其他用户订单撮合
+- 可注入网络延迟和随机网络错误，用于压测和熔断演练
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import ccxt
+from core.exchange import FEE_RATE
+from simulator.matching import Order, OrderBook
+from simulator.price import GBMPriceProcess
+
+
+# 做市商账户（不记余额）
+MARKET_MAKER = 'mm'
+USER = 'user'
+
+# 价格推进的最小间隔（秒），避免每次调用都重新挂做市单
+MIN_STEP = 0.05
+
+# 每个交易对保留的1分钟K线根数（一周）
+MAX_CANDLES = 7 * 24 * 60
+
+# 保留的用户成交明细条数
+MAX_FILLS = 100000
+
+
+class SimulatedGateIO:
+    """模拟交易所（线程安全）"""
+    
+    def __init__(self, prices: Optional[Dict[str, Any]] = None, balances: Optional[Dict[str, float]] = None,
+                 fee_rate: float = FEE_RATE, spread_pct: float = 0.02, levels: int = 10, level_step_pct: float = 0.05,
+                 level_amount: Optional[Dict[str, float]] = None, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, time_scale: float = 1.0, seed: Optional[int] = None):
+        """
+        初始化模拟交易所
+        
+        Args:
+            prices: 交易对 -> 初始价格或价格过程对象（有 price 属性和 step(dt) 方法），默认 BTC/USDT 50000
+            balances: 初始余额，默认 100000 USDT
+            fee_rate: 手续费率（计价币收取）
+            spread_pct: 做市商买一卖一价差百分比
+            levels: 做市商每侧挂单档数
+            level_step_pct: 相邻档位价差百分比
+            level_amount: 交易对 -> 每档挂单数量，默认按约 10000 USDT 计算
+            latency: 每次调用的注入延迟（秒）
+            latency_jitter: 延迟随机抖动（秒）
+            error_rate: 每次调用抛出网络错误的概率
+            time_scale: 行情时间倍速
+            seed: 随机种子
+        """
+        prices = prices or {'BTC/USDT': 50000.0}
+        self._random = random.Random(seed)
+        self.processes = {
+            symbol: GBMPriceProcess(value, seed=self._random.randrange(2 ** 32)) if isinstance(value, (int, float)) else value
+            for symbol, value in prices.items()
+        }
+        self.fee_rate = fee_rate
+        self.spread = spread_pct / 100
+        self.levels = levels
+        self.level_step = level_step_pct / 100
+        self.level_amount = level_amount or {
+            symbol: 10000.0 / process.price for symbol, process in self.processes.items()
+        }
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._clock = time.time()
+        self.books = {symbol: OrderBook(symbol, self._settle) for symbol in self.processes}
+        self.orders: Dict[str, Order] = {}  # 用户订单
+        self.fills: deque = deque(maxlen=MAX_FILLS)  # 用户成交明细（按时间正序）
+        self._mm_orders: Dict[str, List[str]] = {symbol: [] for symbol in self.processes}
+        self._stats = {symbol: {'last': p.price, 'high': p.price, 'low': p.price, 'volume': 0.0}
+                       for symbol, p in self.processes.items()}
+        self._candles = {symbol: deque(maxlen=MAX_CANDLES) for symbol in self.processes}  # 1分钟K线
+        
+        self.balances: Dict[str, Dict[str, float]] = {}
+        for currency, amount in (balances or {'USDT': 100000.0}).items():
+            self.balances[currency] = {'free': float(amount), 'used': 0.0}
+        for symbol in self.processes:
+            for currency in symbol.split('/'):
+                self.balances.setdefault(currency, {'free': 0.0, 'used': 0.0})
+        
+        self.markets = {symbol: self._market(symbol) for symbol in self.processes}
+        self.call_count = 0
+        self.error_count = 0
+        
+        for symbol, process in self.processes.items():
+            self._record_trade(symbol, process.price, 0.0)
+            self._requote(symbol)
+    
+    # ===== ccxt 兼容接口 =====
+    
+    def set_sandbox_mode(self, enabled: bool):
+        """兼容 ccxt（模拟交易所无需区分测试网）"""
+    
+    def load_markets(self, reload: bool = False) -> Dict[str, Dict]:
+        """交易对信息"""
+        self._before_call()
+        return self.markets
+    
+    def fetch_ticker(self, symbol: str) -> Dict:
+        """行情"""
+        self._before_call()
+        with self._lock:
+            book = self._book(symbol)
+            self._advance()
+            stats = self._stats[symbol]
+            return {
+                'symbol': symbol,
+                'timestamp': self._now_ms(),
+                'last': stats['last'],
+                'bid': book.best_bid(),
+                'ask': book.best_ask(),
+                'high': stats['high'],
+                'low': stats['low'],
+                'baseVolume': stats['volume']
+            }
+    
+    def fetch_balance(self) -> Dict:
+        """余额（ccxt 格式：币种 -> {free, used, total}，另含 free/used/total 汇总）"""
+        self._before_call()
+        with self._lock:
+            self._advance()
+            result: Dict[str, Any] = {'free': {}, 'used': {}, 'total': {}}
+            for currency, balance in self.balances.items():
+                total = balance['free'] + balance['used']
+                result[currency] = {'free': balance['free'], 'used': balance['used'], 'total': total}
+                result['free'][currency] = balance['free']
+                result['used'][currency] = balance['used']
+                result['total'][currency] = total
+            return result
+    
+    def create_limit_buy_order(self, symbol: str, amount: float, price: float, params: Optional[Dict] = None) -> Dict:
+        """限价买入"""
+        return self.create_order(symbol, 'limit', 'buy', amount, price, params)
+    
+    def create_limit_sell_order(self, symbol: str, amount: float, price: float, params: Optional[Dict] = None) -> Dict:
+        """限价卖出"""
+        return self.create_order(symbol, 'limit', 'sell', amount, price, params)
+    
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: Optional[float] = None,
+                     params: Optional[Dict] = None) -> Dict:
+        """
+        下单（只支持限价单）
+        
+        Raises:
+            ccxt.InvalidOrder: 参数错误
+            ccxt.InsufficientFunds: 余额不足
+        """
+        self._before_call()
+        if type != 'limit' or price is None:
+            raise ccxt.InvalidOrder("模拟交易所只支持限价单")
+        if amount <= 0 or price <= 0:
+            raise ccxt.InvalidOrder(f"无效的数量或价格: {amount} @ {price}")
+        
+        with self._lock:
+            book = self._book(symbol)
+            self._advance()
+            base, quote = symbol.split('/')
+            
+            # 冻结资金
+            if side == 'buy':
+                reserve = price * amount * (1 + self.fee_rate)
+                self._reserve(quote, reserve)
+            else:
+                self._reserve(base, amount)
+            
+            client_order_id = (params or {}).get('text')
+            order = Order(f"sim{next(self._ids)}", USER, symbol, side, price, amount,
+                          self._now_ms(), book.next_seq(), client_order_id)
+            self.orders[order.id] = order
+            book.submit(order)
+            return self._format_order(order)
+    
+    def cancel_order(self, order_id: str, symbol: Optional[str] = None, params: Optional[Dict] = None) -> Dict:
+        """
+        撤单
+        
+        Raises:
+            ccxt.OrderNotFound: 订单不存在或已结束
+        """
+        self._before_call()
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status != 'open':
+                raise ccxt.OrderNotFound(f"订单不存在或已结束: {order_id}")
+            self.books[order.symbol].cancel(order_id)
+            self._release(order)
+            return self._format_order(order)
+    
+    def fetch_order(self, order_id: str, symbol: Optional[str] = None, params: Optional[Dict] = None) -> Dict:
+        """查询订单"""
+        self._before_call()
+        with self._lock:
+            self._advance()
+            order = self.orders.get(order_id)
+            if order is None:
+                raise ccxt.OrderNotFound(f"订单不存在: {order_id}")
+            return self._format_order(order)
+    
+    def fetch_open_orders(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                          limit: Optional[int] = None, params: Optional[Dict] = None) -> List[Dict]:
+        """未完成订单"""
+        self._before_call()
+        with self._lock:
+            self._advance()
+            orders = [
+                order for order in self.orders.values()
+                if order.status == 'open' and (symbol is None or order.symbol == symbol)
+            ]
+            orders.sort(key=lambda order: order.seq)
+            if limit:
+                orders = orders[:limit]
+            return [self._format_order(order) for order in orders]
+    
+    def fetch_my_trades(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                        limit: Optional[int] = None, params: Optional[Dict] = None) -> List[Dict]:
+        """用户成交明细（按时间正序，since 为起始时间毫秒，含）"""
+        self._before_call()
+        with self._lock:
+            self._advance()
+            trades = [
+                dict(trade) for trade in self.fills
+                if (symbol is None or trade['symbol'] == symbol) and (since is None or trade['timestamp'] >= since)
+            ]
+            return trades[:limit] if limit else trades
+    
+    def fetch_order_book(self, symbol: str, limit: Optional[int] = None, params: Optional[Dict] = None) -> Dict:
+        """盘口深度"""
+        self._before_call()
+        with self._lock:
+            book = self._book(symbol)
+            self._advance()
+            depth = book.depth(limit or 20)
+            return {'symbol': symbol, 'timestamp': self._now_ms(), 'nonce': None, **depth}
+    
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                    limit: Optional[int] = None, params: Optional[Dict] = None) -> List[List[float]]:
+        """K线（由模拟运行期间的价格和成交聚合，只保留最近一周的1分钟K线）"""
+        self._before_call()
+        period = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        if period < 60000 or period % 60000:
+            raise ccxt.BadRequest(f"模拟交易所不支持的K线周期: {timeframe}")
+        with self._lock:
+            self._book(symbol)
+            self._advance()
+            minutes = [tuple(bar) for bar in self._candles[symbol]]
+        
+        bars: List[List[float]] = []
+        for ts, open_, high, low, close, volume in minutes:
+            start = ts - ts % period
+            if bars and bars[-1][0] == start:
+                bar = bars[-1]
+                bar[2] = max(bar[2], high)
+                bar[3] = min(bar[3], low)
+                bar[4] = close
+                bar[5] += volume
+            else:
+                bars.append([start, open_, high, low, close, volume])
+        
+        if since is not None:
+            bars = [bar for bar in bars if bar[0] >= since]
+            return bars[:limit] if limit else bars
+        return bars[-limit:] if limit else bars
+    
+    def close(self):
+        """兼容 ccxt"""
+    
+    # ===== 模拟控制 =====
+    
+    def get_stats(self) -> Dict:
+        """模拟交易所状态"""
+        with self._lock:
+            return {
+                'prices': {symbol: stats['last'] for symbol, stats in self._stats.items()},
+                'open_orders': sum(1 for order in self.orders.values() if order.status == 'open'),
+                'total_orders': len(self.orders),
+                'call_count': self.call_count,
+                'error_count': self.error_count
+            }
+    
+    # ===== 内部实现 =====
+    
+    @contextmanager
+    def latency_injected(self):
+        """调用方已自行注入延迟（协程接口），本线程内的调用不再 sleep"""
+        self._local.skip_latency = True
+        try:
+            yield
+        finally:
+            self._local.skip_latency = False
+    
+    def _before_call(self):
+        """注入延迟和网络错误"""
+        self.call_count += 1
+        if not getattr(self._local, 'skip_latency', False):
+            delay = self._delay()
+            if delay > 0:
+                time.sleep(delay)
+        self._maybe_fail()
+    
+    def _delay(self) -> float:
+        """本次调用的延迟"""
+        if self.latency <= 0 and self.latency_jitter <= 0:
+            return 0.0
+        return max(self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter), 0.0)
+    
+    def _maybe_fail(self):
+        """按概率抛出网络错误"""
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self.error_count += 1
+            raise ccxt.NetworkError("模拟网络错误")
+    
+    def _book(self, symbol: str) -> OrderBook:
+        """交易对的订单簿"""
+        book = self.books.get(symbol)
+        if book is None:
+            raise ccxt.BadSymbol(f"模拟交易所不支持交易对: {symbol}")
+        return book
+    
+    def _now_ms(self) -> int:
+        return int(time.time() * 1000)
+    
+    def _advance(self):
+        """按经过的时间推进所有交易对的价格，并重新挂做市单（调用方需持有锁）"""
+        now = time.time()
+        if now - self._clock < MIN_STEP:
+            return
+        dt = (now - self._clock) * self.time_scale
+        self._clock = now
+        for symbol, process in self.processes.items():
+            # 价格过程代表市场上其他参与者的成交
+            self._record_trade(symbol, process.step(dt), 0.0)
+            self._requote(symbol)
+    
+    def _requote(self, symbol: str):
+        """撤掉旧的做市单，围绕最新价格重新挂多档买卖单（会与穿价的用户挂单撮合）"""
+        book = self.books[symbol]
+        for order_id in self._mm_orders[symbol]:
+            book.cancel(order_id)
+        self._mm_orders[symbol] = []
+        
+        mid = self.processes[symbol].price
+        amount = self.level_amount[symbol]
+        for level in range(self.levels):
+            offset = self.spread / 2 + level * self.level_step
+            for side, price in (('sell', mid * (1 + offset)), ('buy', mid * (1 - offset))):
+                order = Order(f"mm{next(self._ids)}", MARKET_MAKER, symbol, side, price, amount,
+                              self._now_ms(), book.next_seq())
+                book.submit(order)
+                if order.status == 'open':
+                    self._mm_orders[symbol].append(order.id)
+    
+    def _settle(self, maker: Order, taker: Order, price: float, amount: float):
+        """成交结算：更新用户余额、订单手续费和行情统计"""
+        for order in (maker, taker):
+            if order.owner != USER:
+                continue
+            base, quote = order.symbol.split('/')
+            fee = price * amount * self.fee_rate
+            order.fee += fee
+            trade = {
+                'id': f"t{next(self._ids)}",
+                'order': order.id,
+                'clientOrderId': order.client_order_id,
+                'symbol': order.symbol,
+                'side': order.side,
+                'price': price,
+                'amount': amount,
+                'cost': price * amount,
+                'fee': {'cost': fee, 'currency': quote},
+                'takerOrMaker': 'maker' if order is maker else 'taker',
+                'timestamp': self._now_ms(),
+                'info': {'text': order.client_order_id}
+            }
+            order.trades.append(trade)
+            self.fills.append(trade)
+            if order.side == 'buy':
+                # 按挂单价冻结，按成交价结算，差额退回
+                reserved = order.price * amount * (1 + self.fee_rate)
+                self.balances[quote]['used'] -= reserved
+                self.balances[quote]['free'] += reserved - (price * amount + fee)
+                self.balances[base]['free'] += amount
+            else:
+                self.balances[base]['used'] -= amount
+                self.balances[quote]['free'] += price * amount - fee
+        
+        self._record_trade(maker.symbol, price, amount)
+    
+    def _record_trade(self, symbol: str, price: float, amount: float):
+        """更新行情统计和当前1分钟K线"""
+        stats = self._stats[symbol]
+        stats['last'] = price
+        stats['high'] = max(stats['high'], price)
+        stats['low'] = min(stats['low'], price)
+        stats['volume'] += amount
+        
+        minute = self._now_ms() // 60000 * 60000
+        candles = self._candles[symbol]
+        if candles and candles[-1][0] == minute:
+            bar = candles[-1]
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            bar[5] += amount
+        else:
+            candles.append([minute, price, price, price, price, amount])
+    
+    def _reserve(self, currency: str, amount: float):
+        """冻结余额"""
+        balance = self.balances.setdefault(currency, {'free': 0.0, 'used': 0.0})
+        if balance['free'] + 1e-12 < amount:
+            raise ccxt.InsufficientFunds(f"{currency}余额不足: 需要{amount:.8f}, 可用{balance['free']:.8f}")
+        balance['free'] -= amount
+        balance['used'] += amount
+    
+    def _release(self, order: Order):
+        """撤单后解冻剩余部分"""
+        base, quote = order.symbol.split('/')
+        if order.side == 'buy':
+            reserved = order.price * order.remaining * (1 + self.fee_rate)
+            self.balances[quote]['used'] -= reserved
+            self.balances[quote]['free'] += reserved
+        else:
+            self.balances[base]['used'] -= order.remaining
+            self.balances[base]['free'] += order.remaining
+    
+    def _market(self, symbol: str) -> Dict:
+        """交易对信息（ccxt market 格式的常用字段）"""
+        base, quote = symbol.split('/')
+        return {
+            'id': symbol.replace('/', '_'),
+            'symbol': symbol,
+            'base': base,
+            'quote': quote,
+            'type': 'spot',
+            'spot': True,
+            'active': True,
+            'precision': {'amount': 1e-8, 'price': 1e-8},
+            'limits': {'amount': {'min': 1e-8}, 'cost': {'min': 1.0}}
+        }
+    
+    def _format_order(self, order: Order) -> Dict:
+        """订单转 ccxt 格式"""
+        return {
+            'id': order.id,
+            'clientOrderId': order.client_order_id,
+            'symbol': order.symbol,
+            'type': 'limit',
+            'side': order.side,
+            'price': order.price,
+            'amount': order.amount,
+            'filled': order.filled,
+            'remaining': order.remaining,
+            'cost': order.cost,
+            'average': order.cost / order.filled if order.filled else None,
+            'status': order.status,
+            'timestamp': order.timestamp,
+            'fee': {'cost': order.fee, 'currency': order.symbol.split('/')[1]},
+            'trades': list(order.trades)
+        }
+
+
+class AsyncSimulatedGateIO:
+    """模拟交易所的协程接口（与 ccxt.async_support 一致），与同步接口共享同一个撮合引擎"""
+    
+    def __init__(self, simulator: SimulatedGateIO):
+        self.simulator = simulator
+        self.markets = simulator.markets
+    
+    def set_sandbox_mode(self, enabled: bool):
+        """兼容 ccxt"""
+    
+    async def close(self):
+        """兼容 ccxt"""
+    
+    def __getattr__(self, name: str):
+        """把 ccxt 方法包装为协程：延迟用 asyncio.sleep 注入，撮合本身在内存中完成，直接同步调用"""
+        method = getattr(self.simulator, name)
+        if name.startswith('_') or not callable(method):
+            return method
+        
+        async def call(*args, **kwargs):
+            delay = self.simulator._delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            with self.simulator.latency_injected():
+                return method(*args, **kwargs)
+        
+        return call
+
+
+_simulator: Optional[SimulatedGateIO] = None
+_simulator_lock = threading.Lock()
+
+
+def get_simulator() -> SimulatedGateIO:
+    """进程内共享的模拟交易所（按配置创建，同步/异步交易所共用同一个撮合引擎和账户）"""
+    global _simulator
+    with _simulator_lock:
+        if _simulator is None:
+            from config import settings
+            _simulator = SimulatedGateIO(
+                prices={'BTC/USDT': GBMPriceProcess(settings.simulator_initial_price, settings.simulator_volatility)},
+                balances={'USDT': settings.simulator_initial_usdt},
+                latency=settings.simulator_latency_ms / 1000,
+                latency_jitter=settings.simulator_latency_ms / 2000,
+                error_rate=settings.simulator_error_rate,
+                time_scale=settings.simulator_time_scale
+            )
+            print("🧪 使用本地模拟交易所")
+        return _simulator
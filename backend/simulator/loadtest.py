@@ -0,0 +1,86 @@
+"""
+交易员引擎压测：在本地模拟交易所上同时运行大量网格交易员
+
+用法（在 backend 目录下）：
+    python -m simulator.loadtest --traders 200 --duration 60
+
+使用临时数据库，不影响 data/database.db。
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟交易所压测')
+    parser.add_argument('--traders', type=int, default=100, help='交易员数量')
+    parser.add_argument('--duration', type=float, default=30, help='运行时长（秒）')
+    parser.add_argument('--interval', type=int, default=1, help='交易员检查间隔（秒）')
+    parser.add_argument('--grid-gap', type=float, default=0.05, help='网格间距百分比')
+    parser.add_argument('--amount', type=float, default=0.0005, help='每格交易数量')
+    parser.add_argument('--time-scale', type=float, default=3000, help='行情时间倍速')
+    parser.add_argument('--latency-ms', type=float, default=20, help='模拟网络延迟（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟网络错误概率')
+    args = parser.parse_args()
+    
+    # 配置在导入引擎前通过环境变量生效
+    db_path = os.path.join(tempfile.mkdtemp(prefix='loadtest_'), 'loadtest.db')
+    os.environ.update({
+        'GATE_SIMULATOR': 'true',
+        'GATE_API_KEY': '',
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'SIMULATOR_TIME_SCALE': str(args.time_scale),
+        'SIMULATOR_LATENCY_MS': str(args.latency_ms),
+        'SIMULATOR_ERROR_RATE': str(args.error_rate),
+        'SIMULATOR_INITIAL_USDT': str(args.traders * 10000)
+    })
+    
+    from core import database
+    from core.trade_writer import trade_writer
+    from core.container import container
+    from simulator.gateio import get_simulator
+    
+    trader_engine = container.engine
+    config = {
+        'grid_gap': args.grid_gap,
+        'amount': args.amount,
+        'check_interval': args.interval,
+        'max_position': args.amount * 20
+    }
+    trader_ids = [f'load_{i:04d}' for i in range(args.traders)]
+    for trader_id in trader_ids:
+        trader_engine.create_trader(trader_id, trader_id, 'grid', 'BTC/USDT', config)
+    
+    print(f"🚀 启动 {args.traders} 个交易员，运行 {args.duration:.0f} 秒 (数据库: {db_path})")
+    started = time.time()
+    for trader_id in trader_ids:
+        trader_engine.start_trader(trader_id)
+    
+    time.sleep(args.duration)
+    
+    scheduled = trader_engine.scheduler.get_stats()['traders'].values()
+    ticks = sum(entry['tick_count'] for entry in scheduled)
+    late = sum(entry['late_count'] for entry in scheduled)
+    for trader_id in trader_ids:
+        trader_engine.stop_trader(trader_id)
+    elapsed = time.time() - started
+    
+    trades = sum(database.get_trader_ledger(trader_id)['trade_count'] for trader_id in trader_ids)
+    report = {
+        'traders': args.traders,
+        'duration_s': round(elapsed, 1),
+        'ticks': ticks,
+        'ticks_per_s': round(ticks / elapsed, 1),
+        'late_ticks': late,
+        'trades': trades,
+        'trades_per_s': round(trades / elapsed, 2),
+        'simulator': get_simulator().get_stats(),
+        'trade_writer': trade_writer.get_stats()
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == '__main__':
+    main()
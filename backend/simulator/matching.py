@@ -0,0 +1,157 @@
+"""
+撮合引擎
+每个交易对一个限价订单簿，价格优先、时间优先；成交价为挂单方（maker）价格。
+"""
+import heapq
+import itertools
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Order:
+    """限价订单"""
+    
+    __slots__ = ('id', 'client_order_id', 'owner', 'symbol', 'side', 'price', 'amount', 'filled', 'cost',
+                 'status', 'timestamp', 'seq', 'fee', 'trades')
+    
+    def __init__(self, order_id: str, owner: str, symbol: str, side: str, price: float, amount: float,
+                 timestamp: int, seq: int, client_order_id: Optional[str] = None):
+        self.id = order_id
+        self.client_order_id = client_order_id
+        self.owner = owner
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.filled = 0.0
+        self.cost = 0.0
+        self.status = 'open'
+        self.timestamp = timestamp
+        self.seq = seq
+        self.fee = 0.0
+        self.trades: List[Dict] = []
+    
+    @property
+    def remaining(self) -> float:
+        """未成交数量"""
+        return self.amount - self.filled
+
+
+# 成交回调：(maker, taker, price, amount)
+FillHandler = Callable[[Order, Order, float, float], None]
+
+
+class OrderBook:
+    """单个交易对的订单簿"""
+    
+    # 小于该数量视为完全成交，避免浮点残量挂在簿上
+    DUST = 1e-12
+    
+    def __init__(self, symbol: str, on_fill: FillHandler):
+        """
+        Args:
+            symbol: 交易对
+            on_fill: 每笔成交的结算回调
+        """
+        self.symbol = symbol
+        self.on_fill = on_fill
+        self._bids: List[Tuple[float, int, Order]] = []  # (-price, seq, order)
+        self._asks: List[Tuple[float, int, Order]] = []  # (price, seq, order)
+        self.orders: Dict[str, Order] = {}  # 簿上的挂单
+        self._seq = itertools.count()
+        self._stale = 0  # 堆中已撤销但尚未清理的条目数
+    
+    def next_seq(self) -> int:
+        """时间优先序号"""
+        return next(self._seq)
+    
+    def submit(self, order: Order) -> Order:
+        """提交订单：先与对手方撮合，剩余部分挂单"""
+        if order.side == 'buy':
+            book, crosses = self._asks, (lambda best: best.price <= order.price)
+        else:
+            book, crosses = self._bids, (lambda best: best.price >= order.price)
+        
+        while order.remaining > self.DUST:
+            best = self._peek(book)
+            if best is None or not crosses(best):
+                break
+            amount = min(order.remaining, best.remaining)
+            self._fill(best, order, best.price, amount)
+            if best.remaining <= self.DUST:
+                heapq.heappop(book)
+                self._close(best)
+        
+        if order.remaining <= self.DUST:
+            self._close(order)
+        else:
+            self.orders[order.id] = order
+            if order.side == 'buy':
+                heapq.heappush(self._bids, (-order.price, order.seq, order))
+            else:
+                heapq.heappush(self._asks, (order.price, order.seq, order))
+        return order
+    
+    def cancel(self, order_id: str) -> Optional[Order]:
+        """撤单（惰性删除，堆中的条目在到达堆顶时丢弃）"""
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            order.status = 'canceled'
+            self._stale += 1
+            if self._stale > len(self.orders) + 1000:
+                self._compact()
+        return order
+    
+    def best_bid(self) -> Optional[float]:
+        """买一价"""
+        best = self._peek(self._bids)
+        return best.price if best else None
+    
+    def best_ask(self) -> Optional[float]:
+        """卖一价"""
+        best = self._peek(self._asks)
+        return best.price if best else None
+    
+    def depth(self, limit: int = 20) -> Dict[str, List[List[float]]]:
+        """按价格聚合的盘口深度"""
+        return {
+            'bids': self._levels(self._bids, limit, reverse=True),
+            'asks': self._levels(self._asks, limit, reverse=False)
+        }
+    
+    def _levels(self, book: List, limit: int, reverse: bool) -> List[List[float]]:
+        """聚合价位"""
+        levels: Dict[float, float] = {}
+        for _, _, order in book:
+            if order.status == 'open':
+                levels[order.price] = levels.get(order.price, 0.0) + order.remaining
+        prices = sorted(levels, reverse=reverse)[:limit]
+        return [[price, levels[price]] for price in prices]
+    
+    def _peek(self, book: List) -> Optional[Order]:
+        """堆顶的有效订单（顺便清理已撤销/已成交的条目）"""
+        while book:
+            order = book[0][2]
+            if order.status == 'open' and order.id in self.orders:
+                return order
+            heapq.heappop(book)
+        return None
+    
+    def _compact(self):
+        """重建堆，清理已撤销的条目（频繁撤单时避免堆无限增长）"""
+        self._bids = [entry for entry in self._bids if entry[2].status == 'open']
+        self._asks = [entry for entry in self._asks if entry[2].status == 'open']
+        heapq.heapify(self._bids)
+        heapq.heapify(self._asks)
+        self._stale = 0
+    
+    def _fill(self, maker: Order, taker: Order, price: float, amount: float):
+        """记录一笔成交"""
+        for order in (maker, taker):
+            order.filled += amount
+            order.cost += price * amount
+        self.on_fill(maker, taker, price, amount)
+    
+    def _close(self, order: Order):
+        """订单完全成交"""
+        order.status = 'closed'
+        self.orders.pop(order.id, None)
@@ -0,0 +1,59 @@
+"""
+模拟行情的价格过程
+按真实经过的时间推进价格，time_scale 可以加速行情（如 60 表示 1 秒相当于 1 分钟）
+"""
+import math
+import random
+from typing import Optional, Sequence
+
+
+class GBMPriceProcess:
+    """几何布朗运动价格过程"""
+    
+    def __init__(self, initial_price: float, volatility: float = 0.6, drift: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            initial_price: 初始价格
+            volatility: 年化波动率（0.6表示60%）
+            drift: 年化漂移率
+            seed: 随机种子（固定后价格路径可复现）
+        """
+        self.price = initial_price
+        self.volatility = volatility
+        self.drift = drift
+        self._random = random.Random(seed)
+    
+    def step(self, dt: float) -> float:
+        """推进 dt 秒，返回新价格"""
+        if dt <= 0:
+            return self.price
+        years = dt / (365 * 24 * 3600)
+        sigma = self.volatility
+        shock = self._random.gauss(0, 1)
+        self.price *= math.exp((self.drift - 0.5 * sigma * sigma) * years + sigma * math.sqrt(years) * shock)
+        return self.price
+
+
+class ReplayPriceProcess:
+    """回放历史价格（每 bar_seconds 秒前进一根K线，结束后停在最后一根）"""
+    
+    def __init__(self, prices: Sequence[float], bar_seconds: float = 60.0):
+        """
+        Args:
+            prices: 历史价格序列
+            bar_seconds: 每根K线对应的模拟秒数
+        """
+        if not prices:
+            raise ValueError("回放价格序列为空")
+        self.prices = prices
+        self.bar_seconds = bar_seconds
+        self._elapsed = 0.0
+        self.price = prices[0]
+    
+    def step(self, dt: float) -> float:
+        """推进 dt 秒，返回新价格"""
+        self._elapsed += max(dt, 0)
+        index = min(int(self._elapsed / self.bar_seconds), len(self.prices) - 1)
+        self.price = self.prices[index]
+        return self.price
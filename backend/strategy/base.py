@@ -1,6 +1,8 @@
 """策略基类"""
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any
+from core.events import event_journal
 
 
 class BaseStrategy(ABC):
@@ -19,19 +21,41 @@ class BaseStrategy(ABC):
         self.symbol = symbol
         self.config = config
         self.running = False
+        self.check_interval = int(config.get('check_interval', 60))  # 检查间隔（秒），默认60秒
+    
+    def on_start(self):
+        """策略启动（调度器在第一次tick前调用）"""
+        self.running = True
     
     @abstractmethod
-    def run(self):
+    def tick(self):
         """
-        运行策略（主循环）
-        子类必须实现此方法
+        执行一轮策略逻辑
+        子类必须实现此方法；需要停止策略时把 self.running 置为 False
         """
         pass
     
+    def on_stop(self):
+        """策略停止后的清理（调度器在策略停止后调用）"""
+        pass
+    
+    def run(self):
+        """在当前线程中独立运行策略（主循环），由调度器托管时不使用"""
+        self.on_start()
+        while self.running:
+            self.tick()
+            if self.running:
+                time.sleep(self.check_interval)
+        self.on_stop()
+    
     def stop(self):
         """停止策略"""
         self.running = False
     
+    def emit(self, type: str, message: str = '', **data: Any):
+        """记录本交易员的结构化事件（见 core.events）"""
+        event_journal.emit(type, self.trader_id, message, symbol=self.symbol, **data)
+    
     def get_status(self) -> Dict[str, Any]:
         """
         获取策略状态
@@ -1,9 +1,104 @@
 """网格交易策略"""
-import time
-import sqlite3
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 from strategy.base import BaseStrategy
-from core.exchange import GateIOExchange
+from core import database
+from core.trade_writer import trade_writer
+from core.exchange import GateIOExchange, new_client_order_id
+from core.ledger import compute_pnl
+from core.market_data import MarketDataHub
+
+
+# 网格间隔模式：fixed 固定间隔；atr / volatility 按滚动指标自适应
+GRID_MODES = ('fixed', 'atr', 'volatility')
+
+# 自适应模式读取的指标（百分比，见 core.indicators）
+ADAPTIVE_INDICATORS = {'atr': 'atr_pct', 'volatility': 'volatility_pct'}
+
+
+def grid_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    解析网格策略参数（实盘策略与回测共用，保证默认值一致）
+    
+    Raises:
+        ValueError: 不支持的网格模式
+    """
+    grid_mode = config.get('grid_mode', 'fixed')
+    if grid_mode not in GRID_MODES:
+        raise ValueError(f"不支持的网格模式: {grid_mode}（可选 {'/'.join(GRID_MODES)}）")
+    
+    return {
+        'amount': float(config.get('amount', 0.0005)),  # 默认0.0005 BTC
+        'grid_gap': float(config.get('grid_gap', 2.0)),  # 默认2%
+        # ✅ Phase 3.5 - P1: 通用止损止盈参数（网格默认不启用）
+        'stop_loss_pct': config.get('stop_loss_pct', None),  # 止损百分比（如-10表示-10%），None表示不启用
+        'take_profit_pct': config.get('take_profit_pct', None),  # 止盈百分比（如20表示+20%），None表示不启用
+        # ✅ Phase 3.5 - P1: 网格区间保护（可选）
+        'grid_min': config.get('grid_min', None),  # 网格下限价格，None表示不限制
+        'grid_max': config.get('grid_max', None),  # 网格上限价格，None表示不限制
+        'max_position': config.get('max_position', None),  # 最大持仓，None表示不限制
+        # 自适应网格：间隔 = 指标 × 倍数，限制在 [gap_min, gap_max]；指标预热完成前使用 grid_gap
+        'grid_mode': grid_mode,
+        'gap_multiplier': float(config.get('gap_multiplier', 3.0)),  # 默认3倍ATR（指标周期K线）
+        'gap_min': float(config.get('gap_min', 0.5)),  # 间隔下限，需覆盖一买一卖的手续费和滑点
+        'gap_max': float(config.get('gap_max', 5.0)),  # 间隔上限
+    }
+
+
+def grid_signal(price_change_pct: float, grid_gap: float, last_action: Optional[str]) -> Optional[str]:
+    """
+    网格信号：价格相对上次成交价的变化超过网格间隔时给出买卖方向
+    （实盘策略与回测共用）
+    
+    Returns:
+        'buy' / 'sell' / None
+    """
+    # 价格下跌超过网格间隔 → 买入
+    if price_change_pct <= -grid_gap and last_action != 'buy':
+        return 'buy'
+    # 价格上涨超过网格间隔 → 卖出
+    if price_change_pct >= grid_gap and last_action != 'sell':
+        return 'sell'
+    return None
+
+
+def adaptive_gap(indicator_pct: Optional[float], grid_mode: str, grid_gap: float, gap_multiplier: float,
+                 gap_min: float, gap_max: float) -> float:
+    """
+    当前网格间隔（百分比，实盘策略与回测共用）
+    
+    Args:
+        indicator_pct: 自适应模式对应的指标值（ATR% 或单根K线波动率%），None 表示尚未预热
+        grid_mode: 网格模式
+        grid_gap: 固定间隔（fixed 模式及指标预热前使用）
+        gap_multiplier / gap_min / gap_max: 自适应间隔的倍数和上下限
+    """
+    if grid_mode == 'fixed' or indicator_pct is None:
+        return grid_gap
+    return min(max(indicator_pct * gap_multiplier, gap_min), gap_max)
+
+
+def stop_trigger(pnl_pct: float, stop_loss_pct: Optional[float], take_profit_pct: Optional[float]) -> Optional[str]:
+    """
+    止损止盈判断（实盘策略与回测共用）
+    
+    Returns:
+        'stop_loss' / 'take_profit' / None
+    """
+    if stop_loss_pct is not None and pnl_pct <= stop_loss_pct:
+        return 'stop_loss'
+    if take_profit_pct is not None and pnl_pct >= take_profit_pct:
+        return 'take_profit'
+    return None
+
+
+def in_grid_range(price: float, grid_min: Optional[float], grid_max: Optional[float]) -> bool:
+    """价格是否在网格区间内（None表示不限制）"""
+    if grid_min is not None and price < grid_min:
+        return False
+    if grid_max is not None and price > grid_max:
+        return False
+    return True
 
 
 class GridStrategy(BaseStrategy):
@@ -16,7 +111,11 @@ class GridStrategy(BaseStrategy):
     - 在价格波动中赚取差价
     """
     
-    def __init__(self, trader_id: str, symbol: str, config: Dict[str, Any], exchange: GateIOExchange):
+    # 交易记录中的策略类型
+    strategy_name = 'grid'
+    
+    def __init__(self, trader_id: str, symbol: str, config: Dict[str, Any], exchange: GateIOExchange,
+                 market_data: Optional[MarketDataHub] = None):
         """
         初始化网格策略
         
@@ -26,25 +125,34 @@ class GridStrategy(BaseStrategy):
             config: 配置参数
                 - amount: 每次交易数量（BTC）
                 - grid_gap: 网格间隔（百分比，如2表示2%）
-                - check_interval: 检查间隔（秒）
+                - grid_mode: fixed / atr / volatility，自适应模式按共享指标调整间隔（需要行情中心）
+                - gap_multiplier / gap_min / gap_max: 自适应间隔的倍数和上下限（百分比）
+                - check_interval: 检查间隔（秒），由基类解析
             exchange: 交易所实例
+            market_data: 行情中心（可选），提供时从行情中心读取共享行情
         """
         super().__init__(trader_id, symbol, config)
         self.exchange = exchange
+        self.market_data = market_data
         
         # 策略参数
-        self.amount = float(config.get('amount', 0.0005))  # 默认0.0005 BTC
-        self.grid_gap = float(config.get('grid_gap', 2.0))  # 默认2%
-        self.check_interval = int(config.get('check_interval', 60))  # 默认60秒
+        params = grid_params(config)
+        self.amount = params['amount']
+        self.grid_gap = params['grid_gap']
+        self.grid_mode = params['grid_mode']
+        self.gap_multiplier = params['gap_multiplier']
+        self.gap_min = params['gap_min']
+        self.gap_max = params['gap_max']
+        self.current_gap = self.grid_gap  # 最近一轮使用的网格间隔
         
         # ✅ Phase 3.5 - P1: 通用止损止盈参数（网格默认不启用）
-        self.stop_loss_pct = config.get('stop_loss_pct', None)  # 止损百分比（如-10表示-10%），None表示不启用
-        self.take_profit_pct = config.get('take_profit_pct', None)  # 止盈百分比（如20表示+20%），None表示不启用
+        self.stop_loss_pct = params['stop_loss_pct']
+        self.take_profit_pct = params['take_profit_pct']
         
         # ✅ Phase 3.5 - P1: 网格区间保护（可选）
-        self.grid_min = config.get('grid_min', None)  # 网格下限价格，None表示不限制
-        self.grid_max = config.get('grid_max', None)  # 网格上限价格，None表示不限制
-        self.max_position = config.get('max_position', None)  # 最大持仓，None表示不限制
+        self.grid_min = params['grid_min']
+        self.grid_max = params['grid_max']
+        self.max_position = params['max_position']
         
         # 运行状态
         self.last_price = None
@@ -54,142 +162,179 @@ class GridStrategy(BaseStrategy):
         # ✅ Phase 3.5: 持仓追踪（现货交易约束）
         self.current_position = self._load_position()  # 从数据库加载当前持仓
         self.avg_cost = 0  # 平均成本（未来用于盈亏计算）
+        
+        # 对账服务发现的持仓修正（由对账线程写入，下一轮 tick 开始时计入持仓）
+        self._position_correction = 0.0
+        self._correction_lock = threading.Lock()
     
     def _load_position(self) -> float:
         """
-        从trades表计算当前持仓
+        从持仓账本读取当前持仓
         
         现货交易约束：持仓 = SUM(买入) - SUM(卖出) >= 0
         
         Returns:
             当前持仓数量（BTC）
         """
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                SUM(CASE WHEN action='buy' THEN amount ELSE 0 END) as bought,
-                SUM(CASE WHEN action='sell' THEN amount ELSE 0 END) as sold
-            FROM trades 
-            WHERE trader_id = ? AND symbol = ?
-        ''', (self.trader_id, self.symbol))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        bought = row[0] or 0
-        sold = row[1] or 0
-        position = bought - sold
+        ledger = database.get_ledger(self.trader_id, self.symbol)
+        bought, sold = ledger['bought'], ledger['sold']
+        position = ledger['position']
         
         print(f"[{self.trader_id}] 加载持仓: 买入{bought:.6f} - 卖出{sold:.6f} = {position:.6f} BTC")
         
         return position
     
-    def run(self):
-        """运行网格策略"""
-        self.running = True
-        print(f"[{self.trader_id}] 网格策略启动: {self.symbol}, 网格间隔{self.grid_gap}%")
+    def on_start(self):
+        """启动网格策略"""
+        super().on_start()
+        if self.grid_mode == 'fixed':
+            print(f"[{self.trader_id}] 网格策略启动: {self.symbol}, 网格间隔{self.grid_gap}%")
+        else:
+            print(f"[{self.trader_id}] 网格策略启动: {self.symbol}, 自适应网格({self.grid_mode} × {self.gap_multiplier}, "
+                  f"{self.gap_min}%~{self.gap_max}%)")
         
-        while self.running:
-            try:
-                # ✅ Phase 3.5 - P2: 更新心跳
-                self._update_heartbeat()
-                
-                # 获取当前价格
-                ticker = self.exchange.get_ticker(self.symbol)
-                current_price = ticker['last']
-                
-                # 第一次运行，记录初始价格
-                if self.last_price is None:
-                    self.last_price = current_price
-                    print(f"[{self.trader_id}] 初始价格: ${current_price:,.2f}")
-                    time.sleep(self.check_interval)
-                    continue
-                
-                # 计算价格变化百分比
-                price_change_pct = ((current_price - self.last_price) / self.last_price) * 100
-                
-                # ✅ Phase 3.5 - P1: 检查止损止盈（通用框架）
-                should_stop, stop_reason = self._check_stop_conditions(current_price)
-                if should_stop:
-                    print(f"[{self.trader_id}] ❗ {stop_reason}")
-                    self.running = False
-                    break
-                
-                # ✅ Phase 3.5 - P1: 网格区间保护
-                if not self._is_price_in_grid_range(current_price):
-                    print(f"[{self.trader_id}] ⚠️ 价格 ${current_price:,.2f} 超出网格区间，暂停交易")
-                    time.sleep(self.check_interval)
-                    continue
-                
-                # 价格下跌超过网格间隔 → 买入
-                if price_change_pct <= -self.grid_gap and self.last_action != 'buy':
-                    # ✅ Phase 3.5 - P1: 检查最大持仓限制
-                    if self.max_position and self.current_position >= self.max_position:
-                        print(f"[{self.trader_id}] ⚠️ 已达最大持仓({self.max_position} BTC)，跳过买入")
-                    else:
-                        # ✅ Phase 3.5: 买入前检查余额
-                        balance = self.exchange.get_balance()
-                        usdt_free = balance.get('USDT', {}).get('free', 0)
-                        cost = self.amount * current_price
-                        
-                        if usdt_free < cost:
-                            print(f"[{self.trader_id}] ⚠️ 余额不足({usdt_free:.2f} USDT < {cost:.2f} USDT)，跳过买入")
-                        else:
-                            print(f"[{self.trader_id}] 价格下跌 {price_change_pct:.2f}% → 买入 {self.amount} BTC @ ${current_price:,.2f}")
-                            try:
-                                result = self.exchange.market_buy(self.symbol, self.amount)
-                                self._save_trade(result)
-                                self.current_position += self.amount  # ✅ 更新持仓
-                                self.last_price = current_price
-                                self.last_action = 'buy'
-                                self.trade_count += 1
-                                print(f"[{self.trader_id}] ✅ 买入成功，当前持仓: {self.current_position:.6f} BTC")
-                            except Exception as e:
-                                print(f"[{self.trader_id}] ❌ 买入失败: {e}")
-                
-                # 价格上涨超过网格间隔 → 卖出
-                elif price_change_pct >= self.grid_gap and self.last_action != 'sell':
-                    # ✅ Phase 3.5: 卖出前检查持仓（现货不能卖空）
-                    if self.current_position < self.amount:
-                        print(f"[{self.trader_id}] ⚠️ 持仓不足({self.current_position:.6f} BTC < {self.amount} BTC)，跳过卖出")
+        # 订阅共享行情
+        if self.market_data:
+            self.market_data.subscribe(self.symbol, self.trader_id, self.check_interval)
+    
+    def tick(self):
+        """执行一轮网格检查"""
+        try:
+            # ✅ Phase 3.5 - P2: 更新心跳
+            self._update_heartbeat()
+            self._apply_position_correction()
+            
+            # 获取当前价格
+            ticker = self._get_ticker()
+            if ticker.get('stale'):
+                print(f"[{self.trader_id}] ⚠️ 行情已过期({ticker['age']:.0f}秒)，跳过本轮")
+                self.emit('tick_skipped', f"行情已过期({ticker['age']:.0f}秒)", reason='stale', age=ticker['age'])
+                return
+            current_price = ticker['last']
+            
+            # 第一次运行，记录初始价格
+            if self.last_price is None:
+                self.last_price = current_price
+                print(f"[{self.trader_id}] 初始价格: ${current_price:,.2f}")
+                return
+            
+            # 计算价格变化百分比
+            price_change_pct = ((current_price - self.last_price) / self.last_price) * 100
+            
+            # ✅ Phase 3.5 - P1: 检查止损止盈（通用框架）
+            should_stop, stop_reason = self._check_stop_conditions(current_price)
+            if should_stop:
+                print(f"[{self.trader_id}] ❗ {stop_reason}")
+                self.emit('stop_triggered', stop_reason, price=current_price)
+                self.running = False
+                return
+            
+            # ✅ Phase 3.5 - P1: 网格区间保护
+            if not self._is_price_in_grid_range(current_price):
+                print(f"[{self.trader_id}] ⚠️ 价格 ${current_price:,.2f} 超出网格区间，暂停交易")
+                self.emit('tick_skipped', f"价格 {current_price:.2f} 超出网格区间", reason='out_of_range',
+                          price=current_price)
+                return
+            
+            self.current_gap = self._current_gap()
+            signal = grid_signal(price_change_pct, self.current_gap, self.last_action)
+            
+            # 价格下跌超过网格间隔 → 买入
+            if signal == 'buy':
+                # ✅ Phase 3.5 - P1: 检查最大持仓限制
+                if self.max_position and self.current_position >= self.max_position:
+                    print(f"[{self.trader_id}] ⚠️ 已达最大持仓({self.max_position} BTC)，跳过买入")
+                    self.emit('trade_skipped', f"已达最大持仓({self.max_position})", action='buy',
+                              reason='max_position', price=current_price)
+                else:
+                    # ✅ Phase 3.5: 买入前检查余额
+                    balance = self.exchange.get_balance()
+                    usdt_free = balance.get('USDT', {}).get('free', 0)
+                    cost = self.amount * current_price
+                    
+                    if usdt_free < cost:
+                        print(f"[{self.trader_id}] ⚠️ 余额不足({usdt_free:.2f} USDT < {cost:.2f} USDT)，跳过买入")
+                        self.emit('trade_skipped', f"余额不足({usdt_free:.2f} < {cost:.2f} USDT)", action='buy',
+                                  reason='balance', price=current_price)
                     else:
-                        print(f"[{self.trader_id}] 价格上涨 {price_change_pct:.2f}% → 卖出 {self.amount} BTC @ ${current_price:,.2f}")
+                        print(f"[{self.trader_id}] 价格下跌 {price_change_pct:.2f}% → 买入 {self.amount} BTC @ ${current_price:,.2f}")
                         try:
-                            result = self.exchange.market_sell(self.symbol, self.amount)
+                            result = self.exchange.market_buy(self.symbol, self.amount, new_client_order_id(self.trader_id))
                             self._save_trade(result)
-                            self.current_position -= self.amount  # ✅ 更新持仓
+                            self.current_position += self.amount  # ✅ 更新持仓
                             self.last_price = current_price
-                            self.last_action = 'sell'
+                            self.last_action = 'buy'
                             self.trade_count += 1
-                            print(f"[{self.trader_id}] ✅ 卖出成功，当前持仓: {self.current_position:.6f} BTC")
+                            print(f"[{self.trader_id}] ✅ 买入成功，当前持仓: {self.current_position:.6f} BTC")
+                            self.emit('buy', f"买入 {result['amount']} @ {result['price']:.2f}", price=result['price'],
+                                      amount=result['amount'], position=self.current_position,
+                                      order_id=result.get('order_id'))
                         except Exception as e:
-                            print(f"[{self.trader_id}] ❌ 卖出失败: {e}")
-                
+                            print(f"[{self.trader_id}] ❌ 买入失败: {e}")
+                            self.emit('trade_failed', f"买入失败: {e}", action='buy', price=current_price)
+            
+            # 价格上涨超过网格间隔 → 卖出
+            elif signal == 'sell':
+                # ✅ Phase 3.5: 卖出前检查持仓（现货不能卖空）
+                if self.current_position < self.amount:
+                    print(f"[{self.trader_id}] ⚠️ 持仓不足({self.current_position:.6f} BTC < {self.amount} BTC)，跳过卖出")
+                    self.emit('trade_skipped', f"持仓不足({self.current_position:.6f})", action='sell',
+                              reason='position', price=current_price)
                 else:
-                    # 价格变化未达到网格间隔
-                    print(f"[{self.trader_id}] 价格变化 {price_change_pct:+.2f}% (网格间隔±{self.grid_gap}%) → 等待")
-                
-                # 等待下一次检查
-                time.sleep(self.check_interval)
-                
-            except Exception as e:
-                print(f"[{self.trader_id}] 策略运行错误: {e}")
-                time.sleep(self.check_interval)
+                    print(f"[{self.trader_id}] 价格上涨 {price_change_pct:.2f}% → 卖出 {self.amount} BTC @ ${current_price:,.2f}")
+                    try:
+                        result = self.exchange.market_sell(self.symbol, self.amount, new_client_order_id(self.trader_id))
+                        self._save_trade(result)
+                        self.current_position -= self.amount  # ✅ 更新持仓
+                        self.last_price = current_price
+                        self.last_action = 'sell'
+                        self.trade_count += 1
+                        print(f"[{self.trader_id}] ✅ 卖出成功，当前持仓: {self.current_position:.6f} BTC")
+                        self.emit('sell', f"卖出 {result['amount']} @ {result['price']:.2f}", price=result['price'],
+                                  amount=result['amount'], position=self.current_position,
+                                  order_id=result.get('order_id'))
+                    except Exception as e:
+                        print(f"[{self.trader_id}] ❌ 卖出失败: {e}")
+                        self.emit('trade_failed', f"卖出失败: {e}", action='sell', price=current_price)
+            
+            else:
+                # 价格变化未达到网格间隔
+                print(f"[{self.trader_id}] 价格变化 {price_change_pct:+.2f}% (网格间隔±{self.current_gap:.2f}%) → 等待")
+        
+        except Exception as e:
+            print(f"[{self.trader_id}] 策略运行错误: {e}")
+            self.emit('error', f"策略运行错误: {e}")
+    
+    def on_stop(self):
+        """网格策略停止后的清理"""
+        if self.market_data:
+            self.market_data.unsubscribe(self.symbol, self.trader_id)
         
         print(f"[{self.trader_id}] 网格策略已停止，共执行 {self.trade_count} 笔交易")
     
+    def _get_ticker(self) -> Dict[str, Any]:
+        """获取行情：优先使用行情中心的共享行情"""
+        if self.market_data:
+            return self.market_data.get_ticker(self.symbol)
+        return self.exchange.get_ticker(self.symbol)
+    
+    def _current_gap(self) -> float:
+        """本轮网格间隔：自适应模式按行情中心的共享指标计算（没有行情中心或指标未预热时使用固定间隔）"""
+        indicator_pct = None
+        if self.grid_mode != 'fixed' and self.market_data:
+            indicators = self.market_data.get_indicators(self.symbol)
+            if indicators:
+                indicator_pct = indicators[ADAPTIVE_INDICATORS[self.grid_mode]]
+        return adaptive_gap(indicator_pct, self.grid_mode, self.grid_gap, self.gap_multiplier, self.gap_min,
+                            self.gap_max)
+    
     def _save_trade(self, trade_data: Dict[str, Any]):
         """
-        保存交易记录到数据库
+        保存交易记录（异步批量写入数据库）
         
         Args:
             trade_data: 交易数据
         """
-        conn = sqlite3.connect('data/database.db')
-        cursor = conn.cursor()
-        
         # ✅ Phase 3.5: 计算持仓变化
         position_before = self.current_position
         if trade_data['action'] == 'buy':
@@ -197,25 +342,21 @@ class GridStrategy(BaseStrategy):
         else:  # sell
             position_after = self.current_position - trade_data['amount']
         
-        cursor.execute('''
-            INSERT INTO trades (trader_id, strategy, symbol, action, price, amount, cost, fee_amount, timestamp, position_before, position_after)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            self.trader_id,
-            'grid',
-            trade_data['symbol'],
-            trade_data['action'],
-            trade_data['price'],
-            trade_data['amount'],
-            trade_data['cost'],
-            trade_data.get('fee', 0),
-            trade_data['timestamp'],
-            position_before,
-            position_after
-        ))
+        # 放入后台写入队列，不在策略tick中等待数据库提交
+        trade_writer.submit(trade_data, self.trader_id, self.strategy_name, position_before, position_after,
+                            on_failed=lambda error: self._on_trade_write_failed(trade_data, error))
+    
+    def _on_trade_write_failed(self, trade_data: Dict[str, Any], error: Exception):
+        """
+        交易记录最终写入失败（写线程回调）：撤销该笔成交对内存持仓的改动，使持仓与交易历史、账本一致
         
-        conn.commit()
-        conn.close()
+        按对账修正的方式在下一轮 tick 开始时生效，不与策略线程争用 current_position。
+        """
+        amount = trade_data['amount']
+        self.correct_position(-amount if trade_data['action'] == 'buy' else amount)
+        print(f"[{self.trader_id}] ❌ 交易记录写入失败，回滚持仓: {error}")
+        self.emit('error', f"交易记录写入失败，已回滚持仓: {error}", action=trade_data['action'],
+                  amount=amount, price=trade_data.get('price'), order_id=trade_data.get('order_id'))
     
     def get_status(self) -> Dict[str, Any]:
         """获取策略状态"""
@@ -226,8 +367,11 @@ class GridStrategy(BaseStrategy):
             'trade_count': self.trade_count,
             'amount': self.amount,
             'grid_gap': self.grid_gap,
+            'grid_mode': self.grid_mode,
+            'current_gap': self.current_gap,
             'check_interval': self.check_interval,
-            'current_position': self.current_position  # ✅ Phase 3.5: 返回持仓信息
+            'current_position': self.current_position,  # ✅ Phase 3.5: 返回持仓信息
+            'indicators': self.market_data.get_indicators(self.symbol) if self.market_data else None
         })
         return status
     
@@ -237,7 +381,7 @@ class GridStrategy(BaseStrategy):
         
         Args:
             current_price: 当前价格
-            
+        
         Returns:
             (should_stop, reason): 是否应该停止, 原因
         """
@@ -250,82 +394,52 @@ class GridStrategy(BaseStrategy):
             return False, ""
         
         try:
-            # 调用盈亏计算API（复用逻辑）
-            import sqlite3
-            
-            conn = sqlite3.connect('data/database.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT action, price, amount FROM trades WHERE trader_id = ? ORDER BY id",
-                (self.trader_id,)
-            )
-            trades = cursor.fetchall()
-            conn.close()
-            
-            if not trades:
+            # 从持仓账本计算盈亏（O(1)，不再扫描交易历史）
+            # 持仓和成本都取账本中已提交的值：交易异步写入，写入队列中的成交两者都尚未计入，口径一致
+            ledger = database.get_ledger(self.trader_id, self.symbol)
+            if ledger['buy_cost'] == 0 or ledger['position'] <= 0:
                 return False, ""
             
-            # 计算总成本
-            total_buy_cost = 0.0
-            total_bought = 0.0
-            total_sold = 0.0
-            total_sell_revenue = 0.0
-            
-            for trade in trades:
-                if trade[0] == 'buy':
-                    total_bought += trade[2]
-                    total_buy_cost += trade[1] * trade[2]
-                elif trade[0] == 'sell':
-                    total_sold += trade[2]
-                    total_sell_revenue += trade[1] * trade[2]
-            
-            if total_buy_cost == 0:
-                return False, ""
-            
-            # 计算已实现盈亏
-            if total_sold > 0:
-                avg_buy_price = total_buy_cost / total_bought
-                realized_pnl = total_sell_revenue - (avg_buy_price * total_sold)
-            else:
-                realized_pnl = 0.0
-            
-            # 计算未实现盈亏
-            if self.current_position > 0:
-                remaining_cost = total_buy_cost - (total_buy_cost / total_bought * total_sold)
-                current_value = self.current_position * current_price
-                unrealized_pnl = current_value - remaining_cost
-            else:
-                unrealized_pnl = 0.0
-            
-            # 总盈亏和盈亏率
-            total_pnl = realized_pnl + unrealized_pnl
-            pnl_pct = (total_pnl / total_buy_cost * 100)
+            pnl_pct = compute_pnl(ledger, current_price)['pnl_pct']
+            trigger = stop_trigger(pnl_pct, self.stop_loss_pct, self.take_profit_pct)
             
             # 检查止损
-            if self.stop_loss_pct is not None and pnl_pct <= self.stop_loss_pct:
+            if trigger == 'stop_loss':
                 # 触发止损：卖出全部持仓
                 if self.current_position > 0:
                     try:
+                        self._before_liquidation()
                         print(f"[{self.trader_id}] ❌ 触发止损 ({pnl_pct:.2f}% <= {self.stop_loss_pct}%) → 卖出全部持仓 {self.current_position} BTC")
-                        result = self.exchange.market_sell(self.symbol, self.current_position)
+                        result = self.exchange.market_sell(self.symbol, self.current_position,
+                                                           new_client_order_id(self.trader_id))
                         self._save_trade(result)
                         self.current_position = 0
+                        self.emit('sell', f"止损卖出 {result['amount']} @ {result['price']:.2f}", price=result['price'],
+                                  amount=result['amount'], position=0.0, order_id=result.get('order_id'),
+                                  reason='stop_loss')
                     except Exception as e:
                         print(f"[{self.trader_id}] ❌ 止损卖出失败: {e}")
+                        self.emit('trade_failed', f"止损卖出失败: {e}", action='sell', price=current_price)
                 
                 return True, f"止损触发: 盈亏率 {pnl_pct:.2f}% <= {self.stop_loss_pct}%，策略停止"
             
             # 检查止盈
-            if self.take_profit_pct is not None and pnl_pct >= self.take_profit_pct:
+            if trigger == 'take_profit':
                 # 触发止盈：卖出全部持仓
                 if self.current_position > 0:
                     try:
+                        self._before_liquidation()
                         print(f"[{self.trader_id}] ✅ 触发止盈 ({pnl_pct:.2f}% >= {self.take_profit_pct}%) → 卖出全部持仓 {self.current_position} BTC")
-                        result = self.exchange.market_sell(self.symbol, self.current_position)
+                        result = self.exchange.market_sell(self.symbol, self.current_position,
+                                                           new_client_order_id(self.trader_id))
                         self._save_trade(result)
                         self.current_position = 0
+                        self.emit('sell', f"止盈卖出 {result['amount']} @ {result['price']:.2f}", price=result['price'],
+                                  amount=result['amount'], position=0.0, order_id=result.get('order_id'),
+                                  reason='take_profit')
                     except Exception as e:
                         print(f"[{self.trader_id}] ❌ 止盈卖出失败: {e}")
+                        self.emit('trade_failed', f"止盈卖出失败: {e}", action='sell', price=current_price)
                 
                 return True, f"止盈触发: 盈亏率 {pnl_pct:.2f}% >= {self.take_profit_pct}%，策略停止"
             
@@ -335,35 +449,40 @@ class GridStrategy(BaseStrategy):
             print(f"[{self.trader_id}] ⚠️ 检查止损止盈失败: {e}")
             return False, ""
     
+    def correct_position(self, delta: float):
+        """对账服务按实际成交修正持仓（线程安全，下一轮 tick 生效）"""
+        with self._correction_lock:
+            self._position_correction += delta
+    
+    def _apply_position_correction(self):
+        """把对账修正计入当前持仓"""
+        with self._correction_lock:
+            delta, self._position_correction = self._position_correction, 0.0
+        if delta:
+            self.current_position += delta
+            print(f"[{self.trader_id}] 🔄 对账修正持仓 {delta:+.8f}，当前持仓: {self.current_position:.6f}")
+    
+    def _before_liquidation(self):
+        """止损/止盈清仓前的准备（挂单策略在此撤掉挂单、解冻持仓）"""
+        pass
+    
     def _is_price_in_grid_range(self, price: float) -> bool:
         """
         ✅ Phase 3.5 - P1: 检查价格是否在网格区间内
         
         Args:
             price: 当前价格
-            
+        
         Returns:
             bool: True表示在区间内，False表示超出区间
         """
-        # 如果没有设置区间，默认在区间内
-        if self.grid_min is None and self.grid_max is None:
-            return True
-        
-        # 检查下限
-        if self.grid_min is not None and price < self.grid_min:
-            return False
-        
-        # 检查上限
-        if self.grid_max is not None and price > self.grid_max:
-            return False
-        
-        return True
+        return in_grid_range(price, self.grid_min, self.grid_max)
     
     def _update_heartbeat(self):
         """✅ Phase 3.5 - P2: 更新心跳"""
         try:
-            # 通知trader_engine更新心跳
-            from core.trader import trader_engine
-            trader_engine.update_heartbeat(self.trader_id)
+            # 通知交易员引擎更新心跳
+            from core.container import container
+            container.engine.update_heartbeat(self.trader_id)
         except:
             pass  # 静默失败，不影响策略运行
@@ -0,0 +1,388 @@
+"""挂单网格（订单阶梯）策略"""
+import math
+import time
+from typing import Dict, Any, List, Optional
+import ccxt
+from strategy.base import BaseStrategy
+from strategy.grid import GridStrategy, grid_params, in_grid_range
+from core.exchange import FEE_RATE, GateIOExchange, client_order_prefix, new_client_order_id
+from core.market_data import MarketDataHub
+
+
+# 小于该数量视为没有新成交
+DUST = 1e-12
+
+
+def ladder_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    解析挂单网格参数（在网格参数基础上增加档位数）
+    
+    Raises:
+        ValueError: 参数无效
+    """
+    params = grid_params(config)
+    params['levels'] = int(config.get('levels', 5))  # 每侧挂单档数
+    if params['levels'] < 1:
+        raise ValueError(f"挂单档数至少为1: {params['levels']}")
+    return params
+
+
+def level_price(center: float, step_pct: float, level: int) -> float:
+    """第 level 档的价格（等比阶梯：相邻档位相差 step_pct%，第0档为阶梯中心）"""
+    return center * (1 + step_pct / 100) ** level
+
+
+class LadderStrategy(GridStrategy):
+    """
+    挂单网格（订单阶梯）
+    
+    原理：
+    - 以最近成交的档位为锚点，下方挂 levels 档买单、上方挂 levels 档卖单（卖单数受持仓限制）
+    - 买单成交后锚点下移，上一档补挂卖单；卖单成交后锚点上移，下一档补挂买单
+    - 每轮只请求一次未完成订单列表，订单从列表中消失时再查询一次成交明细
+    - 以挂单方（maker）成交，没有吃单的滑点和价格轮询延迟
+    """
+    
+    strategy_name = 'ladder'
+    
+    def __init__(self, trader_id: str, symbol: str, config: Dict[str, Any], exchange: GateIOExchange,
+                 market_data: Optional[MarketDataHub] = None):
+        """
+        初始化挂单网格
+        
+        Args:
+            trader_id: 交易员ID
+            symbol: 交易对
+            config: 配置参数（其余参数同网格策略）
+                - amount: 每档数量
+                - grid_gap: 相邻档位间隔（百分比）；grid_mode 为自适应模式时在建立阶梯时按指标计算
+                - levels: 每侧挂单档数（默认5）
+                - check_interval: 检查成交的间隔（秒）
+            exchange: 交易所实例（需配置API密钥或使用模拟交易所）
+            market_data: 行情中心（可选）
+        """
+        super().__init__(trader_id, symbol, config, exchange, market_data)
+        self.levels = ladder_params(config)['levels']
+        
+        # 阶梯：档位 -> 挂单；档位价格 = level_price(center_price, step, 档位)
+        self.center_price: Optional[float] = None
+        self.step: Optional[float] = None
+        self.anchor = 0  # 最近成交的档位，两侧各挂 levels 档
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        
+        # 自定义订单ID前缀（重启后按前缀识别本交易员的残留挂单）
+        self._client_prefix = client_order_prefix(trader_id)
+        self._rejected: Dict[int, str] = {}  # 档位 -> 最近一次下单失败原因（相同原因不重复告警）
+        
+        # 统计
+        self.placed_count = 0
+        self.canceled_count = 0
+    
+    def on_start(self):
+        """启动挂单网格（阶梯在第一轮 tick 中建立）"""
+        BaseStrategy.on_start(self)
+        print(f"[{self.trader_id}] 挂单网格启动: {self.symbol}, 每侧{self.levels}档, 每档{self.amount}")
+        
+        # 只有自适应间隔和止损止盈需要持续的行情，其余情况只在建立阶梯时取一次价格
+        if self.market_data and (self.grid_mode != 'fixed' or self._stops_enabled()):
+            self.market_data.subscribe(self.symbol, self.trader_id, self.check_interval)
+    
+    def tick(self):
+        """一轮检查：发现成交 → 止损止盈 → 补齐阶梯"""
+        try:
+            self._update_heartbeat()
+            self._apply_position_correction()
+            
+            if self.exchange.demo_mode:
+                print(f"[{self.trader_id}] ❌ 演示模式不支持挂单网格，策略停止")
+                self.emit('error', "演示模式不支持挂单网格，请配置API密钥或使用模拟交易所")
+                self.running = False
+                return
+            
+            if self.step is None:
+                self._build_ladder()
+            else:
+                self._sync_fills()
+            
+            if self._stops_enabled():
+                ticker = self._get_ticker()
+                if not ticker.get('stale'):
+                    should_stop, stop_reason = self._check_stop_conditions(ticker['last'])
+                    if should_stop:
+                        print(f"[{self.trader_id}] ❗ {stop_reason}")
+                        self.emit('stop_triggered', stop_reason, price=ticker['last'])
+                        self.running = False
+                        return
+            
+            self._rebalance()
+        
+        except Exception as e:
+            print(f"[{self.trader_id}] 策略运行错误: {e}")
+            self.emit('error', f"策略运行错误: {e}")
+    
+    def on_stop(self):
+        """停止时撤掉全部挂单（撤单失败的挂单已记入事件日志，需手动处理）"""
+        self._cancel_all()
+        
+        if self.market_data:
+            self.market_data.unsubscribe(self.symbol, self.trader_id)
+        
+        print(f"[{self.trader_id}] 挂单网格已停止，共成交 {self.trade_count} 笔")
+    
+    def _build_ladder(self):
+        """以当前中间价为中心建立阶梯，并撤掉上次运行残留的挂单"""
+        ticker = self._get_ticker()
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        self.center_price = (bid + ask) / 2 if bid and ask else ticker['last']
+        self.step = self._current_gap()
+        self.anchor = 0
+        
+        leftovers = [
+            order for order in self.exchange.fetch_open_orders(self.symbol)
+            if (order.get('clientOrderId') or '').startswith(self._client_prefix)
+        ]
+        for order in leftovers:
+            try:
+                self.exchange.cancel_order(order['id'], self.symbol)
+            except Exception as e:
+                print(f"[{self.trader_id}] ⚠️ 撤销残留挂单 {order['id']} 失败: {e}")
+        
+        print(f"[{self.trader_id}] 建立挂单阶梯: 中心 ${self.center_price:,.2f}, 间隔 {self.step:.2f}%"
+              + (f", 撤销残留挂单 {len(leftovers)} 个" if leftovers else ""))
+        self.emit('ladder_built', f"中心 {self.center_price:.2f}, 间隔 {self.step:.2f}%",
+                  price=self.center_price, step=self.step, leftovers=len(leftovers))
+    
+    def _sync_fills(self):
+        """
+        发现成交：一次请求未完成订单，阶梯中不在其中的订单再逐个查询最终状态
+        
+        完全成交的档位成为新的锚点（多笔同时成交时取最后成交的一档）。
+        """
+        if not self.orders:
+            return
+        
+        open_orders = {order['id']: order for order in self.exchange.fetch_open_orders(self.symbol)}
+        closed = []
+        for level, tracked in list(self.orders.items()):
+            order = open_orders.get(tracked['id'])
+            if order is None:
+                order = self.exchange.fetch_order(tracked['id'], self.symbol)
+            self._record_fill(tracked, order)
+            
+            if order['status'] == 'open':
+                continue
+            del self.orders[level]
+            if order['status'] == 'closed':
+                closed.append((_fill_time(order), abs(level - self.anchor), level))
+            else:
+                print(f"[{self.trader_id}] ⚠️ 第{level}档挂单 {tracked['id']} 已被撤销，重新挂单")
+        
+        if closed:
+            self.anchor = max(closed)[2]
+    
+    def _rebalance(self):
+        """按锚点补齐阶梯：撤掉不再需要的挂单，从近到远补挂缺失的档位"""
+        # 现货不能卖空：卖单总量不超过持仓
+        sells = min(self.levels, int((self.current_position + DUST) / self.amount))
+        buys = self.levels
+        if self.max_position:
+            buys = min(buys, max(int((self.max_position - self.current_position + DUST) / self.amount), 0))
+        
+        desired = self._desired_levels(buys, sells)
+        # 需要补挂时才取一次价格：行情跳过多档时，新挂单不能穿过盘口变成吃单
+        if not sells or any(level not in self.orders for level in desired):
+            market = self._market_level()
+            # 没有持仓可挂卖单时，价格上行不会触发任何成交，按最新价上移阶梯，避免买单被甩在下方
+            if not sells and market > self.anchor:
+                self.anchor = market
+            desired = self._desired_levels(buys, sells, market)
+        
+        for level, tracked in list(self.orders.items()):
+            if desired.get(level) != tracked['side']:
+                self._cancel(level)
+        
+        for level in sorted(desired, key=lambda level: abs(level - self.anchor)):
+            if level not in self.orders:
+                self._place(level, desired[level])
+    
+    def _desired_levels(self, buys: int, sells: int, market: Optional[int] = None) -> Dict[int, str]:
+        """
+        应挂单的档位：锚点下方 buys 档买单、上方 sells 档卖单
+        
+        Args:
+            buys / sells: 买卖单档数
+            market: 当前价格所在档位，提供时买单不高于该档、卖单不低于其上一档
+        """
+        top = self.anchor - 1 if market is None else min(self.anchor - 1, market)
+        bottom = self.anchor + 1 if market is None else max(self.anchor + 1, market + 1)
+        desired = {top - i: 'buy' for i in range(buys)}
+        desired.update({bottom + i: 'sell' for i in range(sells)})
+        if self.grid_min is not None or self.grid_max is not None:
+            desired = {
+                level: side for level, side in desired.items()
+                if in_grid_range(level_price(self.center_price, self.step, level), self.grid_min, self.grid_max)
+            }
+        return desired
+    
+    def _market_level(self) -> int:
+        """当前中间价所在的档位（该档价格不高于中间价）"""
+        ticker = self._get_ticker()
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        price = (bid + ask) / 2 if bid and ask else ticker['last']
+        return math.floor(math.log(price / self.center_price) / math.log(1 + self.step / 100))
+    
+    def _place(self, level: int, side: str):
+        """在指定档位挂单（立即成交的部分直接记账）"""
+        price = level_price(self.center_price, self.step, level)
+        client_order_id = new_client_order_id(self.trader_id)
+        try:
+            order = self.exchange.create_limit_order(self.symbol, side, self.amount, price, client_order_id)
+        except Exception as e:
+            if self._rejected.get(level) != str(e):
+                print(f"[{self.trader_id}] ⚠️ 第{level}档{'买' if side == 'buy' else '卖'}单挂单失败: {e}")
+                self.emit('trade_skipped', f"第{level}档挂单失败: {e}", action=side, reason='order_rejected',
+                          price=price, level=level)
+            self._rejected[level] = str(e)
+            return
+        
+        self._rejected.pop(level, None)
+        self.placed_count += 1
+        tracked = {
+            'id': str(order['id']),
+            'client_order_id': client_order_id,
+            'side': side,
+            'price': float(order.get('price') or price),
+            'amount': self.amount,
+            'filled': 0.0,
+            'cost': 0.0,
+            'fee': 0.0
+        }
+        print(f"[{self.trader_id}] 挂{'买' if side == 'buy' else '卖'}单 第{level}档 {self.amount} @ ${tracked['price']:,.2f}")
+        
+        self._record_fill(tracked, order)
+        if order.get('status', 'open') == 'open':
+            self.orders[level] = tracked
+    
+    def _cancel(self, level: int):
+        """
+        撤掉指定档位的挂单（撤单前已成交的部分照常记账）
+        
+        撤单成功或订单已结束后才停止跟踪；网络错误/熔断时订单仍在阶梯中，
+        避免下一轮在同一档位重复挂单。
+        """
+        tracked = self.orders[level]
+        try:
+            order = self.exchange.cancel_order(tracked['id'], self.symbol)
+        except ccxt.OrderNotFound:
+            # 撤单前已完全成交
+            order = self.exchange.fetch_order(tracked['id'], self.symbol)
+        self.orders.pop(level, None)
+        self.canceled_count += 1
+        self._record_fill(tracked, order)
+    
+    def _cancel_all(self) -> List[int]:
+        """
+        撤掉全部挂单（单个档位失败不影响其余档位）
+        
+        Returns:
+            撤单失败、仍在交易所挂着的档位
+        """
+        failed = []
+        for level in list(self.orders):
+            try:
+                self._cancel(level)
+            except Exception as e:
+                failed.append(level)
+                print(f"[{self.trader_id}] ⚠️ 撤销第{level}档挂单失败: {e}")
+        
+        if failed:
+            leftovers = ', '.join(f"第{level}档 {self.orders[level]['id']}" for level in failed)
+            self.emit('error', f"{len(failed)} 笔挂单撤销失败，仍在交易所挂着: {leftovers}",
+                      levels=failed, order_ids=[self.orders[level]['id'] for level in failed])
+        return failed
+    
+    def _before_liquidation(self):
+        """止损/止盈清仓前先撤单，解冻卖单占用的持仓"""
+        self._cancel_all()
+    
+    def _record_fill(self, tracked: Dict[str, Any], order: Dict[str, Any]):
+        """
+        把订单新增的成交量记为一笔交易（部分成交按增量记账）
+        
+        Args:
+            tracked: 阶梯中记录的订单（filled / cost / fee 为已记账的累计值）
+            order: 交易所返回的最新订单状态
+        """
+        filled = float(order.get('filled') or 0)
+        amount = filled - tracked['filled']
+        if amount <= DUST:
+            return
+        
+        cost = float(order.get('cost') or filled * tracked['price'])
+        fee = order.get('fee') or {}
+        fee_cost = float(fee.get('cost') or 0)
+        if fee.get('currency') == self.symbol.split('/')[0]:
+            fee_cost *= cost / filled  # 以基础币收取的手续费折算为计价币
+        
+        trade_cost = cost - tracked['cost']
+        trade_fee = fee_cost - tracked['fee'] if fee_cost else trade_cost * FEE_RATE
+        tracked['filled'], tracked['cost'] = filled, cost
+        tracked['fee'] = fee_cost or tracked['fee'] + trade_fee
+        
+        side = tracked['side']
+        trade = {
+            'order_id': tracked['id'],
+            'client_order_id': tracked['client_order_id'],
+            'symbol': self.symbol,
+            'action': side,
+            'amount': amount,
+            'price': trade_cost / amount,
+            'cost': trade_cost,
+            'fee': trade_fee,
+            'timestamp': _fill_time(order),
+            'real': True,
+            'reconciled': True  # 按交易所返回的成交增量记账，无需再对账
+        }
+        self._save_trade(trade)
+        self.current_position += amount if side == 'buy' else -amount
+        self.last_price = trade['price']
+        self.last_action = side
+        self.trade_count += 1
+        
+        print(f"[{self.trader_id}] ✅ {'买单' if side == 'buy' else '卖单'}成交 {amount} @ ${trade['price']:,.2f}，"
+              f"当前持仓: {self.current_position:.6f}")
+        self.emit(side, f"{'买入' if side == 'buy' else '卖出'} {amount} @ {trade['price']:.2f}（挂单成交）",
+                  price=trade['price'], amount=amount, position=self.current_position, order_id=tracked['id'])
+    
+    def _stops_enabled(self) -> bool:
+        return self.stop_loss_pct is not None or self.take_profit_pct is not None
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取策略状态（含阶梯上的挂单）"""
+        status = super().get_status()
+        status.update({
+            'levels': self.levels,
+            'step': self.step,
+            'center_price': self.center_price,
+            'anchor': self.anchor,
+            'orders': self._order_list(),
+            'placed_count': self.placed_count,
+            'canceled_count': self.canceled_count
+        })
+        return status
+    
+    def _order_list(self) -> List[Dict[str, Any]]:
+        """阶梯上的挂单（按价格从高到低）"""
+        return [
+            {'level': level, 'id': tracked['id'], 'side': tracked['side'], 'price': tracked['price'],
+             'amount': tracked['amount'], 'filled': tracked['filled']}
+            for level, tracked in sorted(self.orders.items(), reverse=True)
+        ]
+
+
+def _fill_time(order: Dict[str, Any]) -> int:
+    """订单最近一次成交的时间（毫秒）"""
+    trades = order.get('trades') or []
+    if trades and trades[-1].get('timestamp'):
+        return int(trades[-1]['timestamp'])
+    return int(order.get('lastTradeTimestamp') or order.get('timestamp') or time.time() * 1000)
@@ -0,0 +1,50 @@
+"""
+测试公共夹具
+- 导入 config 前把数据库指向临时文件，测试不读写 data/database.db
+- 迁移脚本按相对 backend 目录的路径执行
+- 交易所使用本地模拟交易所（行情不随时间变化，成交完全由测试中的下单决定）
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='trader-tests-'), 'database.db')
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import pytest  # noqa: E402
+from core import database  # noqa: E402
+from core.exchange import GateIOExchange  # noqa: E402
+from core.resilience import Resilience, RetryPolicy  # noqa: E402
+from simulator.gateio import SimulatedGateIO  # noqa: E402
+
+
+SYMBOL = 'BTC/USDT'
+
+# 模拟交易所的初始价格和做市商每档数量（只挂一档，大于该数量的吃单只能部分成交）
+PRICE = 50000.0
+DEPTH = 0.01
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """每个测试从空的交易记录和账本开始"""
+    database.init_schema()
+    with database.transaction() as conn:
+        conn.execute('DELETE FROM trades')
+        conn.execute('DELETE FROM trader_ledger')
+    database.ledger_mirror.invalidate()
+    yield
+
+
+@pytest.fixture
+def simulator() -> SimulatedGateIO:
+    """价格固定、做市商每侧只挂一档的模拟交易所"""
+    return SimulatedGateIO(prices={SYMBOL: PRICE}, levels=1, level_amount={SYMBOL: DEPTH}, time_scale=0.0, seed=1)
+
+
+@pytest.fixture
+def exchange(simulator: SimulatedGateIO) -> GateIOExchange:
+    """连接模拟交易所的同步客户端（不重试，熔断器与全局实例隔离）"""
+    return GateIOExchange(client=simulator, resilience=Resilience(policy=RetryPolicy(retries=0)))
@@ -0,0 +1,111 @@
+"""挂单网格：撤单失败时的档位跟踪、停止时的残留挂单和部分成交的增量记账"""
+import time
+from typing import Dict, List, Set
+
+import ccxt
+import pytest
+
+from core import database
+from core.trade_writer import trade_writer
+from simulator.gateio import MIN_STEP
+from strategy.ladder import LadderStrategy
+from tests.conftest import DEPTH, PRICE, SYMBOL
+
+
+def _ladder(exchange, monkeypatch, trader_id: str, **config) -> LadderStrategy:
+    """每侧2档、间隔2%的挂单网格（不在交易员引擎中运行，不上报心跳）"""
+    ladder = LadderStrategy(trader_id, SYMBOL, {'amount': DEPTH, 'grid_gap': 2.0, 'levels': 2, **config}, exchange)
+    monkeypatch.setattr(ladder, '_update_heartbeat', lambda: None)
+    return ladder
+
+
+def _fail_cancel(monkeypatch, simulator, order_ids: Set[str]):
+    """让指定订单的撤单请求超时（订单仍在交易所挂着）"""
+    cancel_order = simulator.cancel_order
+    
+    def failing_cancel(order_id, symbol=None, params=None):
+        if order_id in order_ids:
+            raise ccxt.RequestTimeout(f"撤单超时: {order_id}")
+        return cancel_order(order_id, symbol, params)
+    
+    monkeypatch.setattr(simulator, 'cancel_order', failing_cancel)
+
+
+def _capture_events(monkeypatch, ladder: LadderStrategy) -> List[Dict]:
+    """记录策略发出的事件"""
+    events = []
+    monkeypatch.setattr(ladder, 'emit', lambda type, message='', **data: events.append({'type': type, **data}))
+    return events
+
+
+def test_failed_cancel_keeps_level_and_is_not_replaced(exchange, simulator, monkeypatch):
+    ladder = _ladder(exchange, monkeypatch, 'ladder-a')
+    ladder.tick()
+    assert sorted(ladder.orders) == [-2, -1]
+    stuck = ladder.orders[-2]['id']
+    _fail_cancel(monkeypatch, simulator, {stuck})
+    
+    # 持仓上限只允许1档买单：第-2档需要撤销，但撤单失败
+    ladder.max_position = DEPTH
+    ladder.tick()
+    assert ladder.orders[-2]['id'] == stuck
+    assert ladder.canceled_count == 0
+    
+    # 再次需要第-2档时沿用仍在挂着的订单，不重复挂单
+    ladder.max_position = None
+    ladder.tick()
+    assert ladder.placed_count == 2
+    assert {tracked['id'] for tracked in ladder.orders.values()} == {order['id'] for order in simulator.fetch_open_orders(SYMBOL)}
+    assert simulator.get_stats()['open_orders'] == 2
+
+
+def test_cancel_all_reports_leftover_levels(exchange, simulator, monkeypatch):
+    ladder = _ladder(exchange, monkeypatch, 'ladder-b')
+    ladder.tick()
+    stuck, other = ladder.orders[-1]['id'], ladder.orders[-2]['id']
+    _fail_cancel(monkeypatch, simulator, {stuck})
+    events = _capture_events(monkeypatch, ladder)
+    
+    failed = ladder._cancel_all()
+    
+    # 一个档位撤单失败不影响其余档位
+    assert failed == [-1]
+    assert list(ladder.orders) == [-1]
+    assert simulator.fetch_order(other)['status'] == 'canceled'
+    assert simulator.fetch_order(stuck)['status'] == 'open'
+    assert events == [{'type': 'error', 'levels': [-1], 'order_ids': [stuck]}]
+
+
+def test_partial_fills_are_recorded_incrementally(exchange, simulator, monkeypatch):
+    ladder = _ladder(exchange, monkeypatch, 'ladder-c', amount=3 * DEPTH)
+    ladder.center_price, ladder.step = PRICE, 2.0
+    
+    # 买单挂在盘口上方：吃掉卖一的 DEPTH 后剩余部分挂在交易所，做市商每次重新挂单再成交 DEPTH
+    ladder._place(1, 'buy')
+    order_id = ladder.orders[1]['id']
+    assert ladder.current_position == pytest.approx(DEPTH)
+    
+    time.sleep(MIN_STEP)
+    ladder._sync_fills()
+    assert ladder.orders[1]['filled'] == pytest.approx(2 * DEPTH)
+    assert ladder.current_position == pytest.approx(2 * DEPTH)
+    
+    time.sleep(MIN_STEP)
+    ladder._sync_fills()
+    assert 1 not in ladder.orders
+    assert ladder.anchor == 1
+    assert ladder.trade_count == 3
+    assert ladder.current_position == pytest.approx(3 * DEPTH)
+    
+    # 每笔交易只记新增的成交，合计等于订单的累计成交
+    assert trade_writer.flush(timeout=5)
+    order = simulator.fetch_order(order_id)
+    rows = database.list_trades(limit=10, trader_id='ladder-c')
+    assert [row['amount'] for row in rows] == pytest.approx([DEPTH] * 3)
+    assert sum(row['cost'] for row in rows) == pytest.approx(order['cost'])
+    assert sum(row['fee_amount'] for row in rows) == pytest.approx(order['fee']['cost'])
+    
+    ledger = database.get_ledger('ladder-c', SYMBOL)
+    assert ledger['bought'] == pytest.approx(3 * DEPTH)
+    assert ledger['buy_cost'] == pytest.approx(order['cost'])
+    assert ledger['trade_count'] == 3
@@ -0,0 +1,164 @@
+"""订单对账：按模拟交易所的实际成交修正交易记录、之后的持仓快照和账本"""
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from core import database
+from core.exchange import format_order, new_client_order_id
+from core.reconcile import OrderReconciler
+from tests.conftest import DEPTH, PRICE, SYMBOL
+
+
+# 做市商买一/卖一价（默认价差 0.02%）
+ASK = PRICE * (1 + 0.0001)
+BID = PRICE * (1 - 0.0001)
+
+
+def _record(trade_data: Dict, trader_id: str, position_before: Optional[float] = None,
+            position_after: Optional[float] = None) -> int:
+    """按下单返回的委托记账（reconciled = 0）"""
+    return database.insert_trades([(trade_data, trader_id, 'grid', position_before, position_after)])[0]
+
+
+def _partial_buy(exchange, simulator, amount: float) -> Dict:
+    """市价买入超过盘口深度的数量，撤掉未成交部分（订单部分成交后结束）"""
+    trade_data = exchange.market_buy(SYMBOL, amount)
+    simulator.cancel_order(trade_data['order_id'], SYMBOL)
+    return trade_data
+
+
+def _row(trade_id: int) -> Optional[Dict]:
+    row = database.get_connection().execute('SELECT * FROM trades WHERE id = ?', (trade_id,)).fetchone()
+    return dict(row) if row else None
+
+
+@pytest.fixture
+def corrections() -> List[Tuple[str, str, float]]:
+    """on_corrected 回调收到的持仓修正"""
+    return []
+
+
+@pytest.fixture
+def reconciler(exchange, corrections) -> OrderReconciler:
+    return OrderReconciler(exchange, interval=0, on_corrected=lambda *args: corrections.append(args))
+
+
+def test_partial_fill_corrects_trade_and_later_snapshots(exchange, simulator, reconciler, corrections):
+    buy = _partial_buy(exchange, simulator, 0.05)
+    buy_id = _record(buy, 'trader-a', 0.0, 0.05)
+    sell = exchange.market_sell(SYMBOL, 0.005)
+    sell_id = _record(sell, 'trader-a', 0.05, 0.045)
+    
+    summary = reconciler.run_once()
+    
+    assert summary['pending'] == 2
+    assert summary['corrected'] == 1
+    assert summary['confirmed'] == 1
+    
+    row = _row(buy_id)
+    assert row['amount'] == pytest.approx(DEPTH)
+    assert row['price'] == pytest.approx(ASK)
+    assert row['cost'] == pytest.approx(DEPTH * ASK)
+    assert row['fee_amount'] == pytest.approx(DEPTH * ASK * simulator.fee_rate)
+    assert row['position_before'] == 0.0
+    assert row['position_after'] == pytest.approx(DEPTH)
+    assert row['reconciled'] == 1
+    
+    later = _row(sell_id)
+    assert later['amount'] == pytest.approx(0.005)
+    assert later['position_before'] == pytest.approx(DEPTH)
+    assert later['position_after'] == pytest.approx(DEPTH - 0.005)
+    assert later['reconciled'] == 1
+    
+    ledger = database.get_ledger('trader-a', SYMBOL)
+    assert ledger['bought'] == pytest.approx(DEPTH)
+    assert ledger['buy_cost'] == pytest.approx(DEPTH * ASK)
+    assert ledger['sold'] == pytest.approx(0.005)
+    assert ledger['sell_revenue'] == pytest.approx(0.005 * BID)
+    assert ledger['position'] == pytest.approx(DEPTH - 0.005)
+    assert ledger['trade_count'] == 2
+    
+    assert corrections == [('trader-a', SYMBOL, pytest.approx(DEPTH - 0.05))]
+    assert reconciler.run_once()['pending'] == 0
+
+
+def test_unfilled_cancelled_order_deletes_trade(exchange, simulator, reconciler, corrections):
+    client_order_id = new_client_order_id('trader-b')
+    order = exchange.create_limit_order(SYMBOL, 'buy', 0.01, 40000.0, client_order_id)
+    simulator.cancel_order(order['id'], SYMBOL)
+    trade_id = _record(format_order(order, SYMBOL, 'buy', 0.01, 40000.0, client_order_id), 'trader-b', 0.0, 0.01)
+    
+    summary = reconciler.run_once()
+    
+    # 成交明细中没有该订单：挂单列表 + 成交明细 + 单独查询订单
+    assert summary['deleted'] == 1
+    assert summary['requests'] == 3
+    assert _row(trade_id) is None
+    
+    ledger = database.get_ledger('trader-b', SYMBOL)
+    assert ledger['bought'] == pytest.approx(0.0)
+    assert ledger['buy_cost'] == pytest.approx(0.0)
+    assert ledger['fees'] == pytest.approx(0.0)
+    assert ledger['position'] == pytest.approx(0.0)
+    assert ledger['trade_count'] == 0
+    
+    assert corrections == [('trader-b', SYMBOL, pytest.approx(-0.01))]
+
+
+def test_open_order_waits_for_next_cycle(exchange, reconciler):
+    trade_id = _record(exchange.market_buy(SYMBOL, 0.05), 'trader-c', 0.0, 0.05)
+    
+    summary = reconciler.run_once()
+    
+    assert summary['pending'] == 1
+    assert summary['confirmed'] == summary['corrected'] == summary['deleted'] == 0
+    assert _row(trade_id)['reconciled'] == 0
+    assert _row(trade_id)['amount'] == pytest.approx(0.05)
+
+
+def test_manual_trade_corrects_ledger_but_not_snapshots(exchange, simulator, reconciler, corrections):
+    trade_id = _record(_partial_buy(exchange, simulator, 0.05), 'manual')
+    
+    summary = reconciler.run_once()
+    
+    assert summary['corrected'] == 1
+    row = _row(trade_id)
+    assert row['amount'] == pytest.approx(DEPTH)
+    assert row['position_before'] == 0.0
+    assert row['position_after'] == 0.0
+    
+    ledger = database.get_ledger('manual', SYMBOL)
+    assert ledger['bought'] == pytest.approx(DEPTH)
+    assert ledger['position'] == pytest.approx(DEPTH)
+    assert ledger['trade_count'] == 1
+    
+    # 手动交易没有运行中的策略，不通知
+    assert corrections == []
+
+
+def test_matches_fills_by_client_order_id_first(exchange, simulator, reconciler):
+    trade_data = _partial_buy(exchange, simulator, 0.05)
+    trade_data['order_id'] = 'sim-unknown'
+    trade_id = _record(trade_data, 'trader-d', 0.0, 0.05)
+    
+    summary = reconciler.run_once()
+    
+    # 按自定义订单ID在成交明细中找到，不再单独查询订单
+    assert summary['requests'] == 2
+    assert summary['corrected'] == 1
+    assert _row(trade_id)['amount'] == pytest.approx(DEPTH)
+
+
+def test_falls_back_to_order_id_without_client_order_id(exchange, simulator, reconciler):
+    trade_data = _partial_buy(exchange, simulator, 0.05)
+    trade_data['client_order_id'] = None
+    trade_id = _record(trade_data, 'trader-e', 0.0, 0.05)
+    
+    summary = reconciler.run_once()
+    
+    assert summary['requests'] == 2
+    assert summary['corrected'] == 1
+    row = _row(trade_id)
+    assert row['amount'] == pytest.approx(DEPTH)
+    assert row['position_after'] == pytest.approx(DEPTH)
+    assert database.get_ledger('trader-e', SYMBOL)['position'] == pytest.approx(DEPTH)
@@ -0,0 +1,26 @@
+import { apiClient } from './client'
+
+// 推送流消息处理函数（事件名 -> 处理函数）
+export type StreamHandlers = Record<string, (data: any) => void>
+
+// 订阅后端推送流（SSE），断线后浏览器按服务端 retry 自动重连
+// open 在每次（重）连接成功时触发，页面应在此时拉取一次全量数据
+export function subscribeStream(handlers: StreamHandlers, traderId?: string): () => void {
+  const query = traderId ? `?trader_id=${encodeURIComponent(traderId)}` : ''
+  const source = new EventSource(`${apiClient.defaults.baseURL}/api/stream${query}`)
+
+  source.onopen = () => handlers.open?.(null)
+
+  for (const [event, handler] of Object.entries(handlers)) {
+    if (event === 'open') continue
+    source.addEventListener(event, (e) => {
+      try {
+        handler(JSON.parse((e as MessageEvent).data))
+      } catch (error) {
+        console.error(`推送消息解析失败 (${event}):`, error)
+      }
+    })
+  }
+
+  return () => source.close()
+}
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react'
 import { apiClient } from '../api/client'
+import { subscribeStream } from '../api/stream'
 
 interface Trade {
   id: number
@@ -103,20 +104,45 @@ function TraderDetail({ traderId, onBack }: Props) {
     }
   }
 
-  // 初始加载数据
-  useEffect(() => {
+  // 全量加载（首次、推送流（重）连接、resync 时）
+  const loadAll = () => {
     loadTrader()
     loadTrades()
     loadBalance()
+  }
+
+  // 新成交：插入交易历史顶部，余额随之变化
+  const applyTrade = (trade: Trade) => {
+    setTrades(prev => prev.some(item => item.id === trade.id) ? prev : [trade, ...prev].slice(0, 50))
+    loadBalance()
+  }
+
+  // tick 状态增量
+  const applyUpdate = (update: { ticks: Record<string, any> }) => {
+    const status = update.ticks[traderId]
+    if (status) {
+      setTrader(prev => prev && { ...prev, runtime_status: { ...prev.runtime_status, ...status } })
+    }
+  }
+
+  // 交易员状态变化
+  const applyStatus = (data: { status: string }) => {
+    setTrader(prev => prev && { ...prev, status: data.status })
+  }
+
+  // 初始加载数据，之后由后端推送该交易员的变化
+  useEffect(() => {
+    loadAll()
     
-    // 每5秒刷新一次（符合PROJECT_SPEC.md规范）
-    const interval = setInterval(() => {
-      loadTrader()
-      loadTrades()
-      loadBalance()
-    }, 5000)
+    const unsubscribe = subscribeStream({
+      open: loadAll,
+      resync: loadAll,
+      trade: applyTrade,
+      update: applyUpdate,
+      trader_status: applyStatus
+    }, traderId)
     
-    return () => clearInterval(interval)
+    return unsubscribe
   }, [traderId])
   
   // 运行时长独立更新
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react'
 import { apiClient } from '../api/client'
+import { subscribeStream } from '../api/stream'
 
 interface Trader {
   id: string
@@ -201,17 +202,55 @@ function Traders({ onViewDetail }: Props) {
     }
   }
 
-  useEffect(() => {
+  // 全量加载（首次、推送流（重）连接、resync 时）
+  const loadAll = () => {
     loadTraders()
     loadBalance()
-    
-    // 每5秒刷新一次
-    const interval = setInterval(() => {
+  }
+
+  // 推送 tick 状态和盈亏的增量
+  const applyUpdate = (update: { ticks: Record<string, any>; pnl: Record<string, TraderPnL> }) => {
+    if (Object.keys(update.ticks).length > 0) {
+      setTraders(prev => prev.map(trader =>
+        update.ticks[trader.id]
+          ? { ...trader, runtime_status: { ...trader.runtime_status, ...update.ticks[trader.id] } }
+          : trader
+      ))
+    }
+    if (Object.keys(update.pnl).length > 0) {
+      setPnlData(prev => ({ ...prev, ...update.pnl }))
+    }
+  }
+
+  // 推送交易员状态变化（新建/删除时重新拉取列表）
+  const applyStatus = (data: { trader_id: string; status: Trader['status'] | 'deleted'; created?: boolean }) => {
+    if (data.created || data.status === 'deleted') {
       loadTraders()
-      loadBalance()
-      setCurrentTime(Date.now())
-    }, 5000)
-    return () => clearInterval(interval)
+      return
+    }
+    setTraders(prev => prev.map(trader =>
+      trader.id === data.trader_id ? { ...trader, status: data.status as Trader['status'] } : trader
+    ))
+  }
+
+  useEffect(() => {
+    loadAll()
+    
+    // 由后端推送变化，不再轮询
+    const unsubscribe = subscribeStream({
+      open: loadAll,
+      resync: loadAll,
+      update: applyUpdate,
+      trader_status: applyStatus,
+      trade: loadBalance
+    })
+    
+    // 运行时长每5秒刷新一次
+    const interval = setInterval(() => setCurrentTime(Date.now()), 5000)
+    return () => {
+      unsubscribe()
+      clearInterval(interval)
+    }
   }, [])
 
   return (